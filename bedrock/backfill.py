@@ -0,0 +1,504 @@
+"""
+Backfill / reclassification job for NewsTable.
+
+Scans the table with a parallel segmented Scan and reclassifies every row whose
+classifier_version differs from the current CLASSIFIER_VERSION (or every row,
+with `all`). Classification reuses classify_article from lambda_function, so
+results are identical to the stream path.
+
+Progress is checkpointed per segment after each page, so an interrupted run
+(or a Lambda that hits its time limit) resumes where it stopped when started
+again with the same job id.
+
+Run locally from the repo root:
+
+    PYTHONPATH=. python bedrock/backfill.py --segments 4 --job-id prompt-v2
+
+or deploy with handler `backfill.lambda_handler` and invoke it with
+{"job_id": "prompt-v2", "segments": 4}; re-invoke while the result status is
+"incomplete".
+
+Large backlogs can go through a Bedrock batch inference job instead of one
+invoke_model call per row (--batch-inference, or "batch_inference": true).
+The first run scans for stale rows and submits the job; later runs with the
+same job id poll it and, once it has finished, store the results with the
+same code as the stream path. Fewer stale rows than Bedrock's per-job
+minimum are classified synchronously.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from boto3.dynamodb.conditions import Attr
+
+from common import aggregates, aws, metrics
+from common.classification import CLASSIFIER_VERSION, PARSE_FAILED_ATTRIBUTE, analysis_inputs_hash, parse_failure_marker
+from common.inference import BEDROCK_BATCH_MIN_RECORDS, batch_s3_location, get_backend
+from common.model_output import ModelOutputError, parse_classification
+from common.prompts import build_classification_prompt
+from lambda_function import (
+    CLASSIFY_MAX_WORKERS,
+    aggregates_table,
+    classify_article,
+    mark_parse_failed,
+    store_classification,
+    table,
+)
+
+# Parallel Scan segments (one scanning thread each) and rows read per Scan page
+BACKFILL_SEGMENTS = int(os.environ.get('BACKFILL_SEGMENTS', '4'))
+BACKFILL_PAGE_SIZE = int(os.environ.get('BACKFILL_PAGE_SIZE', '100'))
+
+# Where checkpoints live: a DynamoDB table (partition key 'job_id') or a local JSON file
+BACKFILL_CHECKPOINT_TABLE = os.environ.get('BACKFILL_CHECKPOINT_TABLE', '')
+BACKFILL_CHECKPOINT_FILE = os.environ.get('BACKFILL_CHECKPOINT_FILE', 'backfill_checkpoint.json')
+
+# When run as a Lambda, stop starting new pages this long before the timeout
+BACKFILL_STOP_MARGIN_MS = int(os.environ.get('BACKFILL_STOP_MARGIN_MS', '60000'))
+
+# Most rows sent in one Bedrock batch inference job; rows beyond it stay stale
+# and are picked up by the next job
+BACKFILL_BATCH_MAX_RECORDS = int(os.environ.get('BACKFILL_BATCH_MAX_RECORDS', '50000'))
+
+# Attributes the classifier needs; everything else stays on the server
+SCAN_PROJECTION = ("#u, title, content, summary, #l, classifier_input_hash, published_at, duplicate_of, skipped_reason, "
+                   f"{PARSE_FAILED_ATTRIBUTE}")
+SCAN_PROJECTION_NAMES = {"#u": "url", "#l": "location"}
+
+
+class FileCheckpointStore:
+    """
+    Keeps checkpoints for every job in one local JSON file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read_all(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, job_id):
+        with self._lock:
+            return self._read_all().get(job_id)
+
+    def save(self, job_id, state):
+        with self._lock:
+            data = self._read_all()
+            data[job_id] = state
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+
+class DynamoCheckpointStore:
+    """
+    Keeps each job's checkpoint as a JSON string in a DynamoDB table keyed by 'job_id'.
+    """
+
+    def __init__(self, checkpoint_table):
+        self.table = checkpoint_table
+        self._lock = threading.Lock()
+
+    def load(self, job_id):
+        item = self.table.get_item(Key={'job_id': job_id}, ConsistentRead=True).get('Item')
+        return json.loads(item['state']) if item else None
+
+    def save(self, job_id, state):
+        with self._lock:
+            self.table.put_item(Item={'job_id': job_id, 'state': json.dumps(state), 'updated_at': int(time.time())})
+
+
+def build_checkpoint_store():
+    if BACKFILL_CHECKPOINT_TABLE:
+        return DynamoCheckpointStore(aws.table(BACKFILL_CHECKPOINT_TABLE))
+    return FileCheckpointStore(BACKFILL_CHECKPOINT_FILE)
+
+
+def new_state(segments, reclassify_all):
+    return {
+        "classifier_version": CLASSIFIER_VERSION,
+        "reclassify_all": reclassify_all,
+        "total_segments": segments,
+        # Per segment: ExclusiveStartKey of the next page, and whether the segment is finished
+        "segments": {str(n): {"cursor": None, "done": False} for n in range(segments)},
+        "counts": {"scanned": 0, "matched": 0, "processed": 0, "skipped_unchanged": 0,
+                   "skipped_duplicate": 0, "skipped_irrelevant": 0, "ignored": 0, "parse_failed": 0, "failed": 0},
+        "seconds": 0.0,
+    }
+
+
+def stale_rows_filter():
+    """
+    Scan filter for rows this CLASSIFIER_VERSION hasn't classified, leaving
+    out rows whose model output it already failed to parse.
+    """
+    not_classified = Attr('classifier_version').not_exists() | Attr('classifier_version').ne(CLASSIFIER_VERSION)
+    return not_classified & ~Attr(PARSE_FAILED_ATTRIBUTE).begins_with(parse_failure_marker(''))
+
+
+def run_backfill(job_id, segments=BACKFILL_SEGMENTS, reclassify_all=False, max_workers=CLASSIFY_MAX_WORKERS,
+                 page_size=BACKFILL_PAGE_SIZE, should_stop=lambda: False, store=None):
+    """
+    Runs (or resumes) backfill job `job_id`. Each of `segments` Scan segments
+    is read by its own thread; matching rows are classified on a shared pool of
+    `max_workers` threads, one page at a time, and the segment's cursor is
+    checkpointed once the whole page is done. `should_stop` is polled between
+    pages.
+
+    Rows that fail are counted but not retried here; they keep their old
+    classifier_version, so the next run with a new job id picks them up.
+    Rows whose output could not be parsed are marked (PARSE_FAILED_ATTRIBUTE)
+    and left out until their inputs or CLASSIFIER_VERSION change, or `all`.
+    Returns the job state with a "status" of "complete" or "incomplete".
+    """
+    store = store or build_checkpoint_store()
+    state = store.load(job_id)
+    if state is None or state.get("classifier_version") != CLASSIFIER_VERSION:
+        state = new_state(segments, reclassify_all)
+    elif state["total_segments"] != segments:
+        # Cursors are only valid for the segment count they were taken with
+        print(f"⚠️ Resuming job {job_id} with its original {state['total_segments']} segments (not {segments})")
+    segments = state["total_segments"]
+    reclassify_all = state["reclassify_all"]
+
+    filter_expression = None if reclassify_all else stale_rows_filter()
+
+    lock = threading.Lock()
+    counts = state["counts"]
+    start_time = time.time()
+    previous_seconds = state["seconds"]
+
+    def checkpoint():
+        state["seconds"] = previous_seconds + (time.time() - start_time)
+        store.save(job_id, state)
+
+    def classify_row(item):
+        if item.get('duplicate_of'):
+            return "skipped_duplicate"
+        if item.get('skipped_reason'):
+            return "skipped_irrelevant"
+        return classify_article(
+            url=item.get('url'),
+            title=item.get('title', ''),
+            content=item.get('content') or item.get('summary', ''),
+            location=item.get('location', 'Unknown'),
+            # A forced run must not be skipped by the change-detection hash
+            stored_hash=None if reclassify_all else item.get('classifier_input_hash'),
+            published_at=item.get('published_at'),
+            failed_marker=None if reclassify_all else item.get(PARSE_FAILED_ATTRIBUTE),
+        )
+
+    def scan_segment(segment, pool):
+        segment_state = state["segments"][str(segment)]
+        while not segment_state["done"] and not should_stop():
+            scan_kwargs = {
+                'Segment': segment,
+                'TotalSegments': segments,
+                'Limit': page_size,
+                'ProjectionExpression': SCAN_PROJECTION,
+                'ExpressionAttributeNames': SCAN_PROJECTION_NAMES,
+            }
+            if filter_expression is not None:
+                scan_kwargs['FilterExpression'] = filter_expression
+            if segment_state["cursor"]:
+                scan_kwargs['ExclusiveStartKey'] = segment_state["cursor"]
+
+            page = table.scan(**scan_kwargs)
+            items = page.get('Items', [])
+
+            page_counts = {}
+            futures = [pool.submit(classify_row, item) for item in items]
+            wait(futures)
+            for future in futures:
+                try:
+                    status = future.result()
+                except Exception as e:
+                    print(f"❌ Backfill row failed: {e}")
+                    status = "failed"
+                page_counts[status] = page_counts.get(status, 0) + 1
+
+            with lock:
+                counts["scanned"] += page.get('ScannedCount', 0)
+                counts["matched"] += len(items)
+                for status, n in page_counts.items():
+                    counts[status] = counts.get(status, 0) + n
+                segment_state["cursor"] = page.get('LastEvaluatedKey')
+                segment_state["done"] = 'LastEvaluatedKey' not in page
+                checkpoint()
+
+    print(f"🔁 Backfill {job_id}: {segments} segments, {max_workers} workers, classifier {CLASSIFIER_VERSION}"
+          f"{' (all rows)' if reclassify_all else ''}")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        with ThreadPoolExecutor(max_workers=segments) as scanners:
+            for future in [scanners.submit(scan_segment, n, pool) for n in range(segments)]:
+                future.result()
+
+    with lock:
+        checkpoint()
+
+    done = all(s["done"] for s in state["segments"].values())
+    elapsed = state["seconds"]
+    result = {
+        "status": "complete" if done else "incomplete",
+        "job_id": job_id,
+        **counts,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(counts["matched"] / elapsed, 2) if elapsed else 0.0,
+        "scanned_per_sec": round(counts["scanned"] / elapsed, 2) if elapsed else 0.0,
+    }
+    print(f"📊 Backfill: {json.dumps(result)}")
+    metrics.flush("backfill", job_id=job_id)
+    return result
+
+
+def scan_segments(segments, filter_expression=None, projection=SCAN_PROJECTION, names=SCAN_PROJECTION_NAMES):
+    """
+    Every row matching `filter_expression`, read with a parallel segmented Scan.
+    """
+    def scan_segment(segment):
+        rows = []
+        scan_kwargs = {'Segment': segment, 'TotalSegments': segments, 'ProjectionExpression': projection}
+        if names:
+            scan_kwargs['ExpressionAttributeNames'] = names
+        if filter_expression is not None:
+            scan_kwargs['FilterExpression'] = filter_expression
+        while True:
+            page = table.scan(**scan_kwargs)
+            rows.extend(page.get('Items', []))
+            if 'LastEvaluatedKey' not in page:
+                return rows
+            scan_kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    with ThreadPoolExecutor(max_workers=segments) as scanners:
+        return [row for segment_rows in scanners.map(scan_segment, range(segments)) for row in segment_rows]
+
+
+def batch_job_name(job_id):
+    # Bedrock job names allow letters, digits, '-', '+' and '.'
+    name = ''.join(c if c.isalnum() or c in '-+.' else '-' for c in job_id).strip('-+.') or 'backfill'
+    return f"{name[:48]}-{int(time.time())}"
+
+
+def submit_batch_backfill(job_id, segments, reclassify_all, store):
+    """
+    Scans for rows to classify and submits them as one Bedrock batch
+    inference job. The job's record id -> row manifest is written next to its
+    input under BEDROCK_BATCH_S3_URI. Returns the new job state, or None when
+    there are fewer rows than a batch job accepts.
+    """
+    filter_expression = None if reclassify_all else stale_rows_filter()
+
+    start_time = time.time()
+    state = new_state(segments, reclassify_all)
+    counts = state["counts"]
+    # scan_segments doesn't report ScannedCount
+    del counts["scanned"]
+    rows = []
+    for item in scan_segments(segments, filter_expression):
+        counts["matched"] += 1
+        if item.get('duplicate_of'):
+            counts["skipped_duplicate"] += 1
+            continue
+        if item.get('skipped_reason'):
+            counts["skipped_irrelevant"] += 1
+            continue
+        title = item.get('title') or ''
+        content = item.get('content') or item.get('summary') or ''
+        input_hash = analysis_inputs_hash(title, content)
+        if not reclassify_all and (item.get('classifier_input_hash') == input_hash
+                                   or item.get(PARSE_FAILED_ATTRIBUTE) == parse_failure_marker(input_hash)):
+            counts["skipped_unchanged"] += 1
+            continue
+        rows.append({'url': item.get('url'), 'title': title, 'content': content, 'input_hash': input_hash,
+                     'location': item.get('location') or 'Unknown', 'published_at': item.get('published_at')})
+
+    if len(rows) < BEDROCK_BATCH_MIN_RECORDS:
+        print(f"ℹ️ Only {len(rows)} rows to classify, below the batch minimum of {BEDROCK_BATCH_MIN_RECORDS}; "
+              "classifying them synchronously.")
+        return None
+    if len(rows) > BACKFILL_BATCH_MAX_RECORDS:
+        print(f"⚠️ {len(rows)} rows to classify; submitting the first {BACKFILL_BATCH_MAX_RECORDS}. "
+              "Run another job for the rest.")
+        rows = rows[:BACKFILL_BATCH_MAX_RECORDS]
+
+    name = batch_job_name(job_id)
+    records = {f"r{n:010d}": row for n, row in enumerate(rows)}
+    prompts = {record_id: build_classification_prompt(row['title'], row['content']) for record_id, row in records.items()}
+    job_arn = get_backend('bedrock').submit_batch_job(name, prompts)
+
+    # Only what storing a result needs; the prompts already hold the text
+    bucket, manifest_key = batch_s3_location('manifests', f"{name}.jsonl")
+    manifest = "\n".join(
+        json.dumps({'recordId': record_id, **{k: row[k] for k in ('url', 'input_hash', 'location', 'published_at')}})
+        for record_id, row in records.items()
+    )
+    aws.client('s3').put_object(Bucket=bucket, Key=manifest_key, Body=manifest.encode('utf-8'))
+
+    state.update({"mode": "batch", "job_arn": job_arn, "manifest": manifest_key, "records": len(records),
+                  "applied": 0, "job_status": "Submitted"})
+    state["seconds"] = time.time() - start_time
+    store.save(job_id, state)
+    print(f"📤 Submitted batch job {job_arn} with {len(records)} records")
+    return state
+
+
+def load_manifest(manifest_key):
+    bucket, _ = batch_s3_location()
+    body = aws.client('s3').get_object(Bucket=bucket, Key=manifest_key)['Body'].read().decode('utf-8')
+    return {entry['recordId']: entry for entry in (json.loads(line) for line in body.splitlines() if line.strip())}
+
+
+def apply_batch_result(entry, completion):
+    """
+    Stores one batch inference result with the stream path's storage code.
+    """
+    if not completion:
+        return "failed"
+    try:
+        parsed = parse_classification(completion, fallback_location=entry['location'])
+    except ModelOutputError as e:
+        print(f"❌ Could not parse batch output for {entry['url']}: {e}")
+        mark_parse_failed(entry['url'], entry['input_hash'])
+        return "parse_failed"
+    return store_classification(entry['url'], parsed, entry['location'], entry['input_hash'], entry['published_at'])
+
+
+def run_batch_backfill(job_id, segments=BACKFILL_SEGMENTS, reclassify_all=False, max_workers=CLASSIFY_MAX_WORKERS,
+                       page_size=BACKFILL_PAGE_SIZE, should_stop=lambda: False, store=None):
+    """
+    Runs backfill job `job_id` through Bedrock batch inference. The first call
+    submits the job and returns status "incomplete"; later calls poll it and,
+    once it has finished, store its results `page_size` at a time on
+    `max_workers` threads, checkpointing after each page. Falls back to
+    run_backfill when there are too few rows for a batch job.
+
+    Rows whose output is missing or unparseable are counted and keep their
+    old classifier_version, so a later run picks them up.
+    """
+    store = store or build_checkpoint_store()
+    state = store.load(job_id)
+    if state is None or state.get("classifier_version") != CLASSIFIER_VERSION or state.get("mode") != "batch":
+        state = submit_batch_backfill(job_id, segments, reclassify_all, store)
+        if state is None:
+            return run_backfill(job_id, segments, reclassify_all, max_workers, page_size, should_stop, store)
+
+    counts = state["counts"]
+    start_time = time.time()
+    previous_seconds = state["seconds"]
+
+    def checkpoint():
+        state["seconds"] = previous_seconds + (time.time() - start_time)
+        store.save(job_id, state)
+
+    if state["applied"] < state["records"]:
+        job_status, results = get_backend('bedrock').get_batch_job_results(state["job_arn"])
+        state["job_status"] = job_status
+        if results is None:
+            checkpoint()
+            status = "failed" if job_status in ('Failed', 'Stopped', 'Expired') else "incomplete"
+            print(f"⏳ Batch job {state['job_arn']} is {job_status}")
+            return {"status": status, "job_id": job_id, "job_status": job_status, "records": state["records"]}
+
+        manifest = load_manifest(state["manifest"])
+        record_ids = sorted(manifest)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            while state["applied"] < len(record_ids) and not should_stop():
+                page = record_ids[state["applied"]:state["applied"] + page_size]
+                futures = [pool.submit(apply_batch_result, manifest[r], results.get(r)) for r in page]
+                for future in futures:
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        print(f"❌ Backfill row failed: {e}")
+                        status = "failed"
+                    counts[status] = counts.get(status, 0) + 1
+                state["applied"] += len(page)
+                checkpoint()
+
+    done = state["applied"] >= state["records"]
+    elapsed = state["seconds"]
+    result = {
+        "status": "complete" if done else "incomplete",
+        "job_id": job_id,
+        "job_status": state["job_status"],
+        "records": state["records"],
+        "applied": state["applied"],
+        **counts,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(state["applied"] / elapsed, 2) if elapsed else 0.0,
+    }
+    print(f"📊 Backfill: {json.dumps(result)}")
+    metrics.flush("backfill", job_id=job_id)
+    return result
+
+
+def rebuild_aggregates(segments=BACKFILL_SEGMENTS):
+    """
+    Recomputes the AGGREGATES_TABLE rollups from a full parallel Scan of
+    NewsTable, e.g. to seed them for rows classified before they existed.
+    """
+    if aggregates_table is None:
+        raise ValueError("AGGREGATES_TABLE is not set")
+
+    start_time = time.time()
+    rows = scan_segments(segments, projection='support_level, confidence, priority_needs, people_affected', names=None)
+    totals, _ = aggregates.rebuild(aggregates_table, rows)
+    elapsed = time.time() - start_time
+    print(f"🧮 Rebuilt aggregates from {len(rows)} rows ({int(totals.get('articles', 0))} classified) in {elapsed:.2f}s")
+    return {"status": "rebuilt", "rows": len(rows), "seconds": round(elapsed, 2)}
+
+
+def lambda_handler(event, context):
+    """
+    Lambda entry point. Event fields: job_id (required to resume), segments,
+    all (reclassify every row), batch_inference (use a Bedrock batch job),
+    rebuild_aggregates (only recompute the rollups). Stops before the Lambda
+    times out and returns status "incomplete"; invoke again with the same
+    job_id to continue.
+    """
+    if event.get('rebuild_aggregates'):
+        return rebuild_aggregates(int(event.get('segments', BACKFILL_SEGMENTS)))
+
+    job_id = event.get('job_id') or f"backfill-{CLASSIFIER_VERSION}"
+
+    def should_stop():
+        return context is not None and context.get_remaining_time_in_millis() < BACKFILL_STOP_MARGIN_MS
+
+    run = run_batch_backfill if event.get('batch_inference') else run_backfill
+    return run(
+        job_id,
+        segments=int(event.get('segments', BACKFILL_SEGMENTS)),
+        reclassify_all=bool(event.get('all', False)),
+        should_stop=should_stop,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reclassify NewsTable rows with the current classifier.")
+    parser.add_argument('--job-id', default=f"backfill-{CLASSIFIER_VERSION}")
+    parser.add_argument('--segments', type=int, default=BACKFILL_SEGMENTS)
+    parser.add_argument('--workers', type=int, default=CLASSIFY_MAX_WORKERS)
+    parser.add_argument('--page-size', type=int, default=BACKFILL_PAGE_SIZE)
+    parser.add_argument('--all', action='store_true', help="reclassify every row, not only stale ones")
+    parser.add_argument('--batch-inference', action='store_true',
+                        help="classify through a Bedrock batch inference job; rerun to poll and store results")
+    parser.add_argument('--rebuild-aggregates', action='store_true',
+                        help="only recompute the AGGREGATES_TABLE rollups from the current rows")
+    args = parser.parse_args()
+
+    if args.rebuild_aggregates:
+        rebuild_aggregates(args.segments)
+    else:
+        run = run_batch_backfill if args.batch_inference else run_backfill
+        run(args.job_id, segments=args.segments, reclassify_all=args.all,
+            max_workers=args.workers, page_size=args.page_size)
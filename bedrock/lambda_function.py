@@ -1,38 +1,216 @@
-import boto3
 import json
-import re
-from decimal import Decimal  # for DynamoDB numeric fields
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from common import aggregates, aws, item_format, metrics
+from common.classification import (
+    CLASSIFIER_VERSION,
+    PARSE_FAILED_ATTRIBUTE,
+    PLACE_ATTRIBUTES,
+    analysis_inputs_hash,
+    classification_attributes,
+    parse_failure_marker,
+)
+from common.geocoding import build_geocoder
+from common.inference import get_backend
+from common.model_output import ModelOutputError, count_parse_event, get_parse_stats, parse_classification
+from common.news_index import published_day
+from common.rate_limiter import get_limiter_stats
+
+# Max number of stream records classified at once
+CLASSIFY_MAX_WORKERS = int(os.environ.get('CLASSIFY_MAX_WORKERS', '8'))
+
+# Ask the model once to fix output that fails schema validation
+PARSE_REPAIR_RETRY = os.environ.get('PARSE_REPAIR_RETRY', 'true').lower() == 'true'
+
+# Model backend used for classification: bedrock, gemini or local (offline heuristics)
+CLASSIFY_BACKEND = os.environ.get('CLASSIFY_BACKEND', 'bedrock')
+
+# Table holding the precomputed rollups (partition key 'aggregate_id'); empty disables them
+AGGREGATES_TABLE = os.environ.get('AGGREGATES_TABLE', '')
+
+# DynamoDB tables; the client behind them is created on first use
+table = aws.table('NewsTable')
+aggregates_table = aws.table(AGGREGATES_TABLE) if AGGREGATES_TABLE else None
+
+# Module level so the gazetteer index and in-memory cache survive warm invocations
+geocoder = build_geocoder()
+backend = get_backend(CLASSIFY_BACKEND)
+
+
+@metrics.timed("classify_record")
+def classify_record(record):
+    """
+    Classifies the article in one DynamoDB stream record and stores the result.
+    Returns "processed", "skipped_unchanged", "skipped_duplicate",
+    "skipped_irrelevant", "ignored" or "parse_failed"; raises if the model
+    call or the DynamoDB update fails.
+
+    Our own update_item emits a MODIFY event, so records whose stored
+    classifier_input_hash (or parse failure marker) still matches their
+    title/content for the current CLASSIFIER_VERSION are skipped instead of
+    being classified again.
+    """
+    if record.get('eventName') not in ('INSERT', 'MODIFY'):
+        return "ignored"  # handle both INSERT and MODIFY events
+
+    # Plain attribute values, with compact-format attributes decoded
+    item = item_format.from_stream_image(record.get('dynamodb', {}).get('NewImage'))
+
+    # Near-duplicates of an event's first article share its classification
+    if item.get('duplicate_of'):
+        return "skipped_duplicate"
+    # The scraper's relevance pre-filter judged it not to be a disaster report
+    if item.get('skipped_reason'):
+        return "skipped_irrelevant"
+
+    return classify_article(
+        url=item.get('url'),
+        title=item.get('title') or '',
+        content=item.get('content') or item.get('summary') or '',
+        location=item.get('location') or 'Unknown',
+        stored_hash=item.get('classifier_input_hash'),
+        published_at=item.get('published_at'),
+        failed_marker=item.get(PARSE_FAILED_ATTRIBUTE),
+    )
+
+
+def classify_article(url, title, content, location='Unknown', stored_hash=None, published_at=None,
+                     failed_marker=None):
+    """
+    Classifies one article and writes the result to NewsTable. Shared by the
+    stream handler and the backfill job (bedrock/backfill.py); returns the
+    same statuses as classify_record. A row whose `failed_marker` matches its
+    inputs already failed to parse with this version and is not sent again.
+    """
+    if not url:
+        print("⚠️ Skipping record with missing URL")
+        return "ignored"
+
+    # --------------------------
+    # Change detection
+    # --------------------------
+    input_hash = analysis_inputs_hash(title, content)
+    if stored_hash == input_hash or failed_marker == parse_failure_marker(input_hash):
+        return "skipped_unchanged"
+
+    metrics.log(f"📰 Processing article: {title} ({url})")
+
+    # --------------------------
+    # Model Inference
+    # --------------------------
+    # The backend builds the precompiled prompt, trimming long content to the token budget
+    try:
+        with metrics.timer("classify.model"):
+            completion = backend.classify(title, content)
+        metrics.log("🔹 Bedrock raw output:", completion)
 
-# Initialize AWS clients
-ddb = boto3.resource('dynamodb')
-bedrock = boto3.client('bedrock-runtime')
-table = ddb.Table('NewsTable')
+        # --------------------------
+        # Extract and validate JSON
+        # --------------------------
+        try:
+            parsed = parse_classification(completion, fallback_location=location)
+        except ModelOutputError as e:
+            if not PARSE_REPAIR_RETRY:
+                raise
+            print(f"⚠️ Unusable model output ({e}). Asking the model to repair it.")
+            with metrics.timer("classify.repair"):
+                completion = backend.repair(completion, str(e))
+            parsed = parse_classification(completion, fallback_location=location)
+            count_parse_event("repaired")
+
+        metrics.log("🔹 Parsed Bedrock output:", parsed)
+
+    except ModelOutputError as e:
+        # Leave the row unclassified rather than storing an "Unknown"
+        # zero-confidence result; a backfill can pick it up later
+        print(f"❌ Could not parse Bedrock output for {url}: {e}")
+        mark_parse_failed(url, input_hash)
+        return "parse_failed"
+    except Exception as e:
+        # Fail the record so the stream retries it, rather than storing an
+        # "Unknown" zero-confidence classification
+        print(f"❌ Bedrock error for {url}: {e}")
+        raise
+
+    return store_classification(url, parsed, location, input_hash, published_at)
+
+
+def mark_parse_failed(url, input_hash):
+    """
+    Records on the row that this version could not parse the model's output
+    for these inputs, so the backfill scan and the stream leave it alone
+    until either changes.
+    """
+    try:
+        with metrics.timer("dynamodb.update_item"):
+            table.update_item(
+                Key={"url": url},
+                UpdateExpression=f"SET {PARSE_FAILED_ATTRIBUTE} = :m",
+                ExpressionAttributeValues={":m": parse_failure_marker(input_hash)},
+            )
+    except Exception as e:
+        # Only costs a repeated model call on the next scan
+        print(f"⚠️ Could not mark {url} as unparseable: {e}")
 
 
-def extract_json(completion: str, fallback_location="Unknown") -> dict:
+def store_classification(url, parsed, location, input_hash, published_at=None):
     """
-    Extract the first valid JSON object from model output text.
-    Handles comments, backticks, extra text.
+    Writes a validated classification (with its geocoded place) to the
+    NewsTable row for `url` and moves the rollups. Shared by classify_article
+    and the backfill's batch inference path; returns "processed".
     """
-    # Remove common comment markers and backticks
-    cleaned = re.sub(r'(```|```json|/\*|\*/)', '', completion, flags=re.MULTILINE).strip()
-
-    # Search for first JSON object {...}
-    match = re.search(r'\{.*?\}', cleaned, re.DOTALL)
-    if match:
+    # --------------------------
+    # Update DynamoDB
+    # --------------------------
+    # Geocoding of detected_location happens here too (GEOCODING_ENABLED,
+    # GAZETTEER_FILE, GEOCODE_CACHE_SIZE)
+    attributes = classification_attributes(parsed, location, geocoder)
+    attributes["classifier_version"] = CLASSIFIER_VERSION
+    attributes["classifier_input_hash"] = input_hash
+
+    update_expression = "SET " + ", ".join(f"{name} = :{name}" for name in attributes)
+    values = {f":{name}": value for name, value in attributes.items()}
+    # Don't leave coordinates from an earlier classification, or a parse
+    # failure marker, behind
+    removals = [name for name in PLACE_ATTRIBUTES if name not in attributes] if geocoder is not None else []
+    removals.append(PARSE_FAILED_ATTRIBUTE)
+
+    # Rows stored before the time index existed get its partition key here
+    day = published_day(published_at)
+    if day:
+        update_expression += ", published_day = if_not_exists(published_day, :d)"
+        values[":d"] = day
+    update_expression += " REMOVE " + ", ".join(removals)
+
+    with metrics.timer("dynamodb.update_item"):
+        response = table.update_item(
+            Key={"url": url},
+            UpdateExpression=update_expression,
+            ExpressionAttributeValues=values,
+            # The previous classification, so the rollups can subtract it
+            ReturnValues="UPDATED_OLD",
+        )
+    metrics.log(f"✅ Updated article {url} with {parsed}")
+
+    if aggregates_table is not None:
         try:
-            return json.loads(match.group())
-        except json.JSONDecodeError:
-            pass
+            with metrics.timer("dynamodb.aggregates"):
+                aggregates.apply_classification(aggregates_table, response.get("Attributes", {}), attributes)
+        except Exception as e:
+            # The row itself is stored; a retry would be skipped as unchanged,
+            # so log the drift instead (backfill.py --rebuild-aggregates fixes it)
+            print(f"⚠️ Could not update aggregates for {url}: {e}")
+    return "processed"
 
-    # fallback if nothing works
-    return {
-        "location": fallback_location,
-        "support_level": "Unknown",
-        "confidence": 0.0,
-        "priority_needs": [],
-        "people_affected": 0
-    }
+
+def record_url(record):
+    """
+    The article URL (partition key) a stream record refers to, if any.
+    """
+    stream_data = record.get('dynamodb', {})
+    return (stream_data.get('Keys', {}).get('url', {}).get('S')
+            or stream_data.get('NewImage', {}).get('url', {}).get('S'))
 
 
 def lambda_handler(event, context):
@@ -40,230 +218,65 @@ def lambda_handler(event, context):
     Triggered by DynamoDB stream events on NewsTable.
     When a new article is inserted or modified, analyze it using Bedrock (Meta Llama 3)
     and update the same table with disaster support classification.
+    CLASSIFY_BACKEND swaps the model, e.g. 'local' for offline runs.
+
+    Records are classified in parallel (CLASSIFY_MAX_WORKERS at a time). When
+    one URL appears several times in the batch only its latest image is
+    classified. Failed records are returned as `batchItemFailures` so that,
+    with ReportBatchItemFailures enabled on the event source mapping, only
+    they are retried.
     """
-    print("📥 Received event:", json.dumps(event))
+    metrics.log("📥 Received event:", json.dumps(event))
 
     if 'Records' not in event:
         print("⚠️ No Records found in event")
         return {"status": "no_records"}
 
-    for record in event['Records']:
-        if record.get('eventName') not in ('INSERT', 'MODIFY'):
-            continue  # handle both INSERT and MODIFY events
-
-        new_image = record.get('dynamodb', {}).get('NewImage', {})
-
-        url = new_image.get('url', {}).get('S')
-        title = new_image.get('title', {}).get('S', '')
-        content = new_image.get('content', {}).get('S') or new_image.get('summary', {}).get('S', '')
-        location = new_image.get('location', {}).get('S', 'Unknown')
-
-        if not url:
-            print("⚠️ Skipping record with missing URL")
-            continue
-
-        print(f"📰 Processing article: {title} ({url})")
-
-        # --------------------------
-        # Construct Bedrock prompt
-        # --------------------------
-        prompt = f"""
-
-            You are a disaster response analyst AI. Your goal is to read a news article and extract actionable information for disaster response. 
-            You should focus on providing **objective, evidence-based assessments** derived from the article.
-
-            Article title: {title} Article content: {content}
-            **Key Objectives:**
-
-            1. Identify the **most relevant location** where the disaster is affecting people.
-            2. Assess the **severity of support needed** and classify it into one of four levels:
-
-            * Minimal Support: Minor disruptions, limited impact, basic local assistance may be sufficient.
-            * Moderate Support: Noticeable impact, some infrastructure affected, humanitarian assistance may be required.
-            * High Support: Significant damage, multiple services disrupted, urgent assistance needed.
-            * Emergency/Critical Support: Severe damage, widespread impact, immediate intervention required to save lives.
-            3. Determine the **top 3 urgent needs** such as food, water, medical care, shelter, rescue, communication, or electricity.
-            4. Estimate the **number of people affected**, using explicit data if given, or reasonable approximation if not.
-            5. Assign a **confidence score (0-1)** reflecting how certain you are about your assessment.
-
-            **Guiding Principles:**
-
-            * Only use **information explicitly stated or strongly implied** in the article.
-            * If there is uncertainty, make the **best estimate** and reflect uncertainty in the confidence score.
-            * Focus on clarity and specificity; avoid vague responses like "help needed."
-            * Use context clues from the article: numbers, affected areas, descriptions of damage, quotes from officials, or mentions of casualties.
-
-            ---
-
-            **Step-by-Step Instructions:**
-
-            1. **Location Detection:**
-
-            * Look for city, region, district, or country names.
-            * Prioritize the location that is central to the disaster impact.
-            * If multiple locations are mentioned, choose the one most strongly affected.
-
-            2. **Support Level Classification:**
-
-            * Analyze descriptions of damage, casualties, displacement, or disruption.
-            * Map the severity description to one of the four support levels listed.
-
-            3. **Priority Needs Estimation:**
-
-            * Identify what people urgently require to survive or recover.
-            * List only the top 3 most critical needs.
+    counts = {"processed": 0, "skipped_unchanged": 0, "skipped_duplicate": 0, "skipped_irrelevant": 0, "ignored": 0, "superseded": 0, "parse_failed": 0, "failed": 0}
 
-            4. **People Affected Estimation:**
-
-            * Use explicit numbers in the article if available.
-            * If no exact numbers, infer based on context (e.g., "hundreds displaced," "entire village evacuated").
-
-            5. **Confidence Scoring:**
-
-            * 1.0: Article provides clear, explicit evidence.
-            * 0.7-0.9: Evidence is strong but partially inferred.
-            * 0.4-0.6: Moderate uncertainty, multiple interpretations possible.
-            * <0.4: Highly uncertain, very limited information.
-
-            **Example 1:**
-
-            *Title:* "Floods Devastate Riverside Town"
-            *Content:* "Heavy rains caused the Riverside River to overflow, flooding homes. Around 2,000 residents have been evacuated. Emergency shelters are overwhelmed."
-
-            *Analysis (JSON output):*
-
-            ```json
-            {
-                "location": "Riverside Town",
-                "support_level": "High Support",
-                "confidence": 0.9,
-                "priority_needs": ["shelter", "food", "medical care"],
-                "people_affected": 2000
-            }
-            ```
-
-            **Example 2:**
-
-            *Title:* "Minor Snowstorm Hits Northern Hamlet"
-            *Content:* "The snowstorm caused minor travel delays. No injuries reported."
-
-            *Analysis (JSON output):*
-
-            ```json
-            {
-                "location": "Northern Hamlet",
-                "support_level": "Minimal Support",
-                "confidence": 0.95,
-                "priority_needs": ["road clearance", "heating", "food"],
-                "people_affected": 50
-            }
-            ```
-
-            ---
-
-            Respond only in JSON like this:
-            {{
-                "location": "<detected or given location>",
-                "support_level": "<one of the above>",
-                "confidence": <number between 0 and 1>,
-                "priority_needs": ["need1", "need2", "need3"],
-                "people_affected": <estimated number>
-            }}
-
-            **Additional Guidelines:**
-
-            * Do not include any explanation, text, or commentary outside the JSON.
-            * Ensure the JSON is **syntactically valid** and complete.
-            * If the article does not mention a location or numbers, leave location empty or make your best estimate and set a lower confidence score.
-            * Prioritize **accuracy, relevance, and evidence-based reasoning**.
-            * Respond quickly, as if preparing actionable intelligence for disaster response teams.
-            """
-
-        # --------------------------
-        # Bedrock Model Inference
-        # --------------------------
-        try:
-            response = bedrock.invoke_model(
-                modelId="meta.llama3-8b-instruct-v1:0",
-                body=json.dumps({
-                    "prompt": prompt,
-                    "max_gen_len": 512,
-                    "temperature": 0.7,
-                    "top_p": 0.9
-                }),
-                contentType="application/json",
-                accept="application/json"
-            )
-
-            model_output = response["body"].read()
-            output_json = json.loads(model_output)
-            completion = (output_json.get("generation") or output_json.get("completion") or "").strip()
-
-            # --------------------------
-            # Extract JSON safely
-            # --------------------------
-            parsed = extract_json(completion, fallback_location=location)
-
-            # Ensure defaults
-            parsed.setdefault('location', location)
-            parsed.setdefault('support_level', 'Unknown')
-            parsed.setdefault('confidence', 0.0)
-            parsed.setdefault('priority_needs', [])
-            parsed.setdefault('people_affected', 0)
-
-            # Convert numeric values safely
-            try:
-                parsed['confidence'] = float(parsed['confidence'])
-            except (ValueError, TypeError):
-                parsed['confidence'] = 0.0
-
-            try:
-                parsed['people_affected'] = int(parsed['people_affected'])
-            except (ValueError, TypeError):
-                parsed['people_affected'] = 0
-
-            print("🔹 Bedrock raw output:", completion)
-            print("🔹 Parsed Bedrock output:", parsed)
-
-        except Exception as e:
-            print(f"❌ Bedrock error: {e}")
-            parsed = {
-                "location": location,
-                "support_level": "Unknown",
-                "confidence": 0.0,
-                "priority_needs": [],
-                "people_affected": 0
-            }
-
-        # --------------------------
-        # Update DynamoDB
-        # --------------------------
-        try:
-            confidence_decimal = Decimal(str(parsed.get("confidence", 0.0)))
-            support_level = parsed.get("support_level") or "Unknown"
-            detected_location = parsed.get("location") or location
-            priority_needs = parsed.get("priority_needs") or []
-            people_affected = parsed.get("people_affected") or 0
-
-            table.update_item(
-                Key={"url": url},
-                UpdateExpression="""
-                    SET support_level = :s,
-                        confidence = :c,
-                        detected_location = :l,
-                        priority_needs = :p,
-                        people_affected = :a
-                """,
-                ExpressionAttributeValues={
-                    ":s": support_level,
-                    ":c": confidence_decimal,
-                    ":l": detected_location,
-                    ":p": priority_needs,
-                    ":a": people_affected
-                },
-            )
-            print(f"✅ Updated article {url} with {parsed}")
-        except Exception as e:
-            print(f"❌ DynamoDB update failed: {e}")
-
-    return {"status": "processed", "records": len(event.get("Records", []))}
+    # url -> [latest record, sequence numbers of every record for that url]
+    latest = {}
+    standalone = []
+    for record in event['Records']:
+        url = record_url(record)
+        if url and record.get('eventName') in ('INSERT', 'MODIFY'):
+            entry = latest.setdefault(url, [None, []])
+            if entry[0] is not None:
+                counts["superseded"] += 1
+            entry[0] = record
+            entry[1].append(record.get('dynamodb', {}).get('SequenceNumber'))
+        else:
+            standalone.append(record)
+
+    jobs = [(record, sequence_numbers) for record, sequence_numbers in latest.values()]
+    jobs += [(record, [record.get('dynamodb', {}).get('SequenceNumber')]) for record in standalone]
+
+    failures = []
+    if jobs:
+        with ThreadPoolExecutor(max_workers=max(1, min(CLASSIFY_MAX_WORKERS, len(jobs)))) as executor:
+            futures = [(executor.submit(classify_record, record), sequence_numbers) for record, sequence_numbers in jobs]
+            for future, sequence_numbers in futures:
+                try:
+                    counts[future.result()] += 1
+                except Exception as e:
+                    counts["failed"] += 1
+                    print(f"❌ Record failed: {e}")
+                    # Report the earliest record for the URL; the stream resumes from there
+                    sequence_number = min((n for n in sequence_numbers if n), key=int, default=None)
+                    if sequence_number:
+                        failures.append({"itemIdentifier": sequence_number})
+
+    print(f"📊 Records: {json.dumps(counts)}")
+    print(f"🧩 Output parsing: {json.dumps(get_parse_stats())}")
+    if geocoder is not None:
+        print(f"🌍 Geocoding: {json.dumps(geocoder.get_stats())}")
+    print(f"🚦 Rate limits: {json.dumps(get_limiter_stats())}")
+    for name, value in counts.items():
+        metrics.count(f"records.{name}", value)
+    metrics.flush("bedrock")
+    return {
+        "status": "processed",
+        "records": len(event.get("Records", [])),
+        **counts,
+        "batchItemFailures": failures
+    }
@@ -0,0 +1,138 @@
+"""
+Cold-start benchmark for both Lambda handlers.
+
+Each sample is a fresh Python process, like a new Lambda execution
+environment. It records how long the handler module takes to import, how long
+the first invocation takes on a path that needs no AWS calls (the scraper
+without an API key, the classifier with a batch of REMOVE records), and how
+long creating the shared AWS clients takes once they are needed. No network
+calls are made.
+
+    python bench/cold_start.py --runs 10
+    python bench/cold_start.py --runs 20 --json cold_start.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HANDLERS = {
+    'scraper': {
+        'path': os.path.join(REPO_ROOT, 'scraper', 'lambda_function.py'),
+        'event': {'topic': 'earthquake'},
+        'services': [('resource', 'dynamodb'), ('client', 'dynamodb')],
+    },
+    'bedrock': {
+        'path': os.path.join(REPO_ROOT, 'bedrock', 'lambda_function.py'),
+        'event': {'Records': [{'eventName': 'REMOVE', 'dynamodb': {'Keys': {'url': {'S': 'https://example.com/a'}}}}]},
+        'services': [('resource', 'dynamodb'), ('client', 'bedrock-runtime')],
+    },
+}
+
+
+def measure(name):
+    """
+    Runs one cold start of `name` in this process and returns its timings.
+    """
+    handler = HANDLERS[name]
+    os.environ.pop('GNEWS_API_KEY', None)
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    os.environ['METRICS_FORMAT'] = 'off'
+    os.environ['VERBOSE_LOGS'] = 'false'
+    sys.path[:0] = [os.path.dirname(handler['path']), REPO_ROOT]
+
+    result = {}
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location('lambda_function', handler['path'])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['lambda_function'] = module
+    spec.loader.exec_module(module)
+    result['import_ms'] = (time.perf_counter() - start) * 1000
+    result['boto3_loaded_at_import'] = 'boto3' in sys.modules
+    result['requests_loaded_at_import'] = 'requests' in sys.modules
+
+    devnull = open(os.devnull, 'w')
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        start = time.perf_counter()
+        module.lambda_handler(handler['event'], None)
+        result['first_invoke_ms'] = (time.perf_counter() - start) * 1000
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    from common import aws
+    start = time.perf_counter()
+    for kind, service in handler['services']:
+        getattr(aws, kind)(service)
+    result['client_init_ms'] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for kind, service in handler['services']:
+        getattr(aws, kind)(service)
+    result['client_reuse_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def summarize(samples):
+    summary = {}
+    for key in samples[0]:
+        values = [sample[key] for sample in samples]
+        if isinstance(values[0], bool):
+            summary[key] = all(values)
+        else:
+            ordered = sorted(values)
+            summary[key] = {
+                "median": round(statistics.median(ordered), 2),
+                "p90": round(ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))], 2),
+            }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import and init timings for both handlers.")
+    parser.add_argument('--runs', type=int, default=10, help="fresh processes per handler")
+    parser.add_argument('--handlers', default='scraper,bedrock')
+    parser.add_argument('--json', dest='json_path', default='', help="also write the results to this file")
+    parser.add_argument('--child', default='', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        return
+
+    results = {}
+    for name in [h.strip() for h in args.handlers.split(',') if h.strip()]:
+        samples = []
+        for _ in range(args.runs):
+            completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name],
+                                       capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(completed.stderr, file=sys.stderr)
+                raise SystemExit(f"Cold start of {name} failed")
+            samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        results[name] = summarize(samples)
+
+    header = (f"{'handler':<8} {'import ms':>10} {'p90':>8} {'1st invoke':>10} {'clients ms':>10} "
+              f"{'reuse ms':>9} {'boto3@import':>12}")
+    print(header)
+    print('-' * len(header))
+    for name, summary in results.items():
+        print(f"{name:<8} {summary['import_ms']['median']:>10.1f} {summary['import_ms']['p90']:>8.1f} "
+              f"{summary['first_invoke_ms']['median']:>10.2f} {summary['client_init_ms']['median']:>10.1f} "
+              f"{summary['client_reuse_ms']['median']:>9.3f} {str(summary['boto3_loaded_at_import']):>12}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Local stand-ins for GNews, Gemini and Bedrock, served from one threaded HTTP
+server so both Lambdas can run end to end without network access:
+
+- GET  /gnews/search                       GNews search (synthetic articles)
+- POST /gemini/models/<model>:generateContent   Gemini summaries
+- POST /bedrock/model/<model id>/invoke    Bedrock runtime invoke_model
+
+Every endpoint can add latency, answer a share of requests with 429, and
+return malformed model output, to see how the pipeline copes.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = (
+    "flood earthquake wildfire storm hurricane cyclone drought landslide tornado tsunami volcano heatwave "
+    "river coast valley city village county province region district capital island mountain harbor "
+    "rescue evacuation shelter damage power water food medical aid crews residents officials families "
+    "roads bridges homes schools hospitals crops livestock warnings forecast rainfall winds magnitude "
+    "thousands hundreds dozens emergency response government agency volunteers relief supplies"
+).split()
+
+PLACES = ("Houston, Texas", "Manila", "Istanbul", "Los Angeles", "Dhaka", "Lagos", "Jakarta", "Miami",
+          "Kathmandu", "Santiago", "Tokyo", "Nairobi", "New Orleans", "Sydney", "Lima", "Riverside Town")
+
+SUPPORT_LEVELS = ("Minimal Support", "Moderate Support", "High Support", "Emergency/Critical Support")
+
+
+class UpstreamConfig:
+    """
+    Behaviour of one fake upstream. `latency_ms` is the mean delay (jittered
+    by +/-50%), `error_rate` the share of requests answered with 429, and
+    `malformed_rate` the share of model responses that are not valid output.
+    """
+
+    def __init__(self, latency_ms=0.0, error_rate=0.0, malformed_rate=0.0, retry_after=0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.retry_after = retry_after
+
+
+class SyntheticNews:
+    """
+    Deterministic GNews corpus of `total_articles` articles spread over topics
+    and pages of 10. `duplicate_rate` of the articles retell an earlier story
+    with small wording changes, to exercise near-duplicate clustering.
+    """
+
+    PAGE_SIZE = 10
+
+    def __init__(self, total_articles, pages_per_topic, duplicate_rate=0.0, seed=7):
+        self.total_articles = total_articles
+        self.pages_per_topic = pages_per_topic
+        self.duplicate_rate = duplicate_rate
+        self.seed = seed
+
+    def topics(self):
+        per_topic = self.PAGE_SIZE * self.pages_per_topic
+        return [f"topic-{n}" for n in range(max(1, -(-self.total_articles // per_topic)))]
+
+    def _story(self, index):
+        rng = random.Random(self.seed * 1000003 + index)
+        place = PLACES[rng.randrange(len(PLACES))]
+        title = f"{' '.join(rng.choice(WORDS) for _ in range(6)).capitalize()} in {place}"
+        description = ' '.join(rng.choice(WORDS) for _ in range(40)) + f". {rng.randrange(10, 5000)} people affected."
+        return title, description
+
+    def article(self, index):
+        rng = random.Random(self.seed * 7919 + index)
+        story = index
+        if index and rng.random() < self.duplicate_rate:
+            story = rng.randrange(index)
+        title, description = self._story(story)
+        if story != index:
+            # Another outlet's take on the same story: a word or two changed
+            words = description.split()
+            for _ in range(2):
+                words[rng.randrange(len(words))] = rng.choice(WORDS)
+            description = ' '.join(words)
+        return {
+            "title": title,
+            "description": description,
+            "content": description * 3,
+            "url": f"https://news{index % 7}.example.com/articles/{index}?utm_source=bench",
+            "source": {"name": f"Outlet {index % 7}"},
+            "publishedAt": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() - index * 60)),
+        }
+
+    def page(self, topic, page):
+        try:
+            topic_index = int(topic.rsplit('-', 1)[1])
+        except (IndexError, ValueError):
+            return []
+        if page < 1 or page > self.pages_per_topic:
+            return []
+        start = (topic_index * self.pages_per_topic + page - 1) * self.PAGE_SIZE
+        end = min(start + self.PAGE_SIZE, self.total_articles)
+        return [self.article(i) for i in range(start, end)]
+
+
+class FakeUpstreams:
+    """
+    Starts the fake upstream server on a free local port. Use as a context
+    manager; `base_url` is set once it is running and `stats()` returns
+    per-upstream call, 429 and malformed-response counts.
+    """
+
+    def __init__(self, news, gnews=None, gemini=None, bedrock=None, seed=11):
+        self.news = news
+        self.configs = {
+            'gnews': gnews or UpstreamConfig(),
+            'gemini': gemini or UpstreamConfig(),
+            'bedrock': bedrock or UpstreamConfig(),
+        }
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {name: {"calls": 0, "throttled": 0, "malformed": 0} for name in self.configs}
+        self.server = None
+        self.base_url = None
+
+    def __enter__(self):
+        upstreams = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                upstreams.handle(self, 'GET')
+
+            def do_POST(self):
+                upstreams.handle(self, 'POST')
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self.counts.items()}
+
+    def _roll(self, name, field, rate):
+        with self._lock:
+            hit = rate > 0 and self.rng.random() < rate
+            if field == 'calls' or hit:
+                self.counts[name][field] += 1
+            return hit
+
+    def handle(self, request, method):
+        path = urlsplit(request.path).path
+        if path.startswith('/gnews/'):
+            name = 'gnews'
+        elif path.startswith('/gemini/'):
+            name = 'gemini'
+        elif path.startswith('/bedrock/'):
+            name = 'bedrock'
+        else:
+            return self._send(request, 404, {"error": "not found"})
+
+        config = self.configs[name]
+        body = b''
+        if method == 'POST':
+            body = request.rfile.read(int(request.headers.get('Content-Length') or 0))
+
+        self._roll(name, 'calls', 1)
+        if config.latency_ms:
+            time.sleep(config.latency_ms / 1000 * random.uniform(0.5, 1.5))
+        if self._roll(name, 'throttled', config.error_rate):
+            if name == 'bedrock':
+                return self._send(request, 429, {"message": "Too many requests"},
+                                  {'x-amzn-ErrorType': 'ThrottlingException'})
+            return self._send(request, 429, {"error": "rate limited"}, {'Retry-After': str(config.retry_after)})
+
+        malformed = self._roll(name, 'malformed', config.malformed_rate) if name != 'gnews' else False
+        if name == 'gnews':
+            query = parse_qs(urlsplit(request.path).query)
+            articles = self.news.page(query.get('q', [''])[0], int(query.get('page', ['1'])[0]))
+            return self._send(request, 200, {"totalArticles": self.news.total_articles, "articles": articles})
+        if name == 'gemini':
+            return self._send(request, 200, self._gemini(json.loads(body or b'{}'), malformed))
+        return self._send(request, 200, self._bedrock(json.loads(body or b'{}'), malformed))
+
+    @staticmethod
+    def _gemini(payload, malformed):
+        text = payload.get('contents', [{}])[0].get('parts', [{}])[0].get('text', '')
+        schema = payload.get('generationConfig', {}).get('responseSchema') or {}
+        if schema.get('type') == 'ARRAY':
+            urls = re.findall(r'^URL: (\S+)$', text, flags=re.MULTILINE)
+            output = json.dumps([{"url": url, "summary": f"Summary of {url}."} for url in urls])
+            if malformed:
+                output = output[:len(output) // 2]
+        elif 'support_level' in schema.get('properties', {}):
+            # Fused summary + classification (the scraper's FUSED_MODE)
+            output = json.dumps({"summary": "Officials reported damage and evacuations; relief crews are responding.",
+                                 **FakeUpstreams._classification(text)})
+            if malformed:
+                output = output[:len(output) // 2]
+        else:
+            output = "Officials reported damage and evacuations; relief crews are responding."
+            if malformed:
+                output = ""
+        return {"candidates": [{"content": {"parts": [{"text": output}]}}],
+                "usageMetadata": {"promptTokenCount": len(text) // 4}}
+
+    @staticmethod
+    def _bedrock(payload, malformed):
+        prompt = payload.get('prompt', '')
+        if malformed:
+            return {"generation": "I'm sorry, I can't provide a classification for this article."}
+        return {"generation": "Here is the analysis:\n" + json.dumps(FakeUpstreams._classification(prompt))}
+
+    @staticmethod
+    def _classification(prompt):
+        # Deterministic per prompt, so reruns store the same classifications
+        rng = random.Random(int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16))
+        return {
+            "location": rng.choice(PLACES),
+            "support_level": rng.choice(SUPPORT_LEVELS),
+            "confidence": round(rng.uniform(0.3, 0.95), 2),
+            "priority_needs": rng.sample(["water", "food", "shelter", "medical care", "rescue"], 2),
+            "people_affected": rng.randrange(0, 20000),
+        }
+
+    @staticmethod
+    def _send(request, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(body)
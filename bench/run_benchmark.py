@@ -0,0 +1,255 @@
+"""
+Offline throughput benchmark for both Lambdas.
+
+Runs the scraper's fan-out mode and then the Bedrock classifier (fed
+INSERT stream records for every stored row) against the fake upstreams in
+bench/fake_upstreams.py and an in-process moto DynamoDB, or DynamoDB Local
+with --dynamodb-endpoint. Each workload size runs in a fresh subprocess so
+module-level caches don't leak between sizes.
+
+    pip install -r bench/requirements.txt
+    python bench/run_benchmark.py --sizes 10,100,1000,10000
+    python bench/run_benchmark.py --sizes 1000 --gemini-latency-ms 300 --gemini-429-rate 0.05 --json results.json
+    python bench/run_benchmark.py --sizes 1000 --fused
+
+Rate limits are disabled unless --keep-rate-limits is given, so the numbers
+show the pipeline's own throughput.
+"""
+import argparse
+import base64
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# DynamoDB streams deliver at most this many records per classifier invocation
+STREAM_BATCH_SIZE = 100
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='10,100,1000', help="comma-separated article counts")
+    parser.add_argument('--pages', type=int, default=2, help="GNews pages per topic in fan-out mode")
+    parser.add_argument('--duplicate-rate', type=float, default=0.2,
+                        help="share of articles that retell an earlier story")
+    for upstream in ('gnews', 'gemini', 'bedrock'):
+        parser.add_argument(f'--{upstream}-latency-ms', type=float, default=0.0)
+        parser.add_argument(f'--{upstream}-429-rate', type=float, default=0.0)
+        if upstream != 'gnews':
+            parser.add_argument(f'--{upstream}-malformed-rate', type=float, default=0.0)
+    parser.add_argument('--dynamodb-endpoint', default='',
+                        help="use DynamoDB Local at this URL instead of moto (NewsTable is recreated)")
+    parser.add_argument('--keep-rate-limits', action='store_true', help="keep the RATE_LIMIT_* defaults")
+    parser.add_argument('--skip-classifier', action='store_true', help="only benchmark the scraper")
+    parser.add_argument('--fused', action='store_true', help="run the scraper with FUSED_MODE=true")
+    parser.add_argument('--json', dest='json_path', default='', help="also write the results to this file")
+    parser.add_argument('--single', type=int, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_news_table(dynamodb_client):
+    from common.item_format import index_attributes
+    key_attributes = ('url', 'published_day', 'published_at', 'support_level')
+    dynamodb_client.create_table(
+        TableName='NewsTable',
+        KeySchema=[{'AttributeName': 'url', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in key_attributes],
+        GlobalSecondaryIndexes=[
+            {'IndexName': index,
+             'Projection': {'ProjectionType': 'INCLUDE',
+                            'NonKeyAttributes': index_attributes(partition, 'published_at')},
+             'KeySchema': [{'AttributeName': partition, 'KeyType': 'HASH'},
+                           {'AttributeName': 'published_at', 'KeyType': 'RANGE'}]}
+            for index, partition in (('published_day-published_at-index', 'published_day'),
+                                     ('support_level-published_at-index', 'support_level'))
+        ],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    dynamodb_client.get_waiter('table_exists').wait(TableName='NewsTable')
+
+
+def stream_image(row):
+    """
+    A scanned row as it appears in a Lambda stream event: binary values are base64 text.
+    """
+    return {name: {'B': base64.b64encode(value['B']).decode('ascii')} if 'B' in value else value
+            for name, value in row.items()}
+
+
+def captured_metrics(output):
+    """
+    Stage stats from the METRICS_FORMAT=json lines a handler printed.
+    """
+    stages = {}
+    for line in output.splitlines():
+        if line.startswith('{"metrics"'):
+            for stage, stats in json.loads(line).get('stages', {}).items():
+                merged = stages.setdefault(stage, {"count": 0, "p50_ms": [], "p95_ms": []})
+                merged["count"] += stats["count"]
+                merged["p50_ms"].append(stats["p50_ms"])
+                merged["p95_ms"].append(stats["p95_ms"])
+    # Per-invocation percentiles are combined by taking the worst invocation
+    return {stage: {"count": s["count"], "p50_ms": max(s["p50_ms"]), "p95_ms": max(s["p95_ms"])}
+            for stage, s in stages.items()}
+
+
+def run_single(args, size):
+    """
+    Runs one workload in this process and returns its result dict.
+    """
+    sys.path[:0] = [REPO_ROOT, BENCH_DIR]
+    from fake_upstreams import FakeUpstreams, SyntheticNews, UpstreamConfig
+
+    news = SyntheticNews(size, args.pages, duplicate_rate=args.duplicate_rate)
+    configs = {
+        upstream: UpstreamConfig(
+            latency_ms=getattr(args, f'{upstream}_latency_ms'),
+            error_rate=getattr(args, f'{upstream}_429_rate'),
+            malformed_rate=getattr(args, f'{upstream}_malformed_rate', 0.0),
+        )
+        for upstream in ('gnews', 'gemini', 'bedrock')
+    }
+
+    with FakeUpstreams(news, **configs) as upstreams:
+        os.environ.update({
+            'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+            'AWS_ACCESS_KEY_ID': os.environ.get('AWS_ACCESS_KEY_ID', 'bench'),
+            'AWS_SECRET_ACCESS_KEY': os.environ.get('AWS_SECRET_ACCESS_KEY', 'bench'),
+            'GNEWS_API_KEY': 'bench',
+            'GEMINI_API_KEY': 'bench',
+            'GNEWS_URL': f"{upstreams.base_url}/gnews/search",
+            'GEMINI_API_URL': f"{upstreams.base_url}/gemini/models/bench:generateContent",
+            'AWS_ENDPOINT_URL_BEDROCK_RUNTIME': f"{upstreams.base_url}/bedrock",
+            'METRICS_FORMAT': 'json',
+            'VERBOSE_LOGS': 'false',
+            'FUSED_MODE': 'true' if args.fused else 'false',
+        })
+        if not args.keep_rate_limits:
+            for name in ('GNEWS_RPM', 'GEMINI_RPM', 'GEMINI_TPM', 'BEDROCK_RPM'):
+                os.environ[f'RATE_LIMIT_{name}'] = '0'
+
+        mock = contextlib.nullcontext()
+        if args.dynamodb_endpoint:
+            os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.dynamodb_endpoint
+        else:
+            from moto import mock_aws
+            mock = mock_aws()
+
+        with mock:
+            import boto3
+            dynamodb_client = boto3.client('dynamodb')
+            if args.dynamodb_endpoint and 'NewsTable' in dynamodb_client.list_tables()['TableNames']:
+                dynamodb_client.delete_table(TableName='NewsTable')
+                dynamodb_client.get_waiter('table_not_exists').wait(TableName='NewsTable')
+            create_news_table(dynamodb_client)
+
+            result = {"articles": size}
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                scraper = load_module('scraper_lambda', os.path.join(REPO_ROOT, 'scraper', 'lambda_function.py'))
+                start = time.perf_counter()
+                response = scraper.lambda_handler({'topics': news.topics(), 'pages': args.pages}, None)
+                elapsed = time.perf_counter() - start
+            result["scraper"] = {
+                "wall_seconds": round(elapsed, 3),
+                "articles_stored": response.get('count', 0),
+                "articles_per_sec": round(response.get('count', 0) / elapsed, 1) if elapsed else 0.0,
+                "stages": captured_metrics(output.getvalue()),
+            }
+
+            if not args.skip_classifier:
+                # Scan returns typed attribute maps, nearly the shape of a stream NewImage
+                rows = []
+                scan_kwargs = {'TableName': 'NewsTable'}
+                while True:
+                    page = dynamodb_client.scan(**scan_kwargs)
+                    rows.extend(page['Items'])
+                    if 'LastEvaluatedKey' not in page:
+                        break
+                    scan_kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+                records = [
+                    {'eventName': 'INSERT',
+                     'dynamodb': {'Keys': {'url': row['url']}, 'NewImage': stream_image(row), 'SequenceNumber': str(n + 1)}}
+                    for n, row in enumerate(rows)
+                ]
+
+                output = io.StringIO()
+                totals = {}
+                with contextlib.redirect_stdout(output):
+                    classifier = load_module('bedrock_lambda', os.path.join(REPO_ROOT, 'bedrock', 'lambda_function.py'))
+                    start = time.perf_counter()
+                    invocations = 0
+                    for i in range(0, len(records), STREAM_BATCH_SIZE):
+                        response = classifier.lambda_handler({'Records': records[i:i + STREAM_BATCH_SIZE]}, None)
+                        invocations += 1
+                        for key, value in response.items():
+                            if isinstance(value, int):
+                                totals[key] = totals.get(key, 0) + value
+                    elapsed = time.perf_counter() - start
+                result["classifier"] = {
+                    "wall_seconds": round(elapsed, 3),
+                    "invocations": invocations,
+                    "records_per_sec": round(len(records) / elapsed, 1) if elapsed else 0.0,
+                    "invocation_avg_seconds": round(elapsed / invocations, 3) if invocations else 0.0,
+                    **{key: value for key, value in totals.items() if key != 'records'},
+                    "stages": captured_metrics(output.getvalue()),
+                }
+
+        result["upstream_calls"] = upstreams.stats()
+    return result
+
+
+def print_table(results):
+    header = (f"{'articles':>8} {'scrape s':>9} {'art/s':>8} {'stored':>7} {'classify s':>10} {'rec/s':>8} "
+              f"{'gnews':>6} {'gemini':>7} {'bedrock':>8} {'429s':>5} {'bad out':>7}")
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        calls = result["upstream_calls"]
+        classifier = result.get("classifier", {})
+        print(f"{result['articles']:>8} {result['scraper']['wall_seconds']:>9.2f} "
+              f"{result['scraper']['articles_per_sec']:>8.1f} {result['scraper']['articles_stored']:>7} "
+              f"{classifier.get('wall_seconds', 0):>10.2f} {classifier.get('records_per_sec', 0):>8.1f} "
+              f"{calls['gnews']['calls']:>6} {calls['gemini']['calls']:>7} {calls['bedrock']['calls']:>8} "
+              f"{sum(c['throttled'] for c in calls.values()):>5} {sum(c['malformed'] for c in calls.values()):>7}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.single:
+        print(json.dumps(run_single(args, args.single)))
+        return
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    results = []
+    for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+        print(f"⏱️ Benchmarking {size} articles...", file=sys.stderr)
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, '--single', str(size)],
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(completed.stderr, file=sys.stderr)
+            raise SystemExit(f"Benchmark for {size} articles failed")
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print_table(results)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Helpers shared by the scraper and Bedrock Lambda functions.
+
+This package is bundled next to each function's lambda_function.py when the
+deployment zip is built (see the top-level README).
+"""
@@ -0,0 +1,110 @@
+"""
+Precomputed rollups of the classified articles in NewsTable.
+
+The classifier keeps two rows in the aggregates table (partition key
+'aggregate_id') up to date with atomic ADD updates, so dashboards read two
+items instead of scanning the whole news table:
+
+- 'totals': articles, people_affected, confidence_sum, plus
+  'count:<support level>' and 'confidence_sum:<support level>' per level
+- 'needs':  'need:<priority need>' -> number of articles listing it
+
+Each update adds the difference between a row's new and previous
+classification, so reclassifying an article does not count it twice.
+"""
+from decimal import Decimal
+
+TOTALS_ID = 'totals'
+NEEDS_ID = 'needs'
+
+# Longest priority need kept as an attribute name
+MAX_NEED_LENGTH = 64
+
+
+def _number(value):
+    try:
+        return Decimal(str(value or 0))
+    except Exception:
+        return Decimal(0)
+
+
+def contribution(row):
+    """
+    What one classified NewsTable row adds to the rollups, as
+    ({totals attribute: amount}, {needs attribute: amount}). Rows without a
+    support_level have not been classified and contribute nothing.
+    """
+    if not row or not row.get('support_level'):
+        return {}, {}
+
+    level = row['support_level']
+    confidence = _number(row.get('confidence'))
+    totals = {
+        'articles': Decimal(1),
+        'people_affected': _number(row.get('people_affected')),
+        'confidence_sum': confidence,
+        f'count:{level}': Decimal(1),
+        f'confidence_sum:{level}': confidence,
+    }
+    needs = {}
+    for need in row.get('priority_needs') or []:
+        name = ' '.join(str(need).lower().split())[:MAX_NEED_LENGTH]
+        if name:
+            needs[f'need:{name}'] = Decimal(1)
+    return totals, needs
+
+
+def _difference(new, old):
+    delta = dict(new)
+    for name, amount in old.items():
+        delta[name] = delta.get(name, Decimal(0)) - amount
+    return {name: amount for name, amount in delta.items() if amount != 0}
+
+
+def _add(table, aggregate_id, delta):
+    if not delta:
+        return
+    names = {}
+    values = {}
+    clauses = []
+    for i, (name, amount) in enumerate(sorted(delta.items())):
+        names[f'#a{i}'] = name
+        values[f':v{i}'] = amount
+        clauses.append(f'#a{i} :v{i}')
+    table.update_item(
+        Key={'aggregate_id': aggregate_id},
+        UpdateExpression='ADD ' + ', '.join(clauses),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+    )
+
+
+def apply_classification(table, old_row, new_row):
+    """
+    Moves the rollups from `old_row`'s classification to `new_row`'s with
+    one ADD update per aggregate item. `old_row` is the row's previous
+    classification attributes (empty for a first classification).
+    """
+    old_totals, old_needs = contribution(old_row)
+    new_totals, new_needs = contribution(new_row)
+    _add(table, TOTALS_ID, _difference(new_totals, old_totals))
+    _add(table, NEEDS_ID, _difference(new_needs, old_needs))
+
+
+def rebuild(table, rows):
+    """
+    Recomputes both aggregate items from scratch from an iterable of
+    NewsTable rows and overwrites them. Used to seed the rollups for rows
+    classified before they existed, or to correct drift.
+    """
+    totals = {}
+    needs = {}
+    for row in rows:
+        row_totals, row_needs = contribution(row)
+        for target, source in ((totals, row_totals), (needs, row_needs)):
+            for name, amount in source.items():
+                target[name] = target.get(name, Decimal(0)) + amount
+    table.put_item(Item={'aggregate_id': TOTALS_ID, **totals})
+    table.put_item(Item={'aggregate_id': NEEDS_ID, **needs})
+    return totals, needs
+
@@ -0,0 +1,126 @@
+"""
+Shared, lazily created AWS clients for both Lambdas.
+
+boto3 is imported and each client built on first use, not at module load, so
+cold starts that never touch a service (a missing API key, a stream batch with
+nothing to classify) don't pay for it. Clients, resources and tables are
+memoized per process, so warm invocations reuse them and their open
+connections. Every client gets the same tuned botocore Config: a connection
+pool sized for the worker pools, short connect/read timeouts (Bedrock reads
+get a longer one) and the standard retry mode.
+"""
+import os
+import threading
+
+# --- CONFIGURATION (Lambda Environment Variables) ---
+
+# Keep-alive connections per client; at least the largest worker pool using it
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32'))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '10'))
+# Model generation is slower than a DynamoDB call
+BEDROCK_READ_TIMEOUT = float(os.environ.get('BEDROCK_READ_TIMEOUT', '60'))
+# botocore's own variable names, so settings made for plain boto3 still apply
+AWS_RETRY_MODE = os.environ.get('AWS_RETRY_MODE', 'standard')
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '3'))
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_resources = {}
+_tables = {}
+
+
+def client_config(service):
+    """
+    The botocore Config used for `service`'s clients and resources.
+    """
+    from botocore.config import Config
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=BEDROCK_READ_TIMEOUT if service.startswith('bedrock') else AWS_READ_TIMEOUT,
+        retries={'mode': AWS_RETRY_MODE, 'max_attempts': AWS_MAX_ATTEMPTS},
+        tcp_keepalive=True,
+    )
+
+
+def _get_session():
+    # boto3's default session is not safe to create clients from concurrently,
+    # so all clients come from one session under the lock
+    global _session
+    if _session is None:
+        import boto3
+        _session = boto3.session.Session()
+    return _session
+
+
+def client(service):
+    """
+    The shared low-level client for `service`, created on first use.
+    """
+    cached = _clients.get(service)
+    if cached is None:
+        with _lock:
+            cached = _clients.get(service)
+            if cached is None:
+                cached = _get_session().client(service, config=client_config(service))
+                _clients[service] = cached
+    return cached
+
+
+def resource(service):
+    """
+    The shared boto3 resource for `service`, created on first use.
+    """
+    cached = _resources.get(service)
+    if cached is None:
+        with _lock:
+            cached = _resources.get(service)
+            if cached is None:
+                cached = _get_session().resource(service, config=client_config(service))
+                _resources[service] = cached
+    return cached
+
+
+class LazyTable:
+    """
+    Stands in for a boto3 DynamoDB Table until it is first used. `name` is
+    available without creating anything; any other attribute creates the
+    shared dynamodb resource and delegates to its Table.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._table = None
+
+    def __getattr__(self, attribute):
+        if self._table is None:
+            self._table = resource('dynamodb').Table(self.name)
+        return getattr(self._table, attribute)
+
+    def __repr__(self):
+        return f"LazyTable({self.name!r})"
+
+
+def table(name):
+    """
+    The shared (lazy) Table for `name`.
+    """
+    with _lock:
+        cached = _tables.get(name)
+        if cached is None:
+            cached = _tables[name] = LazyTable(name)
+    return cached
+
+
+def reset():
+    """
+    Drops every cached client, e.g. after changing endpoints in a benchmark.
+    """
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
+        _resources.clear()
+        _tables.clear()
@@ -0,0 +1,83 @@
+"""
+Buffered DynamoDB writer built on BatchWriteItem.
+"""
+import random
+import time
+
+from common import metrics
+
+
+class BatchItemWriter:
+    """
+    Buffers put requests and writes them in BatchWriteItem calls of up to 25
+    items, retrying UnprocessedItems with jittered backoff. Use it as a context
+    manager so the last partial batch is flushed on exit.
+
+    Items are plain Python values (the DynamoDB service resource serializes
+    them). A repeated key in the buffer replaces the earlier item, since
+    BatchWriteItem rejects duplicate keys within one request.
+    """
+
+    MAX_BATCH_SIZE = 25
+
+    def __init__(self, dynamodb, table_name, key_attributes=('url',), batch_size=25, max_retries=5):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key_attributes = key_attributes
+        self.batch_size = max(1, min(batch_size, self.MAX_BATCH_SIZE))
+        self.max_retries = max_retries
+        self._buffer = {}
+        self.stats = {"items": 0, "batches": 0, "retries": 0, "seconds": 0.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Only flush on a clean exit; on error the caller decides what to keep
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def put(self, item):
+        key = tuple(item[attr] for attr in self.key_attributes)
+        self._buffer[key] = item
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes everything currently buffered. Raises if DynamoDB still reports
+        unprocessed items after `max_retries` retries.
+        """
+        if not self._buffer:
+            return
+        items = list(self._buffer.values())
+        self._buffer.clear()
+
+        start = time.perf_counter()
+        requests = [{'PutRequest': {'Item': item}} for item in items]
+        for attempt in range(self.max_retries + 1):
+            with metrics.timer("dynamodb.batch_write"):
+                response = self.dynamodb.batch_write_item(RequestItems={self.table_name: requests})
+            self.stats["batches"] += 1
+            requests = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            if not requests:
+                break
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                metrics.count("retries.dynamodb.batch_write")
+                delay = min(5.0, 0.05 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f"⚠️ {len(requests)} unprocessed items. Retrying in {delay:.2f} seconds.")
+                time.sleep(delay)
+        else:
+            self.stats["seconds"] += time.perf_counter() - start
+            raise Exception(f"DynamoDB left {len(requests)} items unwritten after {self.max_retries} retries.")
+
+        self.stats["seconds"] += time.perf_counter() - start
+        self.stats["items"] += len(items)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["seconds"] = round(stats["seconds"], 3)
+        stats["items_per_sec"] = round(stats["items"] / self.stats["seconds"], 1) if self.stats["seconds"] else 0.0
+        return stats
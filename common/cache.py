@@ -0,0 +1,188 @@
+"""
+Small tiered cache used to avoid repeating paid work across invocations.
+
+TieredCache checks an in-process LRU first (kept alive across warm Lambda
+invocations) and then an optional persistent tier with a TTL: a DynamoDB table
+for deployed functions or a local JSON file for local runs.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded in-memory cache with least-recently-used eviction.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class DynamoCacheTier:
+    """
+    Persistent cache tier backed by a DynamoDB table with partition key
+    `cache_key` and DynamoDB TTL enabled on the `expires_at` attribute.
+    """
+
+    def __init__(self, table, ttl_seconds):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        now = int(time.time())
+        # BatchGetItem accepts at most 100 keys per request
+        for i in range(0, len(keys), 100):
+            request = {self.table.name: {'Keys': [{'cache_key': key} for key in keys[i:i + 100]]}}
+            while request:
+                response = self.table.meta.client.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table.name, []):
+                    # TTL deletion runs lazily, so expired items can still be returned
+                    if int(item.get('expires_at', 0)) > now:
+                        found[item['cache_key']] = item['value']
+                request = response.get('UnprocessedKeys') or None
+        return found
+
+    def put_many(self, entries):
+        expires_at = int(time.time()) + self.ttl_seconds
+        with self.table.batch_writer(overwrite_by_pkeys=['cache_key']) as writer:
+            for key, value in entries.items():
+                writer.put_item(Item={'cache_key': key, 'value': value, 'expires_at': expires_at})
+
+
+class FileCacheTier:
+    """
+    Persistent cache tier stored as a JSON file, for local runs without DynamoDB.
+    """
+
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get_many(self, keys):
+        now = time.time()
+        with self._lock:
+            entries = self._load()
+            return {
+                key: entries[key]['value']
+                for key in keys
+                if key in entries and entries[key]['expires_at'] > now
+            }
+
+    def put_many(self, entries):
+        expires_at = int(time.time()) + self.ttl_seconds
+        with self._lock:
+            stored = self._load()
+            for key, value in entries.items():
+                stored[key] = {'value': value, 'expires_at': expires_at}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.path)
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of an optional persistent tier, with hit/miss counters.
+    """
+
+    def __init__(self, max_entries=1024, persistent=None):
+        self.memory = LRUCache(max_entries)
+        self.persistent = persistent
+        self._stats_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def get_many(self, keys):
+        """
+        Returns a dict of key -> value for every key found in either tier.
+        Persistent hits are promoted into the in-memory tier.
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.memory.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        self._count("memory_hits", len(found))
+
+        if missing and self.persistent is not None:
+            try:
+                persisted = self.persistent.get_many(missing)
+            except Exception as e:
+                print(f"⚠️ Persistent cache read failed: {e}")
+                self._count("errors")
+                persisted = {}
+            for key, value in persisted.items():
+                self.memory.put(key, value)
+            found.update(persisted)
+            self._count("persistent_hits", len(persisted))
+
+        self._count("misses", len(set(keys)) - len(set(found)))
+        return found
+
+    def put_many(self, entries):
+        if not entries:
+            return
+        for key, value in entries.items():
+            self.memory.put(key, value)
+        self._count("writes", len(entries))
+        if self.persistent is not None:
+            try:
+                self.persistent.put_many(entries)
+            except Exception as e:
+                print(f"⚠️ Persistent cache write failed: {e}")
+                self._count("errors")
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["persistent_hits"] + stats["misses"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 3) if lookups else 0.0
+        return stats
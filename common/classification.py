@@ -0,0 +1,70 @@
+"""
+Shared bookkeeping for the disaster classification step.
+
+Every classified row stores the classifier version and a hash of the inputs
+the classifier read. A row whose stored hash matches its current inputs has
+already been classified by this version and does not need another model call.
+The classifier and the scraper's fused mode turn a classification into row
+attributes the same way, with classification_attributes().
+"""
+import hashlib
+import os
+from decimal import Decimal
+
+from common import metrics
+
+# Bump (or set per deployment) when the prompt or model changes, so every
+# row is treated as stale and classified again.
+CLASSIFIER_VERSION = os.environ.get('CLASSIFIER_VERSION', 'llama3-8b-v1')
+
+# Written when the detected location resolves, removed when it no longer does
+PLACE_ATTRIBUTES = ('latitude', 'longitude', 'place_id', 'place_name')
+
+# Written when the model's output can't be parsed, so scans and the stream skip
+# the row until its inputs or CLASSIFIER_VERSION change; removed on success
+PARSE_FAILED_ATTRIBUTE = 'parse_failed_hash'
+
+
+def analysis_inputs_hash(title, content, version=CLASSIFIER_VERSION):
+    """
+    Hash of the classifier version and the article fields it analyses.
+    """
+    data = f"{version}\x1f{title or ''}\x1f{content or ''}"
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def parse_failure_marker(input_hash, version=CLASSIFIER_VERSION):
+    """
+    PARSE_FAILED_ATTRIBUTE value for a failed classification of `input_hash`.
+    It starts with the version so a Scan filter can match it with begins_with.
+    """
+    return f"{version}:{input_hash}"
+
+
+def classification_attributes(parsed, location='Unknown', geocoder=None):
+    """
+    NewsTable attributes for a validated classification (see
+    common.model_output.validate_classification), with the PLACE_ATTRIBUTES
+    when `geocoder` resolves the detected location, or failing that `location`.
+    """
+    detected_location = parsed.get("location") or location
+    attributes = {
+        "support_level": parsed.get("support_level") or "Unknown",
+        "confidence": Decimal(str(parsed.get("confidence", 0.0))),
+        "detected_location": detected_location,
+        "priority_needs": parsed.get("priority_needs") or [],
+        "people_affected": parsed.get("people_affected") or 0,
+    }
+    if geocoder is not None:
+        with metrics.timer("geocode"):
+            place = geocoder.geocode(detected_location)
+            if place is None and location != detected_location:
+                place = geocoder.geocode(location)
+        if place is not None:
+            attributes.update({
+                "latitude": Decimal(str(place["latitude"])),
+                "longitude": Decimal(str(place["longitude"])),
+                "place_id": place["place_id"],
+                "place_name": place["name"],
+            })
+    return attributes
@@ -0,0 +1,177 @@
+"""
+Near-duplicate clustering of articles into events.
+
+Each article's title + description gets a MinHash signature over word
+shingles. Signatures are split into bands for locality-sensitive hashing
+(LSH): two articles that share any band bucket are candidates, and a
+candidate joins an existing event when the estimated Jaccard similarity of
+the signatures reaches the threshold.
+
+Band buckets are kept in a TieredCache (in-memory LRU plus an optional
+DynamoDB/file tier with a TTL), so articles are matched against events seen
+in earlier invocations, and events stop attracting new articles once their
+buckets expire. A bucket holds every event that hashed to it (up to
+MAX_BUCKET_EVENTS, oldest first), so a new event never evicts an older one.
+"""
+import hashlib
+import json
+import random
+import re
+import struct
+import unicodedata
+
+# Mersenne prime modulus for the MinHash permutations
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Events kept per band bucket; later ones are dropped rather than evicting older ones
+MAX_BUCKET_EVENTS = 8
+
+
+def shingles(text, size=2):
+    """
+    Set of `size`-word shingles of normalized text (single words for very short texts).
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    tokens = re.sub(r'[^\w\s]', ' ', text).split()
+    if len(tokens) < size:
+        return set(tokens)
+    return {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash with `num_perm` universal-hash permutations of a 64-bit shingle hash.
+    """
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, text):
+        """
+        MinHash signature of `text`, or None when it has no shingles: every
+        empty text would get the same all-max signature and match the others.
+        """
+        hashes = [
+            struct.unpack('<Q', hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest())[0]
+            for shingle in shingles(text)
+        ]
+        if not hashes:
+            return None
+        return [min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in self.permutations]
+
+
+def similarity(signature_a, signature_b):
+    """
+    Estimated Jaccard similarity of the shingle sets behind two signatures.
+    """
+    if not signature_a or len(signature_a) != len(signature_b):
+        return 0.0
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+def bucket_events(value):
+    """
+    Events stored in a bucket value. Older index entries hold one event
+    object rather than a list.
+    """
+    events = json.loads(value)
+    return events if isinstance(events, list) else [events]
+
+
+def event_id_for(url):
+    return 'evt_' + hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+
+
+class EventIndex:
+    """
+    LSH index of event signatures. `bands` * rows-per-band must equal the
+    hasher's num_perm; with 16 bands of 4 rows, pairs above ~0.5 similarity
+    are very likely to share a bucket.
+    """
+
+    def __init__(self, cache, hasher=None, bands=16, threshold=0.5):
+        self.cache = cache
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self.threshold = threshold
+
+    def band_keys(self, signature):
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(','.join(map(str, chunk)).encode('ascii'), digest_size=8).hexdigest()
+            keys.append(f"lsh:{band}:{digest}")
+        return keys
+
+    def assign(self, articles):
+        """
+        Assigns each (url, text) pair, in order, to an event. Returns one dict
+        per article: event_id, representative_url (the first article seen for
+        the event), new_event (the event was created by this batch) and
+        similarity to the representative. Articles without any text to
+        compare get None and stay out of the index.
+
+        One cache lookup covers the whole batch. Nothing is written: once the
+        representatives' rows are stored, pass the assignments to commit() so
+        later batches match the new events.
+        """
+        signatures = [self.hasher.signature(text) for _, text in articles]
+        keys_per_article = [self.band_keys(signature) if signature else [] for signature in signatures]
+        persisted = self.cache.get_many(list({key for keys in keys_per_article for key in keys}))
+        persisted = {key: bucket_events(value) for key, value in persisted.items()}
+
+        local = {}
+        assignments = []
+        for (url, _), signature, keys in zip(articles, signatures, keys_per_article):
+            if signature is None:
+                assignments.append(None)
+                continue
+            best, best_similarity = None, 0.0
+            for key in keys:
+                for entry in persisted.get(key, []) + local.get(key, []):
+                    score = similarity(signature, entry['signature'])
+                    if score >= self.threshold and score > best_similarity:
+                        best, best_similarity = entry, score
+
+            if best is None:
+                entry = {'event_id': event_id_for(url), 'url': url, 'signature': signature, 'new': True}
+                for key in keys:
+                    local.setdefault(key, []).append(entry)
+                # Only the assignment that created the event carries its signature
+                assignments.append({'event_id': entry['event_id'], 'representative_url': url,
+                                    'new_event': True, 'similarity': 1.0, 'signature': signature})
+            else:
+                assignments.append({'event_id': best['event_id'], 'representative_url': best['url'],
+                                    'new_event': bool(best.get('new')), 'similarity': round(best_similarity, 3)})
+        return assignments
+
+    def commit(self, assignments):
+        """
+        Adds the events created by assign() to the index, appending each to
+        its buckets after the events already there. Call it only after the
+        representatives' rows are written, so no article is ever matched to
+        an event whose first row is missing. Returns the number of events added.
+        """
+        created = [assignment for assignment in assignments if assignment and 'signature' in assignment]
+        keys_per_event = [self.band_keys(assignment['signature']) for assignment in created]
+        stored = self.cache.get_many(list({key for keys in keys_per_event for key in keys}))
+        buckets = {key: bucket_events(value) for key, value in stored.items()}
+
+        updated = set()
+        for assignment, keys in zip(created, keys_per_event):
+            entry = {'event_id': assignment['event_id'], 'url': assignment['representative_url'],
+                     'signature': assignment['signature']}
+            for key in keys:
+                events = buckets.setdefault(key, [])
+                if len(events) < MAX_BUCKET_EVENTS and all(e['event_id'] != entry['event_id'] for e in events):
+                    events.append(entry)
+                    updated.add(key)
+
+        self.cache.put_many({key: json.dumps(buckets[key]) for key in updated})
+        return len(created)
@@ -0,0 +1,91 @@
+"""
+URL canonicalization and a Bloom filter of recently seen article URLs.
+"""
+import hashlib
+import math
+import threading
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+# Well-known click and campaign tracking parameters that never change the
+# article. Generic names such as 'cid' or 'ref' are left alone: some sites use
+# them as the content id, and dropping them would merge distinct articles.
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'twclid',
+    'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl',
+}
+TRACKING_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    """
+    Normalizes an article URL so that syndication and tracking variants of the
+    same link compare equal: lowercases scheme and host, drops default ports,
+    fragments and tracking query parameters, sorts the remaining parameters
+    (keeping their original encoding) and strips a trailing slash from the path.
+    """
+    if not url:
+        return url
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url.strip()
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    # Filter the raw key=value pairs; only the key is decoded, for the comparison
+    query = []
+    for pair in parts.query.split('&'):
+        key = unquote_plus(pair.partition('=')[0]).lower()
+        if pair and key not in TRACKING_PARAMS and not key.startswith(TRACKING_PREFIXES):
+            query.append(pair)
+    return urlunsplit((scheme, host, path, '&'.join(sorted(query)), ''))
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter. `might_contain` has no false negatives and a false
+    positive rate close to `error_rate` while at most `capacity` items are
+    stored; once the capacity is reached the filter starts over, so it always
+    describes the most recently added items.
+    """
+
+    def __init__(self, capacity=10000, error_rate=0.001):
+        self.capacity = max(1, capacity)
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        with self._lock:
+            if self._count >= self.capacity:
+                self._bits = bytearray(len(self._bits))
+                self._count = 0
+            for pos in positions:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+            self._count += 1
+
+    def might_contain(self, item):
+        positions = self._positions(item)
+        with self._lock:
+            return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in positions)
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,247 @@
+"""
+Offline geocoding of the free-text locations the classifier returns.
+
+Place names are matched against a gazetteer loaded from a TSV file
+(common/data/gazetteer.tsv by default; GAZETTEER_FILE points at a larger one
+with the same columns). Names are indexed in a token trie, so every known
+place mentioned anywhere in "Flooding near Houston, Texas" is found in one
+pass over the text. A name only counts when it stands on its own, so "Rio
+Grande valley" is not Rio. The most specific match wins, unless the text also
+names a state or country it is not in ("Paris, Texas" is not Paris, France),
+or qualifies it with a region the gazetteer doesn't know ("Sydney, Nova
+Scotia" is not Sydney, Australia).
+
+Resolving is local and cheap, so results are only memoized in an in-process
+LRU; a repeated place name costs one dictionary lookup. build_geocoder()
+creates the geocoder both Lambdas use from the GEOCODING_ENABLED,
+GAZETTEER_FILE and GEOCODE_CACHE_SIZE environment variables.
+"""
+import os
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+
+from common.cache import LRUCache
+
+DEFAULT_GAZETTEER_FILE = os.path.join(os.path.dirname(__file__), 'data', 'gazetteer.tsv')
+
+# --- CONFIGURATION (Lambda Environment Variables) ---
+
+# Resolved names (and misses) are memoized in memory, GEOCODE_CACHE_SIZE entries.
+GEOCODING_ENABLED = os.environ.get('GEOCODING_ENABLED', 'true').lower() == 'true'
+GAZETTEER_FILE = os.environ.get('GAZETTEER_FILE', DEFAULT_GAZETTEER_FILE)
+GEOCODE_CACHE_SIZE = int(os.environ.get('GEOCODE_CACHE_SIZE', '4096'))
+
+Place = namedtuple('Place', ['place_id', 'name', 'kind', 'country', 'admin1', 'latitude', 'longitude', 'population'])
+
+# More specific places win over the regions that contain them
+KIND_RANK = {'city': 3, 'admin1': 2, 'country': 1}
+
+# Marker for the list of places that end at a trie node
+_END = '\0'
+
+
+def _ascii(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return text.replace("'", '')
+
+
+def normalize_name(text):
+    """
+    Lowercase ASCII tokens of a place name: "São Paulo, BR" -> ['sao', 'paulo', 'br'].
+    """
+    return re.sub(r'[^a-z0-9]+', ' ', _ascii(text).lower()).split()
+
+
+def is_ambiguous_alias(label):
+    """
+    True for short all-caps abbreviations such as "LA" or "UK", which also
+    read as ordinary words ("La Palma") or other places' codes.
+    """
+    return len(label) <= 3 and label.isupper()
+
+
+class TokenTrie:
+    """
+    Trie over name tokens. `find` returns every indexed name that occurs as a
+    run of consecutive tokens in the input.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, tokens, value):
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(_END, []).append(value)
+
+    def find(self, tokens):
+        """
+        Yields (start, end, values) for each match, `end` exclusive.
+        """
+        for start in range(len(tokens)):
+            node = self.root
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if _END in node:
+                    yield start, end + 1, node[_END]
+
+
+class Gazetteer:
+    """
+    Places from a gazetteer TSV file, indexed by name and alternate names.
+    """
+
+    def __init__(self, path=DEFAULT_GAZETTEER_FILE):
+        self.places = []
+        self.trie = TokenTrie()
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                place_id, name, kind, country, admin1, latitude, longitude, population = fields[:8]
+                alternate_names = fields[8].split('|') if len(fields) > 8 and fields[8] else []
+                place = Place(place_id, name, kind, country, admin1,
+                              float(latitude), float(longitude), int(population or 0))
+                self.places.append(place)
+                for label in [name] + [alias for alias in alternate_names if not is_ambiguous_alias(alias)]:
+                    tokens = normalize_name(label)
+                    if tokens:
+                        self.trie.add(tokens, place)
+
+    def resolve(self, text):
+        """
+        The best matching Place for a free-text location, or None.
+        """
+        text = _ascii(text)
+        words = list(re.finditer(r'[A-Za-z0-9]+', text))
+        tokens = [word.group().lower() for word in words]
+        matches = list(self.trie.find(tokens))
+        starts = {start for start, _, _ in matches}
+
+        def stands_alone(end):
+            # "Riverside Town" and "Rio Grande" name other places: a match
+            # directly followed by another capitalized word only counts when
+            # that word starts a match of its own ("Houston Texas")
+            if end == len(words) or end in starts:
+                return True
+            gap = text[words[end - 1].end():words[end].start()]
+            return bool(gap.strip()) or not words[end].group()[0].isupper()
+
+        # Drop matches nested inside a longer one ("york" within "new york city")
+        spans = [(start, end) for start, end, _ in matches]
+        candidates = []
+        for start, end, places in matches:
+            if any(s <= start and end <= e and (s, e) != (start, end) for s, e in spans):
+                continue
+            if not stands_alone(end):
+                continue
+            candidates.extend(((start, end), place) for place in places)
+
+        def unknown_qualifier(end):
+            # The comma-separated words right after a match ("Sydney, Nova
+            # Scotia") that name no known place
+            if end == len(words) or ',' not in text[words[end - 1].end():words[end].start()]:
+                return False
+            stop = end + 1
+            while stop < len(words) and not re.search(r'[,;()/]', text[words[stop - 1].end():words[stop].start()]):
+                stop += 1
+            qualifier = text[words[end].start():words[stop - 1].end()]
+            if not qualifier[0].isupper() or is_ambiguous_alias(qualifier):
+                return False
+            return not any(end <= start < stop for start in starts)
+
+        def named_regions(span):
+            # Countries and (country, state) pairs named elsewhere in the text
+            regions = [other for other_span, other in candidates
+                       if other_span != span and other.kind in ('country', 'admin1')]
+            countries = {other.country for other in regions}
+            states = {(other.country, other.admin1) for other in regions if other.kind == 'admin1'}
+            return countries, states
+
+        def conflicts(span, place):
+            if place.kind == 'country':
+                return False
+            countries, states = named_regions(span)
+            # A place outside every country named, or outside every state named
+            # in its own country, is some other place of the same name
+            if countries and place.country not in countries:
+                return True
+            if place.kind == 'city' and place.admin1 and (place.country, place.admin1) not in states:
+                if any(country == place.country for country, _ in states):
+                    return True
+            return unknown_qualifier(span[1])
+
+        candidates = [(span, place) for span, place in candidates if not conflicts(span, place)]
+        if not candidates:
+            return None
+
+        def score(candidate):
+            span, place = candidate
+            countries, states = named_regions(span)
+            in_country = place.kind != 'country' and place.country in countries
+            in_state = place.kind == 'city' and (place.country, place.admin1) in states
+            return (KIND_RANK.get(place.kind, 0), in_country + 2 * in_state, place.population)
+
+        return max(candidates, key=score)[1]
+
+
+class Geocoder:
+    """
+    Resolves location strings against a Gazetteer, memoizing results in process.
+    """
+
+    def __init__(self, gazetteer, max_entries=4096):
+        self.gazetteer = gazetteer
+        self.cache = LRUCache(max_entries)
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "resolved": 0, "unresolved": 0, "cache_hits": 0}
+
+    def geocode(self, text):
+        """
+        Returns {"place_id", "name", "latitude", "longitude"} for `text`, or
+        None when no gazetteer place matches. Misses are memoized too.
+        """
+        if not text or not normalize_name(text):
+            return None
+        # Case and punctuation matter to resolve(), so the raw text is the key
+        key = text.strip()
+        cached = self.cache.get(key)
+        if cached is not None:
+            result = cached or None
+        else:
+            place = self.gazetteer.resolve(text)
+            result = None
+            if place is not None:
+                result = {
+                    "place_id": place.place_id,
+                    "name": place.name,
+                    "latitude": place.latitude,
+                    "longitude": place.longitude,
+                }
+            self.cache.put(key, result or {})
+
+        with self._lock:
+            self.stats["lookups"] += 1
+            self.stats["cache_hits"] += cached is not None
+            self.stats["resolved" if result else "unresolved"] += 1
+        return result
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+def build_geocoder():
+    """
+    Creates the geocoder from the GAZETTEER_FILE and GEOCODE_CACHE_SIZE
+    environment variables, or returns None when GEOCODING_ENABLED is false.
+    """
+    if not GEOCODING_ENABLED:
+        return None
+    return Geocoder(Gazetteer(GAZETTEER_FILE), GEOCODE_CACHE_SIZE)
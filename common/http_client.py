@@ -0,0 +1,218 @@
+"""
+Pooled HTTP client shared by every outbound API call (GNews, Gemini).
+
+The client lives at module level, so warm Lambda invocations reuse open
+keep-alive connections instead of paying a fresh TCP+TLS handshake per call.
+Set HTTP2_ENABLED=true to use httpx with HTTP/2 when it is installed
+(`pip install httpx[http2]`); otherwise requests + urllib3 pooling is used.
+"""
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import metrics
+from common.rate_limiter import get_limiter, parse_retry_after
+
+# --- CONFIGURATION (Lambda Environment Variables) ---
+
+# Number of distinct hosts to keep pools for, and connections kept per host
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '4'))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))
+HTTP2_ENABLED = os.environ.get('HTTP2_ENABLED', 'false').lower() == 'true'
+
+_client = None
+_client_lock = threading.Lock()
+
+# Per-host latency counters: host -> {"requests", "total_ms", "first_ms"}
+_latency = {}
+_latency_lock = threading.Lock()
+
+
+def _build_client():
+    """
+    Creates the underlying pooled client. Prefers httpx when HTTP/2 is requested
+    and available, falling back to a requests.Session.
+    """
+    if HTTP2_ENABLED:
+        try:
+            import httpx
+            limits = httpx.Limits(
+                max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+            )
+            return httpx.Client(http2=True, limits=limits)
+        except ImportError:
+            print("⚠️ HTTP2_ENABLED is set but httpx[http2] is not installed. Using requests.")
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_client():
+    """
+    Returns the module-level pooled client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def _record_latency(url, elapsed_ms):
+    host = urlsplit(url).netloc
+    with _latency_lock:
+        stats = _latency.get(host)
+        if stats is None:
+            # The first request to a host pays the connection setup
+            _latency[host] = {"requests": 1, "total_ms": elapsed_ms, "first_ms": elapsed_ms}
+        else:
+            stats["requests"] += 1
+            stats["total_ms"] += elapsed_ms
+
+
+def request(method, url, headers=None, params=None, data=None, timeout=15):
+    """
+    Sends a request through the pooled client and raises for 4XX/5XX responses.
+
+    Errors are always raised as requests exceptions (HTTPError carries the
+    response), whichever client is in use, so callers only handle one family.
+    """
+    client = get_client()
+    start = time.perf_counter()
+
+    if isinstance(client, requests.Session):
+        response = client.request(method, url, headers=headers, params=params, data=data, timeout=timeout)
+    else:
+        import httpx
+        try:
+            response = client.request(method, url, headers=headers, params=params, content=data, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    _record_latency(url, (time.perf_counter() - start) * 1000)
+
+    if response.status_code >= 400:
+        raise requests.exceptions.HTTPError(
+            f"{response.status_code} Error for url: {urlsplit(url)._replace(query='').geturl()}",
+            response=response,
+        )
+    return response
+
+
+def get(url, headers=None, params=None, timeout=15):
+    return request('GET', url, headers=headers, params=params, timeout=timeout)
+
+
+def post(url, headers=None, data=None, timeout=15):
+    return request('POST', url, headers=headers, data=data, timeout=timeout)
+
+
+def get_latency_stats():
+    """
+    Returns per-host latency counters. `est_handshake_saved_ms` estimates the
+    time saved by reusing connections: the extra cost of the first (cold)
+    request over the warm average, multiplied by the number of warm requests.
+    """
+    with _latency_lock:
+        snapshot = {host: dict(stats) for host, stats in _latency.items()}
+
+    for stats in snapshot.values():
+        warm_requests = stats["requests"] - 1
+        stats["avg_ms"] = round(stats["total_ms"] / stats["requests"], 2)
+        if warm_requests > 0:
+            warm_avg = (stats["total_ms"] - stats["first_ms"]) / warm_requests
+            stats["warm_avg_ms"] = round(warm_avg, 2)
+            stats["est_handshake_saved_ms"] = round(max(0.0, stats["first_ms"] - warm_avg) * warm_requests, 2)
+        else:
+            stats["warm_avg_ms"] = None
+            stats["est_handshake_saved_ms"] = 0.0
+        stats["total_ms"] = round(stats["total_ms"], 2)
+        stats["first_ms"] = round(stats["first_ms"], 2)
+    return snapshot
+
+
+def safe_api_request(url, headers, params, max_retries=3, limiter=None, token_cost=0):
+    """
+    Handles API requests with basic retries for transient errors (5xx) 
+    and checks for client errors (4xx).
+    Requests go through the shared connection pool above.
+
+    `limiter` names a common.rate_limiter bucket ('gnews', 'gemini') to draw
+    from before every attempt; `token_cost` is also drawn from the matching
+    '<limiter>_tokens' bucket when one is configured. On a 429 the bucket
+    honours the Retry-After header and slows down, and the next attempt waits
+    on the bucket instead of a fixed sleep.
+    """
+    bucket = get_limiter(limiter) if limiter else None
+    token_bucket = get_limiter(f"{limiter}_tokens") if limiter and token_cost else None
+    stage = limiter or urlsplit(url).hostname
+    if token_cost:
+        metrics.count(f"tokens.{stage}", token_cost)
+
+    for attempt in range(max_retries):
+        if attempt:
+            metrics.count(f"retries.{stage}")
+        try:
+            with metrics.timer(f"rate_wait.{stage}"):
+                if bucket is not None:
+                    bucket.acquire()
+                if token_bucket is not None:
+                    token_bucket.acquire(token_cost)
+
+            # Determine if it's a POST (for Gemini) or GET (for GNews)
+            # Both raise an exception for 4XX or 5XX status codes
+            with metrics.timer(f"http.{stage}"):
+                if headers.get('Content-Type') == 'application/json':
+                    response = post(url, headers=headers, data=params, timeout=15)
+                else:
+                    response = get(url, headers=headers, params=params, timeout=15)
+
+            if bucket is not None:
+                bucket.on_success()
+            return response
+        except requests.exceptions.HTTPError as e:
+            response = e.response
+            print(f"❌ HTTP Error (Attempt {attempt + 1}): {e}")
+            
+            # Print raw error content for debugging
+            print(f"Raw Error Content: {response.text}")
+
+            if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if bucket is not None:
+                    # The limiter paces the next attempt
+                    bucket.penalize(retry_after)
+                    print(f"⚠️ Rate limit hit. Slowing '{limiter}' (Retry-After: {retry_after}).")
+                    if attempt < max_retries - 1:
+                        continue
+                else:
+                    # Honour Retry-After, else use exponential backoff
+                    delay = retry_after if retry_after is not None else 2 ** attempt + random.uniform(0, 1)
+                    print(f"⚠️ Rate limit hit. Waiting {delay:.2f} seconds.")
+                    if attempt < max_retries - 1:
+                        time.sleep(delay)
+                        continue
+            
+            # For 400/403/other persistent errors, re-raise immediately
+            raise
+        except requests.exceptions.RequestException as e:
+            # Connection errors, timeouts, etc.
+            print(f"❌ Request Error (Attempt {attempt + 1}): {e}")
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt + random.uniform(0, 1))
+                continue
+            raise
+    
+    raise Exception(f"Failed to complete request after {max_retries} attempts.")
@@ -0,0 +1,411 @@
+"""
+Pluggable model backends for summarization and classification.
+
+Every backend implements the same interface, so each pipeline picks its model
+by name (SUMMARY_BACKEND in the scraper, CLASSIFY_BACKEND in the classifier):
+
+- 'gemini'  – Gemini generateContent over HTTPS
+- 'bedrock' – Meta Llama 3 through Bedrock invoke_model, plus Bedrock batch
+              inference jobs for large backfills
+- 'local'   – deterministic, offline heuristics; no network and no cost, for
+              tests, benchmarks and dry runs
+
+Backends raise on failure; callers decide how to degrade.
+"""
+import json
+import os
+import re
+import threading
+
+from common import aws, metrics
+from common.model_output import SUPPORT_LEVELS, iter_json_objects, parse_analysis, parse_classification
+from common.prompts import (
+    build_analysis_prompt,
+    build_batch_summary_prompt,
+    build_classification_prompt,
+    build_repair_prompt,
+    build_summary_prompt,
+)
+from common.rate_limiter import get_limiter
+
+# --- CONFIGURATION (Lambda Environment Variables) ---
+
+# Your Gemini API Key
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash')
+GEMINI_API_URL = os.environ.get(
+    'GEMINI_API_URL',
+    f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
+)
+
+BEDROCK_MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', 'meta.llama3-8b-instruct-v1:0')
+# Bedrock batch inference: S3 prefix for job input/output and the service role it runs as
+BEDROCK_BATCH_S3_URI = os.environ.get('BEDROCK_BATCH_S3_URI', '')
+BEDROCK_BATCH_ROLE_ARN = os.environ.get('BEDROCK_BATCH_ROLE_ARN', '')
+
+# Bedrock rejects batch inference jobs with fewer records than this
+BEDROCK_BATCH_MIN_RECORDS = 100
+
+# Generation settings for Llama 3
+LLAMA_GENERATION = {"max_gen_len": 512, "temperature": 0.7, "top_p": 0.9}
+
+# Bedrock error codes that mean we are over the model's request quota
+THROTTLING_ERROR_CODES = ('ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException')
+
+# Structured output for batch summaries: one {url, summary} object per article
+SUMMARY_BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "url": {"type": "STRING"},
+            "summary": {"type": "STRING"}
+        },
+        "required": ["url", "summary"]
+    }
+}
+
+
+# Structured output for the fused mode: the summary plus the classification fields
+ANALYSIS_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "summary": {"type": "STRING"},
+        "location": {"type": "STRING"},
+        "support_level": {"type": "STRING", "enum": list(SUPPORT_LEVELS)},
+        "confidence": {"type": "NUMBER"},
+        "priority_needs": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "people_affected": {"type": "INTEGER"}
+    },
+    "required": ["summary", "location", "support_level", "confidence", "priority_needs", "people_affected"]
+}
+
+
+class InferenceError(Exception):
+    """
+    Raised when a backend returns no usable completion.
+    """
+
+
+def batch_s3_location(*parts):
+    """
+    (bucket, key) for a path under BEDROCK_BATCH_S3_URI, joined from the
+    non-empty parts.
+    """
+    if not BEDROCK_BATCH_S3_URI or not BEDROCK_BATCH_ROLE_ARN:
+        raise InferenceError("BEDROCK_BATCH_S3_URI and BEDROCK_BATCH_ROLE_ARN must be set for batch jobs.")
+    bucket, _, prefix = BEDROCK_BATCH_S3_URI.replace('s3://', '', 1).partition('/')
+    return bucket, '/'.join(filter(None, (prefix.strip('/'), *parts)))
+
+
+class InferenceBackend:
+    """
+    Common interface. Remote backends only implement `complete`; the task
+    methods build prompts from common.prompts on top of it.
+    """
+
+    name = 'base'
+
+    def complete(self, prompt, response_schema=None):
+        """
+        Returns the model's text completion for a common.prompts.Prompt.
+        """
+        raise NotImplementedError
+
+    def summarize(self, title, description, max_chars=500):
+        prompt = build_summary_prompt(title, description, max_chars)
+        metrics.log(f"   -> Prompt tokens: ~{prompt.tokens}{' (description trimmed)' if prompt.trimmed else ''}")
+        # Final safety check truncation
+        return self.complete(prompt).strip()[:max_chars]
+
+    def summarize_batch(self, articles, max_chars=500):
+        """
+        Summarizes several articles in one call. Returns a dict of article URL
+        -> summary holding only the articles that came back usable.
+        """
+        prompt = build_batch_summary_prompt(articles, max_chars)
+        metrics.log(f"   -> Prompt tokens: ~{prompt.tokens}{' (descriptions trimmed)' if prompt.trimmed else ''}")
+        text = self.complete(prompt, response_schema=SUMMARY_BATCH_RESPONSE_SCHEMA)
+        try:
+            entries = json.loads(text)
+        except ValueError:
+            # Models without schema enforcement may wrap the array in prose
+            entries = []
+            for candidate in iter_json_objects(text):
+                try:
+                    entries.append(json.loads(candidate))
+                except ValueError:
+                    continue
+
+        wanted_urls = {article['url'] for article in articles}
+        summaries = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            url = entry.get('url')
+            summary = entry.get('summary')
+            if url in wanted_urls and isinstance(summary, str) and summary.strip():
+                summaries[url] = summary.strip()[:max_chars]
+        return summaries
+
+    def classify(self, title, content):
+        """
+        Returns the raw classification completion for one article; parse it
+        with common.model_output.parse_classification.
+        """
+        prompt = build_classification_prompt(title, content)
+        metrics.log(f"🔹 Prompt tokens: ~{prompt.tokens}{' (content trimmed)' if prompt.trimmed else ''}")
+        return self.complete(prompt)
+
+    def summarize_and_classify(self, title, description, max_chars=500):
+        """
+        Summary and classification of one article from a single call. Returns
+        the normalized classification plus "summary"; raises
+        common.model_output.ModelOutputError when the answer doesn't validate.
+        """
+        prompt = build_analysis_prompt(title, description, max_chars)
+        metrics.log(f"   -> Prompt tokens: ~{prompt.tokens}{' (description trimmed)' if prompt.trimmed else ''}")
+        return parse_analysis(self.complete(prompt, response_schema=ANALYSIS_RESPONSE_SCHEMA), max_chars)
+
+    def repair(self, completion, error):
+        """
+        Asks the model to restate an unparseable classification as valid JSON.
+        """
+        return self.complete(build_repair_prompt(completion, error))
+
+    def submit_batch_job(self, job_name, prompts):
+        raise NotImplementedError(f"{self.name} does not support batch inference jobs")
+
+    def get_batch_job_results(self, job_arn):
+        raise NotImplementedError(f"{self.name} does not support batch inference jobs")
+
+
+class GeminiBackend(InferenceBackend):
+    name = 'gemini'
+
+    def complete(self, prompt, response_schema=None):
+        body = {"contents": [{ "parts": [{ "text": prompt.user }] }]}
+        if prompt.system:
+            body["systemInstruction"] = { "parts": [{ "text": prompt.system }] }
+        if response_schema:
+            body["generationConfig"] = {
+                "responseMimeType": "application/json",
+                "responseSchema": response_schema
+            }
+
+        # Imported here so Bedrock-only functions don't load requests at cold start
+        from common.http_client import safe_api_request
+
+        response = safe_api_request(
+            f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
+            {'Content-Type': 'application/json'},
+            json.dumps(body),
+            max_retries=3,
+            limiter='gemini',
+            token_cost=prompt.tokens
+        )
+        result = response.json()
+        text = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text')
+        if not text:
+            raise InferenceError(f"Gemini returned no text: {json.dumps(result)[:300]}")
+        return text
+
+
+class BedrockBackend(InferenceBackend):
+    name = 'bedrock'
+
+    def __init__(self, client=None):
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = aws.client('bedrock-runtime')
+        return self._client
+
+    @staticmethod
+    def _model_input(prompt):
+        # Llama takes a single prompt string; fold any system instruction into it
+        text = f"{prompt.system}\n\n{prompt.user}" if prompt.system else prompt.user
+        return {"prompt": text, **LLAMA_GENERATION}
+
+    def complete(self, prompt, response_schema=None):
+        # Pace requests under the Bedrock quota instead of waiting for throttles
+        limiter = get_limiter('bedrock')
+        with metrics.timer("rate_wait.bedrock"):
+            limiter.acquire()
+        metrics.count("tokens.bedrock", prompt.tokens)
+        try:
+            with metrics.timer("bedrock.invoke_model"):
+                response = self.client.invoke_model(
+                    modelId=BEDROCK_MODEL_ID,
+                    body=json.dumps(self._model_input(prompt)),
+                    contentType="application/json",
+                    accept="application/json"
+                )
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+                metrics.count("throttles.bedrock")
+                limiter.penalize()
+            raise
+        limiter.on_success()
+
+        output_json = json.loads(response["body"].read())
+        return (output_json.get("generation") or output_json.get("completion") or "").strip()
+
+    def submit_batch_job(self, job_name, prompts):
+        """
+        Starts a Bedrock batch inference job. `prompts` maps a record id to a
+        common.prompts.Prompt. The input JSONL is written under
+        BEDROCK_BATCH_S3_URI, which must be readable and writable by
+        BEDROCK_BATCH_ROLE_ARN. Bedrock requires at least
+        BEDROCK_BATCH_MIN_RECORDS records per job. Returns the job ARN.
+        """
+        bucket, input_key = batch_s3_location('input', f"{job_name}.jsonl")
+        _, output_prefix = batch_s3_location('output')
+        lines = [
+            json.dumps({"recordId": record_id, "modelInput": self._model_input(prompt)})
+            for record_id, prompt in prompts.items()
+        ]
+        aws.client('s3').put_object(Bucket=bucket, Key=input_key, Body="\n".join(lines).encode('utf-8'))
+
+        response = aws.client('bedrock').create_model_invocation_job(
+            jobName=job_name,
+            roleArn=BEDROCK_BATCH_ROLE_ARN,
+            modelId=BEDROCK_MODEL_ID,
+            inputDataConfig={'s3InputDataConfig': {'s3Uri': f"s3://{bucket}/{input_key}", 's3InputFormat': 'JSONL'}},
+            outputDataConfig={'s3OutputDataConfig': {'s3Uri': f"s3://{bucket}/{output_prefix}/"}},
+        )
+        return response['jobArn']
+
+    def get_batch_job_results(self, job_arn):
+        """
+        Returns (status, results) for a batch job. While the job is running,
+        results is None; once it has completed, results maps record id ->
+        completion text.
+        """
+        job = aws.client('bedrock').get_model_invocation_job(jobIdentifier=job_arn)
+        status = job['status']
+        if status not in ('Completed', 'PartiallyCompleted'):
+            return status, None
+
+        output_uri = job['outputDataConfig']['s3OutputDataConfig']['s3Uri']
+        bucket, _, prefix = output_uri.replace('s3://', '', 1).partition('/')
+        job_id = job_arn.rsplit('/', 1)[-1]
+        s3 = aws.client('s3')
+
+        results = {}
+        paginator = s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix='/'.join(filter(None, (prefix.strip('/'), job_id))) + '/'):
+            for obj in page.get('Contents', []):
+                if not obj['Key'].endswith('.jsonl.out'):
+                    continue
+                body = s3.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read().decode('utf-8')
+                for line in body.splitlines():
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    output = record.get('modelOutput') or {}
+                    results[record['recordId']] = (output.get('generation') or output.get('completion') or '').strip()
+        return status, results
+
+
+class LocalBackend(InferenceBackend):
+    """
+    Deterministic offline stand-in. Summaries are the leading sentences of the
+    description; classifications come from keyword and number heuristics and
+    are always schema-valid, with a low confidence. It implements the task
+    methods directly, so it has no complete().
+    """
+
+    name = 'local'
+
+    _LEVEL_KEYWORDS = (
+        (SUPPORT_LEVELS[3], ('catastroph', 'devastat', 'death toll', 'killed', 'dead', 'state of emergency')),
+        (SUPPORT_LEVELS[2], ('evacuat', 'displaced', 'destroyed', 'injured', 'missing', 'collapsed')),
+        (SUPPORT_LEVELS[1], ('damage', 'flood', 'wildfire', 'earthquake', 'hurricane', 'storm', 'outage')),
+    )
+    _NEED_KEYWORDS = (
+        ('rescue', ('trapped', 'missing', 'collapsed', 'rescue')),
+        ('medical care', ('injured', 'hospital', 'casualt', 'wounded')),
+        ('shelter', ('displaced', 'evacuat', 'homeless', 'destroyed')),
+        ('water', ('water', 'drought', 'contaminat')),
+        ('food', ('food', 'hunger', 'famine', 'crops')),
+        ('electricity', ('power', 'outage', 'electric')),
+    )
+    _PEOPLE_RE = re.compile(
+        r'(\d[\d,]*(?:\.\d+)?\s*(?:million|thousand)?)\s+(?:people|residents|families|persons|villagers|dead|killed|displaced|evacuated)',
+        re.IGNORECASE
+    )
+    _LOCATION_RE = re.compile(r'\b(?:in|near|across|hits|struck)\s+((?:[A-Z][\w\'-]+)(?:[ ,]+(?:[A-Z][\w\'-]+))*)')
+
+    def summarize(self, title, description, max_chars=500):
+        text = ' '.join((description or title or '').split())
+        if len(text) <= max_chars:
+            return text
+        cut = text[:max_chars]
+        end = cut.rfind('. ')
+        return cut[:end + 1] if end > 0 else cut
+
+    def summarize_batch(self, articles, max_chars=500):
+        return {
+            article['url']: self.summarize(article.get('title', ''), article.get('description', ''), max_chars)
+            for article in articles
+        }
+
+    def classify(self, title, content):
+        text = f"{title or ''}. {content or ''}"
+        lower = text.lower()
+
+        support_level = SUPPORT_LEVELS[0]
+        for level, keywords in self._LEVEL_KEYWORDS:
+            if any(keyword in lower for keyword in keywords):
+                support_level = level
+                break
+
+        needs = [need for need, keywords in self._NEED_KEYWORDS if any(k in lower for k in keywords)][:3]
+
+        people = 0
+        match = self._PEOPLE_RE.search(text)
+        if match:
+            people = match.group(1).strip()
+
+        location_match = self._LOCATION_RE.search(text)
+        location = location_match.group(1).strip(' ,') if location_match else 'Unknown'
+
+        return json.dumps({
+            "location": location,
+            "support_level": support_level,
+            "confidence": 0.3,
+            "priority_needs": needs,
+            "people_affected": people,
+        })
+
+    def summarize_and_classify(self, title, description, max_chars=500):
+        result = parse_classification(self.classify(title, description))
+        result["summary"] = self.summarize(title, description, max_chars)
+        return result
+
+    def repair(self, completion, error):
+        # classify always emits valid JSON, so there is nothing to repair
+        return completion
+
+
+_BACKENDS = {'gemini': GeminiBackend, 'bedrock': BedrockBackend, 'local': LocalBackend}
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name):
+    """
+    Returns the process-wide backend instance for `name`.
+    """
+    with _instances_lock:
+        if name not in _instances:
+            if name not in _BACKENDS:
+                raise ValueError(f"Unknown inference backend '{name}'. Choose from: {', '.join(_BACKENDS)}")
+            _instances[name] = _BACKENDS[name]()
+        return _instances[name]
@@ -0,0 +1,154 @@
+"""
+Compact NewsTable item format.
+
+Attributes that list views and the classifier read (url, title, summary,
+published_at, the classification) stay plain. The bulky source text only a
+detail view needs, source_description and raw_content_snippet, is folded
+into one zlib-compressed binary attribute, 'body_z'. GNews content usually
+repeats the description, so compressing the two together saves more than
+compressing each one, and a description identical to the summary isn't
+stored twice. inserted_at is stored as epoch seconds. published_at stays an
+ISO string because it is the sort key of both indexes (common/news_index.py).
+
+encode_item() runs before a write. decode_item() restores the original
+attributes and passes rows in the old format through unchanged, so readers
+don't need to know which format a row is in. from_stream_image() does the
+same for a DynamoDB stream image.
+"""
+import base64
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+
+COMPRESSED_ATTRIBUTE = 'body_z'
+# Attribute -> key inside the compressed payload
+COMPRESSED_FIELDS = {'source_description': 'd', 'raw_content_snippet': 'c'}
+# Payload flag: the description equals the item's summary
+SAME_AS_SUMMARY = 'ds'
+EPOCH_FIELDS = ('inserted_at',)
+ZLIB_LEVEL = 9
+
+# What list views need. The list lives in common/data/list_attributes.json so
+# getNews.js reads the same one. url is the table key and a reserved word, so
+# the ProjectionExpression names it through a placeholder.
+LIST_ATTRIBUTES_FILE = os.path.join(os.path.dirname(__file__), 'data', 'list_attributes.json')
+with open(LIST_ATTRIBUTES_FILE, encoding='utf-8') as _file:
+    _LIST_FIELDS = tuple(json.load(_file))
+LIST_ATTRIBUTES = tuple(name for name in _LIST_FIELDS if name != 'url')
+LIST_PROJECTION_NAMES = {'#u': 'url'}
+LIST_PROJECTION = ', '.join('#u' if name == 'url' else name for name in _LIST_FIELDS)
+
+
+def index_attributes(*key_attributes):
+    """
+    NonKeyAttributes for an INCLUDE index on key_attributes: LIST_ATTRIBUTES
+    minus the index keys, which every index projects anyway.
+    """
+    return [name for name in LIST_ATTRIBUTES if name not in key_attributes]
+
+
+def to_epoch(value):
+    """
+    Epoch seconds for an ISO-8601 string or datetime; None if unparseable.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def from_epoch(value):
+    return datetime.fromtimestamp(int(value), tz=timezone.utc).isoformat()
+
+
+def encode_item(item):
+    """
+    A copy of a NewsTable item in the compact format.
+    """
+    compact = dict(item)
+    payload = {}
+    for attribute, key in COMPRESSED_FIELDS.items():
+        value = compact.pop(attribute, None)
+        if value is None:
+            continue
+        if attribute == 'source_description' and value == compact.get('summary'):
+            payload[SAME_AS_SUMMARY] = 1
+        else:
+            payload[key] = value
+    if payload:
+        raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        compact[COMPRESSED_ATTRIBUTE] = zlib.compress(raw, ZLIB_LEVEL)
+
+    for attribute in EPOCH_FIELDS:
+        epoch = to_epoch(compact.get(attribute))
+        if epoch is not None:
+            compact[attribute] = epoch
+    return compact
+
+
+def _binary(value):
+    # boto3 wraps binary attributes in Binary; stream events carry base64 text
+    value = getattr(value, 'value', value)
+    if isinstance(value, str):
+        return base64.b64decode(value)
+    return bytes(value)
+
+
+def decode_item(item):
+    """
+    A copy of `item` with compressed attributes and epoch timestamps restored.
+    """
+    if not item:
+        return item
+    decoded = dict(item)
+    body = decoded.pop(COMPRESSED_ATTRIBUTE, None)
+    if body is not None:
+        payload = json.loads(zlib.decompress(_binary(body)).decode('utf-8'))
+        for attribute, key in COMPRESSED_FIELDS.items():
+            if key in payload:
+                decoded[attribute] = payload[key]
+        if payload.get(SAME_AS_SUMMARY):
+            decoded['source_description'] = decoded.get('summary')
+
+    for attribute in EPOCH_FIELDS:
+        if isinstance(decoded.get(attribute), (int, Decimal)):
+            decoded[attribute] = from_epoch(decoded[attribute])
+    return decoded
+
+
+def _stream_value(value):
+    (kind, data), = value.items()
+    if kind == 'S':
+        return data
+    if kind == 'N':
+        return Decimal(data)
+    if kind == 'B':
+        return _binary(data)
+    if kind in ('BOOL', 'NULL'):
+        return None if kind == 'NULL' else data
+    if kind == 'L':
+        return [_stream_value(v) for v in data]
+    if kind == 'M':
+        return {k: _stream_value(v) for k, v in data.items()}
+    if kind == 'SS':
+        return set(data)
+    if kind == 'NS':
+        return {Decimal(v) for v in data}
+    if kind == 'BS':
+        return {_binary(v) for v in data}
+    raise ValueError(f"Unknown DynamoDB type {kind}")
+
+
+def from_stream_image(image):
+    """
+    Plain, decoded item for a stream record's NewImage/OldImage (typed JSON).
+    """
+    return decode_item({name: _stream_value(value) for name, value in (image or {}).items()})
@@ -0,0 +1,163 @@
+"""
+Lightweight per-stage timing and counters for both Lambdas.
+
+Wrap a stage with `with timer('gemini'):` or decorate it with `@timed('gemini')`,
+and count things like retries and tokens with `count('retries.gemini')`. At the
+end of an invocation `flush()` writes one structured log line with p50/p95/max
+per stage plus the counters, and resets them. With METRICS_FORMAT=emf (the
+default) the line is in CloudWatch Embedded Metric Format, so CloudWatch turns
+it into metrics without any API calls; `json` writes the same numbers as plain
+JSON and `off` disables it.
+
+`log()` is print() for per-article detail lines; VERBOSE_LOGS=false silences
+them to cut log-ingest cost while keeping the per-invocation summaries.
+"""
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_FORMAT = os.environ.get('METRICS_FORMAT', 'emf').lower()
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'DisastEarth')
+VERBOSE_LOGS = os.environ.get('VERBOSE_LOGS', 'true').lower() == 'true'
+
+# Durations kept per stage for percentiles; beyond this a uniform sample is kept
+MAX_SAMPLES = 10000
+
+# EMF allows at most 100 metrics per directive; larger sets get several directives
+EMF_MAX_METRICS = 100
+
+_lock = threading.Lock()
+_durations = {}
+_seen = {}
+_counters = {}
+
+
+def log(*args, **kwargs):
+    """
+    print() for per-article detail; a no-op when VERBOSE_LOGS is false.
+    """
+    if VERBOSE_LOGS:
+        print(*args, **kwargs)
+
+
+def record(stage, milliseconds):
+    with _lock:
+        samples = _durations.setdefault(stage, [])
+        _seen[stage] = _seen.get(stage, 0) + 1
+        if len(samples) < MAX_SAMPLES:
+            samples.append(milliseconds)
+        else:
+            # Reservoir sampling keeps the sample uniform over the whole invocation
+            slot = random.randrange(_seen[stage])
+            if slot < MAX_SAMPLES:
+                samples[slot] = milliseconds
+
+
+def count(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+@contextmanager
+def timer(stage):
+    """
+    Times the block; failures are timed too and counted as '<stage>.errors'.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        count(f"{stage}.errors")
+        raise
+    finally:
+        record(stage, (time.perf_counter() - start) * 1000)
+
+
+def timed(stage):
+    """
+    Decorator form of timer().
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def snapshot():
+    """
+    Current per-stage stats ({stage: {count, p50_ms, p95_ms, max_ms, total_ms}})
+    and counters.
+    """
+    with _lock:
+        durations = {stage: sorted(values) for stage, values in _durations.items()}
+        seen = dict(_seen)
+        counters = dict(_counters)
+    stages = {}
+    for stage, values in durations.items():
+        if not values:
+            continue
+        stages[stage] = {
+            "count": seen[stage],
+            "p50_ms": round(_percentile(values, 0.50), 2),
+            "p95_ms": round(_percentile(values, 0.95), 2),
+            "max_ms": round(values[-1], 2),
+            "total_ms": round(sum(values) * seen[stage] / len(values), 2),
+        }
+    return {"stages": stages, "counters": counters}
+
+
+def reset():
+    with _lock:
+        _durations.clear()
+        _seen.clear()
+        _counters.clear()
+
+
+def flush(function_name, **properties):
+    """
+    Writes this invocation's stage stats and counters as one log line, then
+    resets them. Returns the snapshot.
+    """
+    data = snapshot()
+    reset()
+    if METRICS_FORMAT == 'off':
+        return data
+
+    if METRICS_FORMAT == 'json':
+        print(json.dumps({"metrics": function_name, **properties, **data}))
+        return data
+
+    # CloudWatch Embedded Metric Format: one metric per stage percentile and counter
+    line = {"Function": function_name, **properties}
+    metric_definitions = []
+    for stage, stats in data["stages"].items():
+        for field, unit in (("count", "Count"), ("p50_ms", "Milliseconds"), ("p95_ms", "Milliseconds"),
+                            ("max_ms", "Milliseconds")):
+            name = f"{stage}.{field}"
+            line[name] = stats[field]
+            metric_definitions.append({"Name": name, "Unit": unit})
+    for name, value in data["counters"].items():
+        line[name] = value
+        metric_definitions.append({"Name": name, "Unit": "Count"})
+    line["_aws"] = {
+        "Timestamp": int(time.time() * 1000),
+        "CloudWatchMetrics": [{
+            "Namespace": METRICS_NAMESPACE,
+            "Dimensions": [["Function"]],
+            "Metrics": metric_definitions[i:i + EMF_MAX_METRICS],
+        } for i in range(0, len(metric_definitions), EMF_MAX_METRICS)],
+    }
+    print(json.dumps(line))
+    return data
@@ -0,0 +1,279 @@
+"""
+Parsing and validation of the classifier's JSON output.
+
+Model completions often wrap the JSON in prose or code fences. The extractor
+walks the text once, tracking string literals and bracket depth, and yields
+every balanced top-level {...} object, so nested arrays and objects inside the
+answer never cut it short. Each candidate is validated and normalized against
+the classification schema; the first valid one wins.
+"""
+import json
+import math
+import re
+import threading
+
+SUPPORT_LEVELS = ("Minimal Support", "Moderate Support", "High Support", "Emergency/Critical Support")
+# Used when the model says no level applies ("Unknown", "No support needed");
+# any other unrecognized level is a parse failure
+FALLBACK_SUPPORT_LEVEL = SUPPORT_LEVELS[0]
+# More people than live on Earth means the number is garbled; it counts as unknown
+MAX_PEOPLE_AFFECTED = 8_000_000_000
+
+# Whole lowercase words -> canonical support level, checked in order
+_SUPPORT_KEYWORDS = (
+    ("emergency", "Emergency/Critical Support"),
+    ("critical", "Emergency/Critical Support"),
+    ("high", "High Support"),
+    ("moderate", "Moderate Support"),
+    ("medium", "Moderate Support"),
+    ("minimal", "Minimal Support"),
+    ("minor", "Minimal Support"),
+    ("low", "Minimal Support"),
+)
+# Answers meaning no support level applies
+_NO_SUPPORT_VALUES = ('unknown', 'none', 'n/a', 'na', 'not applicable')
+_NEGATIONS = ('no', 'none', 'not')
+
+# Rough counts for vague quantities, largest phrases first
+_VAGUE_COUNTS = (
+    ("hundreds of thousands", 200_000),
+    ("tens of thousands", 20_000),
+    ("millions", 2_000_000),
+    ("thousands", 2_000),
+    ("hundreds", 200),
+    ("dozens", 24),
+    ("dozen", 12),
+    ("several", 5),
+    ("few", 3),
+)
+_MULTIPLIERS = {
+    "k": 1_000, "thousand": 1_000,
+    "m": 1_000_000, "mn": 1_000_000, "million": 1_000_000,
+    "b": 1_000_000_000, "bn": 1_000_000_000, "billion": 1_000_000_000,
+}
+_UNKNOWN_VALUES = ('', 'unknown', 'none', 'null', 'n/a', 'na')
+_NUMBER_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*(k|m|mn|b|bn|thousand|million|billion)?\b', re.IGNORECASE)
+
+
+class ModelOutputError(ValueError):
+    """
+    Raised when a completion contains no JSON object matching the schema.
+    """
+
+
+_stats = {"attempts": 0, "parsed": 0, "failed": 0, "repaired": 0}
+_stats_lock = threading.Lock()
+
+
+def count_parse_event(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_parse_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["failure_rate"] = round(stats["failed"] / stats["attempts"], 3) if stats["attempts"] else 0.0
+    return stats
+
+
+def iter_json_objects(text):
+    """
+    Yields each balanced top-level {...} substring of `text`, in order.
+    Braces inside JSON string literals are ignored.
+    """
+    depth = 0
+    start = None
+    in_string = False
+    escaped = False
+    for i, char in enumerate(text or ''):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = depth > 0
+        elif char == '{':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char == '}' and depth > 0:
+            depth -= 1
+            if depth == 0:
+                yield text[start:i + 1]
+
+
+def _loads_lenient(candidate):
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    # Common model slips: trailing commas and // comments
+    cleaned = re.sub(r'//[^\n"]*$', '', candidate, flags=re.MULTILINE)
+    cleaned = re.sub(r',\s*([}\]])', r'\1', cleaned)
+    return json.loads(cleaned)
+
+
+def normalize_support_level(value):
+    """
+    Maps free-text support levels ("high", "CRITICAL", "Moderate support")
+    onto SUPPORT_LEVELS by whole-word synonyms. Answers saying no level
+    applies ("Unknown", "No support needed") map to FALLBACK_SUPPORT_LEVEL.
+    Returns None for non-strings; raises ModelOutputError for any other
+    text, so the repair retry gets a chance at it.
+    """
+    if not isinstance(value, str):
+        return None
+    text = value.strip().lower()
+    for level in SUPPORT_LEVELS:
+        if text == level.lower():
+            return level
+    words = re.findall(r'[a-z]+', text)
+    if text in _NO_SUPPORT_VALUES or (words and words[0] in _NEGATIONS):
+        return FALLBACK_SUPPORT_LEVEL
+    for keyword, level in _SUPPORT_KEYWORDS:
+        if keyword in words:
+            return level
+    raise ModelOutputError(f"unrecognized support_level: {value!r}")
+
+
+def parse_people_count(value):
+    """
+    Parses people counts such as 2000, "2,000", "about 1.2 million", "5k" or
+    "hundreds". Ranges use their lower bound. Negative counts become 0, and
+    counts that aren't finite or exceed MAX_PEOPLE_AFFECTED are treated as
+    unknown (0). Returns None when unparseable.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = value
+    elif isinstance(value, str):
+        text = value.strip().lower()
+        match = _NUMBER_RE.search(text)
+        if match:
+            number = float(match.group(1).replace(',', '')) * _MULTIPLIERS.get((match.group(2) or '').lower(), 1)
+        else:
+            return next((estimate for phrase, estimate in _VAGUE_COUNTS if phrase in text), None)
+    else:
+        return None
+    if not math.isfinite(number) or number > MAX_PEOPLE_AFFECTED:
+        return 0
+    return max(0, int(number))
+
+
+def parse_confidence(value):
+    """
+    Parses a confidence as a float in [0, 1]. Accepts "0.8", "80%" and 80:
+    a percent sign, or a whole number from 2 to 100, is read as a
+    percentage. Anything else is clamped to [0, 1] ("1.5" -> 1.0), and NaN
+    counts as 0.
+    """
+    percent = False
+    if isinstance(value, str):
+        text = value.strip()
+        percent = text.endswith('%')
+        value = text.rstrip('%')
+    value = float(value)
+    if math.isnan(value):
+        return 0.0
+    if percent or (1 < value <= 100 and value.is_integer()):
+        value /= 100
+    return min(1.0, max(0.0, value))
+
+
+def _normalize_needs(value):
+    if isinstance(value, str):
+        value = re.split(r'[,;]', value)
+    if not isinstance(value, list):
+        return []
+    needs = []
+    for need in value:
+        need = str(need).strip()
+        if need and need.lower() not in (n.lower() for n in needs):
+            needs.append(need)
+    return needs[:3]
+
+
+def validate_classification(data, fallback_location="Unknown"):
+    """
+    Validates one decoded object against the classification schema and
+    returns it normalized. Raises ModelOutputError if it does not fit.
+    """
+    if not isinstance(data, dict):
+        raise ModelOutputError("not a JSON object")
+
+    support_level = normalize_support_level(data.get("support_level"))
+    if support_level is None:
+        raise ModelOutputError(f"invalid support_level: {data.get('support_level')!r}")
+
+    try:
+        confidence = parse_confidence(data.get("confidence", 0.0))
+    except (TypeError, ValueError):
+        raise ModelOutputError(f"invalid confidence: {data.get('confidence')!r}")
+
+    people_affected = data.get("people_affected")
+    if people_affected is None or str(people_affected).strip().lower() in _UNKNOWN_VALUES:
+        people_affected = 0
+    people_affected = parse_people_count(people_affected)
+    if people_affected is None:
+        raise ModelOutputError(f"invalid people_affected: {data.get('people_affected')!r}")
+
+    location = data.get("location")
+    location = location.strip() if isinstance(location, str) else ''
+
+    return {
+        "location": location or fallback_location,
+        "support_level": support_level,
+        "confidence": confidence,
+        "priority_needs": _normalize_needs(data.get("priority_needs")),
+        "people_affected": people_affected,
+    }
+
+
+def parse_classification(completion, fallback_location="Unknown"):
+    """
+    Returns the first JSON object in `completion` that validates as a
+    classification, normalized. Raises ModelOutputError when none does.
+    Updates the parse counters.
+    """
+    count_parse_event("attempts")
+    last_error = "no JSON object found"
+    for candidate in iter_json_objects(completion):
+        try:
+            result = validate_classification(_loads_lenient(candidate), fallback_location)
+        except (ValueError, ModelOutputError) as e:
+            last_error = str(e)
+            continue
+        count_parse_event("parsed")
+        return result
+    count_parse_event("failed")
+    raise ModelOutputError(last_error)
+
+
+def parse_analysis(completion, max_chars=500, fallback_location="Unknown"):
+    """
+    Like parse_classification, for the fused summarize-and-classify output:
+    the object must also carry a non-empty "summary", which is returned
+    trimmed to `max_chars` alongside the normalized classification.
+    """
+    count_parse_event("attempts")
+    last_error = "no JSON object found"
+    for candidate in iter_json_objects(completion):
+        try:
+            data = _loads_lenient(candidate)
+            result = validate_classification(data, fallback_location)
+            summary = data.get("summary")
+            if not isinstance(summary, str) or not summary.strip():
+                raise ModelOutputError("missing summary")
+        except (ValueError, ModelOutputError) as e:
+            last_error = str(e)
+            continue
+        count_parse_event("parsed")
+        result["summary"] = summary.strip()[:max_chars]
+        return result
+    count_parse_event("failed")
+    raise ModelOutputError(last_error)
@@ -0,0 +1,203 @@
+"""
+Indexed read path for NewsTable.
+
+NewsTable's only key is `url`, so listing articles used to mean a full Scan.
+Two global secondary indexes serve the list views instead:
+
+- `published_day-published_at-index`: partition `published_day`
+  ("YYYY-MM-DD", UTC), sort `published_at`. Bucketing by day keeps every
+  partition small and spreads writes; readers walk day by day.
+- `support_level-published_at-index`: partition `support_level`, sort
+  `published_at`.
+
+A third, `skipped_reason-index` (partition `skipped_reason`), holds only the
+rows the scraper's relevance filter skipped, so they can be re-scored
+without scanning the table.
+
+The scraper writes `published_day` along with `published_at`, and the
+classifier writes `support_level` (and fills in `published_day` for older
+rows). Both indexes are sparse: rows without the key attributes are left out.
+
+The indexes only need the list-view attributes projected (common/item_format.py
+index_attributes() gives the NonKeyAttributes for each). Items come back decoded from the compact format.
+The readers return a Page of items plus an opaque cursor; pass the cursor
+back to get the next page. A cursor of None means there is nothing more.
+"""
+import base64
+import json
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from common.item_format import decode_item
+
+TIME_INDEX = 'published_day-published_at-index'
+SUPPORT_INDEX = 'support_level-published_at-index'
+SKIPPED_INDEX = 'skipped_reason-index'
+
+# How many days "latest" looks back before it stops returning pages
+QUERY_MAX_DAYS = int(os.environ.get('QUERY_MAX_DAYS', '30'))
+
+Page = namedtuple('Page', ['items', 'cursor'])
+
+
+def published_day(published_at):
+    """
+    The UTC day bucket ("YYYY-MM-DD") for an ISO 8601 timestamp such as
+    GNews' publishedAt, or None if it cannot be parsed.
+    """
+    if not published_at:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(published_at).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).date().isoformat()
+
+
+def normalize_timestamp(timestamp):
+    """
+    Formats an ISO 8601 timestamp like the stored published_at values
+    ("2025-10-19T08:00:00Z") so string comparisons on the sort key hold.
+    """
+    try:
+        parsed = datetime.fromisoformat(str(timestamp).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {timestamp!r}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return {}
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def _days(start, end):
+    """
+    Day buckets from `start` to `end` inclusive, in either direction.
+    """
+    step = timedelta(days=1 if end >= start else -1)
+    day = start
+    while (day <= end) if step.days > 0 else (day >= end):
+        yield day.isoformat()
+        day += step
+
+
+def _query_days(table, days, limit, cursor, ascending, since=None):
+    """
+    Reads up to `limit` items from TIME_INDEX, walking the day buckets in
+    `days` in order and resuming from `cursor`.
+    """
+    state = decode_cursor(cursor)
+    days = list(days)
+    start_key = None
+    if state.get('day') in days:
+        days = days[days.index(state['day']):]
+        start_key = state.get('key')
+
+    # Imported here so importing published_day() doesn't load boto3
+    from boto3.dynamodb.conditions import Key
+
+    items = []
+    for i, day in enumerate(days):
+        condition = Key('published_day').eq(day)
+        if since:
+            condition = condition & Key('published_at').gte(since)
+        while len(items) < limit:
+            query_kwargs = {
+                'IndexName': TIME_INDEX,
+                'KeyConditionExpression': condition,
+                'ScanIndexForward': ascending,
+                'Limit': limit - len(items),
+            }
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = start_key
+            response = table.query(**query_kwargs)
+            items.extend(decode_item(item) for item in response.get('Items', []))
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key:
+                break
+        if len(items) >= limit:
+            if start_key:
+                return Page(items, encode_cursor({'day': day, 'key': start_key}))
+            if i + 1 < len(days):
+                return Page(items, encode_cursor({'day': days[i + 1]}))
+            return Page(items, None)
+    return Page(items, None)
+
+
+def latest(table, limit=20, cursor=None, max_days=QUERY_MAX_DAYS, now=None):
+    """
+    Newest articles first, looking back at most `max_days` days.
+    """
+    today = (now or datetime.now(timezone.utc)).date()
+    return _query_days(table, _days(today, today - timedelta(days=max_days - 1)), limit, cursor, ascending=False)
+
+
+def since(table, timestamp, limit=100, cursor=None, now=None):
+    """
+    Articles published at or after the ISO 8601 `timestamp`, oldest first.
+    """
+    timestamp = normalize_timestamp(timestamp)
+    first_day = published_day(timestamp)
+    today = (now or datetime.now(timezone.utc)).date()
+    days = _days(datetime.fromisoformat(first_day).date(), today)
+    return _query_days(table, days, limit, cursor, ascending=True, since=timestamp)
+
+
+def by_support_level(table, support_level, limit=20, cursor=None, since=None):
+    """
+    Newest articles with the given support level, optionally only those
+    published at or after `since`.
+    """
+    from boto3.dynamodb.conditions import Key
+
+    condition = Key('support_level').eq(support_level)
+    if since:
+        condition = condition & Key('published_at').gte(normalize_timestamp(since))
+    query_kwargs = {
+        'IndexName': SUPPORT_INDEX,
+        'KeyConditionExpression': condition,
+        'ScanIndexForward': False,
+        'Limit': limit,
+    }
+    start_key = decode_cursor(cursor).get('key')
+    if start_key:
+        query_kwargs['ExclusiveStartKey'] = start_key
+    response = table.query(**query_kwargs)
+    next_key = response.get('LastEvaluatedKey')
+    items = [decode_item(item) for item in response.get('Items', [])]
+    return Page(items, encode_cursor({'key': next_key}) if next_key else None)
+
+
+def skipped(table, reason='low_relevance', limit=100, cursor=None):
+    """
+    Rows stored with the given skipped_reason, in index order. Rows whose
+    skipped_reason is removed drop out of the index.
+    """
+    from boto3.dynamodb.conditions import Key
+
+    query_kwargs = {
+        'IndexName': SKIPPED_INDEX,
+        'KeyConditionExpression': Key('skipped_reason').eq(reason),
+        'Limit': limit,
+    }
+    start_key = decode_cursor(cursor).get('key')
+    if start_key:
+        query_kwargs['ExclusiveStartKey'] = start_key
+    response = table.query(**query_kwargs)
+    next_key = response.get('LastEvaluatedKey')
+    items = [decode_item(item) for item in response.get('Items', [])]
+    return Page(items, encode_cursor({'key': next_key}) if next_key else None)
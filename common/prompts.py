@@ -0,0 +1,413 @@
+"""
+Prompt templates for the summarizer (Gemini) and the classifier (Bedrock).
+
+The static text of every prompt is built once at import time. Builders only
+splice in the article, trimming its text so that the whole prompt stays
+within the model's input token budget, and report the prompt's token count.
+PROMPT_VARIANT=compact swaps the long instructions for a short version with
+the same output contract. The fused analysis prompt asks for the summary and
+the classification in one answer (the scraper's FUSED_MODE), with a system
+prompt of its own.
+"""
+import math
+import os
+import textwrap
+from collections import namedtuple
+from functools import lru_cache
+
+# --- CONFIGURATION (Lambda Environment Variables) ---
+
+PROMPT_VARIANT = os.environ.get('PROMPT_VARIANT', 'full')
+
+# Input token budget per model family (prompt text only). Llama 3 8B has an
+# 8k context, and 512 tokens of it are reserved for the generation.
+INPUT_TOKEN_BUDGETS = {
+    'gemini': int(os.environ.get('GEMINI_INPUT_TOKEN_BUDGET', '8000')),
+    'bedrock': int(os.environ.get('BEDROCK_INPUT_TOKEN_BUDGET', '7000')),
+}
+
+# Roughly 4 characters per token for English text with both tokenizers
+CHARS_PER_TOKEN = 4
+
+Prompt = namedtuple('Prompt', ['system', 'user', 'tokens', 'trimmed'])
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate, good enough for budgeting without a tokenizer.
+    """
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def trim_to_tokens(text, max_tokens):
+    """
+    Trims `text` to about `max_tokens` tokens, cutting at a word boundary.
+    Returns (text, trimmed).
+    """
+    text = text or ''
+    max_chars = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text, False
+    cut = text[:max_chars]
+    if ' ' in cut:
+        cut = cut[:cut.rindex(' ')]
+    return cut.rstrip() + ' …', True
+
+
+# --- SUMMARIZER PROMPTS ---
+
+_SUMMARY_SYSTEM_TEMPLATES = {
+    'full': textwrap.dedent("""
+        ********************************************************************************
+        *                                                                              *
+        *                        PROFESSIONAL NEWS SUMMARIZER PROMPT                  *
+        *                                                                              *
+        * You are being assigned the task of acting as an expert, professional-level   *
+        * news summarizer. Your role is to read and understand the provided text with  *
+        * utmost care, extract the most essential information, and produce a summary  *
+        * that captures all critical details, while maintaining strict conciseness.    *
+        *                                                                              *
+        * REQUIREMENTS AND GUIDELINES:                                                *
+        *                                                                              *
+        * 1. OBJECTIVE AND NEUTRAL:                                                    *
+        *    - Your summary must be completely factual, objective, and neutral in tone.*
+        *    - Avoid any opinions, personal commentary, or interpretations.           *
+        *    - Do not embellish, speculate, or infer beyond what is present in the text.*
+        *                                                                              *
+        * 2. CONCISENESS:                                                              *
+        *    - The summary MUST be strictly limited to {max_chars} characters,         *
+        *      including spaces, punctuation, and special characters.                  *
+        *    - Do not exceed this limit under any circumstances.                       *
+        *    - Focus on brevity without sacrificing clarity or essential information.  *
+        *                                                                              *
+        * 3. COMPLETENESS:                                                             *
+        *    - Include all key facts, figures, dates, locations, names, events, and    *
+        *      outcomes that are present in the original text.                         *
+        *    - Ensure that the summary can stand alone and be fully understood without *
+        *      reference to the original text.                                         *
+        *                                                                              *
+        * 4. STRUCTURE AND STYLE:                                                      *
+        *    - Write in clear, professional, and polished language.                    *
+        *    - Prefer active voice where appropriate, but clarity takes precedence.    *
+        *    - Avoid repetition, filler words, or unnecessary modifiers.               *
+        *    - Maintain logical flow: lead with the most important facts first.        *
+        *                                                                              *
+        * 5. FORMATTING:                                                               *
+        *    - Do NOT include a title, headline, greeting, salutation, or any preamble.*
+        *    - Provide only the summary text.                                          *
+        *    - Avoid line breaks unless absolutely necessary for clarity.              *
+        *                                                                              *
+        * 6. OUTPUT RESTRICTIONS:                                                      *
+        *    - The output should be exactly one concise paragraph.                     *
+        *    - Do not add lists, bullet points, or any non-standard formatting.        *
+        *    - Do not include explanations, notes, or any meta text.                   *
+        *                                                                              *
+        * 7. ATTENTION TO DETAIL:                                                      *
+        *    - Carefully read the entire input text before summarizing.                *
+        *    - Ensure all numbers, dates, names, and other critical details are correct.*
+        *    - Double-check the character count to strictly adhere to {max_chars}.     *
+        *                                                                              *
+        * 8. SUMMARY EXAMPLES (FOR GUIDANCE ONLY):                                     *
+        *    - If the text reports an event, summarize the who, what, when, where,     *
+        *      why, and how in as few words as possible.                                *
+        *    - Do not omit essential facts in the pursuit of brevity.                  *
+        *                                                                              *
+        * FINAL INSTRUCTIONS:                                                          *
+        *    - Read the provided text carefully.                                       
+        *    - Extract all key information without adding anything new.                 
+        *    - Compose a concise, fully self-contained summary.                         
+        *    - Ensure it does not exceed {max_chars} characters.                        
+        *    - Output ONLY the summary text.                                           
+        *                                                                              *
+        ********************************************************************************
+    """).strip(),
+    'compact': (
+        "You are a professional news summarizer. Write one factual, neutral paragraph of at most "
+        "{max_chars} characters that keeps the key who, what, when, where and numbers. "
+        "No title, preamble, lists or commentary. Output only the summary text."
+    ),
+}
+
+SUMMARY_BATCH_INSTRUCTION = (
+    "Please provide a separate summary for each of the following articles. "
+    "Respond with one object per article containing the article's exact URL and its summary."
+)
+
+
+@lru_cache(maxsize=8)
+def summary_system_prompt(max_chars=500, variant=PROMPT_VARIANT):
+    """
+    The summarizer system instruction with the character limit filled in.
+    """
+    template = _SUMMARY_SYSTEM_TEMPLATES.get(variant, _SUMMARY_SYSTEM_TEMPLATES['full'])
+    return template.replace('{max_chars}', str(max_chars))
+
+
+def build_summary_prompt(title, description, max_chars=500, variant=PROMPT_VARIANT):
+    """
+    System instruction and user message for summarizing one article.
+    """
+    system = summary_system_prompt(max_chars, variant)
+    prefix = f"Please provide the summary for the following article text:\n\nTitle: {title}\n\nDescription: "
+    fixed_tokens = estimate_tokens(system) + estimate_tokens(prefix)
+    description, trimmed = trim_to_tokens(description, INPUT_TOKEN_BUDGETS['gemini'] - fixed_tokens)
+    user = prefix + description
+    return Prompt(system, user, estimate_tokens(system) + estimate_tokens(user), trimmed)
+
+
+def build_batch_summary_prompt(articles, max_chars=500, variant=PROMPT_VARIANT):
+    """
+    System instruction and user message for summarizing several articles in
+    one request. The description budget is shared equally between articles.
+    """
+    system = summary_system_prompt(max_chars, variant)
+    headers = [f"URL: {article['url']}\nTitle: {article.get('title', '')}\nDescription: " for article in articles]
+    fixed_tokens = (estimate_tokens(system) + estimate_tokens(SUMMARY_BATCH_INSTRUCTION)
+                    + sum(estimate_tokens(header) + 2 for header in headers))
+    per_article = (INPUT_TOKEN_BUDGETS['gemini'] - fixed_tokens) // max(1, len(articles))
+
+    blocks = []
+    any_trimmed = False
+    for header, article in zip(headers, articles):
+        description, trimmed = trim_to_tokens(article.get('description', 'No source description.'), per_article)
+        any_trimmed = any_trimmed or trimmed
+        blocks.append(header + description)
+
+    user = SUMMARY_BATCH_INSTRUCTION + "\n\n" + "\n\n---\n\n".join(blocks)
+    return Prompt(system, user, estimate_tokens(system) + estimate_tokens(user), any_trimmed)
+
+
+# --- CLASSIFIER PROMPTS ---
+
+# (head, tail) pairs; the article is spliced in between them
+_CLASSIFY_TEMPLATES = {
+    'full': (
+        textwrap.dedent("""
+            You are a disaster response analyst AI. Your goal is to read a news article and extract actionable information for disaster response. 
+            You should focus on providing **objective, evidence-based assessments** derived from the article.
+        """).strip() + "\n\n",
+        textwrap.dedent("""
+            **Key Objectives:**
+
+            1. Identify the **most relevant location** where the disaster is affecting people.
+            2. Assess the **severity of support needed** and classify it into one of four levels:
+
+            * Minimal Support: Minor disruptions, limited impact, basic local assistance may be sufficient.
+            * Moderate Support: Noticeable impact, some infrastructure affected, humanitarian assistance may be required.
+            * High Support: Significant damage, multiple services disrupted, urgent assistance needed.
+            * Emergency/Critical Support: Severe damage, widespread impact, immediate intervention required to save lives.
+            3. Determine the **top 3 urgent needs** such as food, water, medical care, shelter, rescue, communication, or electricity.
+            4. Estimate the **number of people affected**, using explicit data if given, or reasonable approximation if not.
+            5. Assign a **confidence score (0-1)** reflecting how certain you are about your assessment.
+
+            **Guiding Principles:**
+
+            * Only use **information explicitly stated or strongly implied** in the article.
+            * If there is uncertainty, make the **best estimate** and reflect uncertainty in the confidence score.
+            * Focus on clarity and specificity; avoid vague responses like "help needed."
+            * Use context clues from the article: numbers, affected areas, descriptions of damage, quotes from officials, or mentions of casualties.
+
+            ---
+
+            **Step-by-Step Instructions:**
+
+            1. **Location Detection:**
+
+            * Look for city, region, district, or country names.
+            * Prioritize the location that is central to the disaster impact.
+            * If multiple locations are mentioned, choose the one most strongly affected.
+
+            2. **Support Level Classification:**
+
+            * Analyze descriptions of damage, casualties, displacement, or disruption.
+            * Map the severity description to one of the four support levels listed.
+
+            3. **Priority Needs Estimation:**
+
+            * Identify what people urgently require to survive or recover.
+            * List only the top 3 most critical needs.
+
+            4. **People Affected Estimation:**
+
+            * Use explicit numbers in the article if available.
+            * If no exact numbers, infer based on context (e.g., "hundreds displaced," "entire village evacuated").
+
+            5. **Confidence Scoring:**
+
+            * 1.0: Article provides clear, explicit evidence.
+            * 0.7-0.9: Evidence is strong but partially inferred.
+            * 0.4-0.6: Moderate uncertainty, multiple interpretations possible.
+            * <0.4: Highly uncertain, very limited information.
+
+            **Example 1:**
+
+            *Title:* "Floods Devastate Riverside Town"
+            *Content:* "Heavy rains caused the Riverside River to overflow, flooding homes. Around 2,000 residents have been evacuated. Emergency shelters are overwhelmed."
+
+            *Analysis (JSON output):*
+
+            ```json
+            {
+                "location": "Riverside Town",
+                "support_level": "High Support",
+                "confidence": 0.9,
+                "priority_needs": ["shelter", "food", "medical care"],
+                "people_affected": 2000
+            }
+            ```
+
+            **Example 2:**
+
+            *Title:* "Minor Snowstorm Hits Northern Hamlet"
+            *Content:* "The snowstorm caused minor travel delays. No injuries reported."
+
+            *Analysis (JSON output):*
+
+            ```json
+            {
+                "location": "Northern Hamlet",
+                "support_level": "Minimal Support",
+                "confidence": 0.95,
+                "priority_needs": ["road clearance", "heating", "food"],
+                "people_affected": 50
+            }
+            ```
+
+            ---
+
+            Respond only in JSON like this:
+            {
+                "location": "<detected or given location>",
+                "support_level": "<one of the above>",
+                "confidence": <number between 0 and 1>,
+                "priority_needs": ["need1", "need2", "need3"],
+                "people_affected": <estimated number>
+            }
+
+            **Additional Guidelines:**
+
+            * Do not include any explanation, text, or commentary outside the JSON.
+            * Ensure the JSON is **syntactically valid** and complete.
+            * If the article does not mention a location or numbers, leave location empty or make your best estimate and set a lower confidence score.
+            * Prioritize **accuracy, relevance, and evidence-based reasoning**.
+            * Respond quickly, as if preparing actionable intelligence for disaster response teams.
+        """).strip(),
+    ),
+    'compact': (
+        "You are a disaster response analyst. Read the news article and assess the disaster response it calls for.\n\n",
+        textwrap.dedent("""
+            Support levels: Minimal Support, Moderate Support, High Support, Emergency/Critical Support.
+            Use only facts stated or strongly implied in the article; reflect uncertainty in the confidence.
+
+            Respond only with JSON, no other text:
+            {
+                "location": "<most affected place>",
+                "support_level": "<one of the support levels>",
+                "confidence": <number between 0 and 1>,
+                "priority_needs": ["need1", "need2", "need3"],
+                "people_affected": <estimated number>
+            }
+        """).strip(),
+    ),
+}
+
+
+def build_classification_prompt(title, content, variant=PROMPT_VARIANT):
+    """
+    Single-string Bedrock prompt classifying one article. Content is trimmed
+    to fit the Bedrock input budget.
+    """
+    head, tail = _CLASSIFY_TEMPLATES.get(variant, _CLASSIFY_TEMPLATES['full'])
+    prefix = f"{head}Article title: {title} Article content: "
+    fixed_tokens = estimate_tokens(prefix) + estimate_tokens(tail) + 1
+    content, trimmed = trim_to_tokens(content, INPUT_TOKEN_BUDGETS['bedrock'] - fixed_tokens)
+    prompt = f"{prefix}{content}\n{tail}"
+    return Prompt(None, prompt, estimate_tokens(prompt), trimmed)
+
+
+REPAIR_INSTRUCTION = textwrap.dedent("""
+    Your previous answer could not be used: {error}.
+    Rewrite it as a single valid JSON object and output nothing else:
+    {{"location": "<place>", "support_level": "<Minimal Support | Moderate Support | High Support | Emergency/Critical Support>", "confidence": <0-1>, "priority_needs": ["need1", "need2", "need3"], "people_affected": <integer>}}
+
+    Previous answer:
+""").strip()
+
+
+def build_repair_prompt(completion, error):
+    """
+    Short follow-up prompt asking the model to restate a malformed answer as
+    schema-valid JSON.
+    """
+    previous, trimmed = trim_to_tokens(completion, 1024)
+    prompt = REPAIR_INSTRUCTION.format(error=error) + "\n" + previous
+    return Prompt(None, prompt, estimate_tokens(prompt), trimmed)
+
+
+# --- FUSED SUMMARY + CLASSIFICATION PROMPT ---
+
+# A system prompt of its own: the summarizer's says to output only the summary
+# text, which contradicts the JSON answer asked for here
+_ANALYSIS_SYSTEM_TEMPLATES = {
+    'full': textwrap.dedent("""
+        You are a disaster response analyst and professional news summarizer. For the news article
+        you are given, write a summary and assess the disaster response it calls for, and return both
+        in one JSON object.
+
+        **summary:**
+
+        * One factual, neutral paragraph of at most {max_chars} characters, including spaces and punctuation.
+        * Lead with the most important facts: who, what, when, where, and the key numbers.
+        * No title, preamble, opinion, speculation, lists or line breaks.
+
+        **Assessment:** use only information stated or strongly implied in the article.
+
+        * location: the city, region or country where the disaster affects people most.
+        * support_level: exactly one of
+          - Minimal Support: minor disruptions, limited impact, basic local assistance may be sufficient.
+          - Moderate Support: noticeable impact, some infrastructure affected, humanitarian assistance may be required.
+          - High Support: significant damage, multiple services disrupted, urgent assistance needed.
+          - Emergency/Critical Support: severe damage, widespread impact, immediate intervention required to save lives.
+        * priority_needs: the top 3 urgent needs, such as food, water, medical care, shelter, rescue, communication or electricity.
+        * people_affected: an integer; use explicit numbers if given, otherwise estimate from context
+          (e.g. "hundreds displaced", "entire village evacuated").
+        * confidence: a number between 0 and 1. 1.0 for clear, explicit evidence; 0.7-0.9 when partly
+          inferred; 0.4-0.6 with moderate uncertainty; below 0.4 when information is very limited.
+
+        Respond only with syntactically valid JSON, with no text before or after it:
+        {"summary": "<the summary>", "location": "<place>", "support_level": "<support level>", "confidence": <0-1>, "priority_needs": ["need1", "need2", "need3"], "people_affected": <integer>}
+    """).strip(),
+    'compact': textwrap.dedent("""
+        You are a disaster response analyst. For the news article given, return one JSON object with:
+        - summary: one factual, neutral paragraph of at most {max_chars} characters with the key who, what, when, where and numbers
+        - location: the place most affected
+        - support_level: one of Minimal Support, Moderate Support, High Support, Emergency/Critical Support
+        - confidence: a number between 0 and 1 reflecting how certain the assessment is
+        - priority_needs: the top 3 urgent needs, such as food, water, medical care, shelter, rescue
+        - people_affected: the number of people affected, estimated from context if not stated
+        Use only facts stated or strongly implied in the article. Respond only with JSON, no other text:
+        {"summary": "<the summary>", "location": "<place>", "support_level": "<support level>", "confidence": <0-1>, "priority_needs": ["need1", "need2", "need3"], "people_affected": <integer>}
+    """).strip(),
+}
+
+
+@lru_cache(maxsize=8)
+def analysis_system_prompt(max_chars=500, variant=PROMPT_VARIANT):
+    """
+    The fused analysis system instruction with the character limit filled in.
+    """
+    template = _ANALYSIS_SYSTEM_TEMPLATES.get(variant, _ANALYSIS_SYSTEM_TEMPLATES['full'])
+    return template.replace('{max_chars}', str(max_chars))
+
+
+def build_analysis_prompt(title, description, max_chars=500, variant=PROMPT_VARIANT):
+    """
+    System instruction and user message asking for one article's summary and
+    disaster classification in a single JSON answer.
+    """
+    system = analysis_system_prompt(max_chars, variant)
+    prefix = f"Please provide the summary and assessment for the following article text:\n\nTitle: {title}\n\nDescription: "
+    fixed_tokens = estimate_tokens(system) + estimate_tokens(prefix)
+    description, trimmed = trim_to_tokens(description, INPUT_TOKEN_BUDGETS['gemini'] - fixed_tokens)
+    user = prefix + description
+    return Prompt(system, user, estimate_tokens(system) + estimate_tokens(user), trimmed)
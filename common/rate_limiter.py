@@ -0,0 +1,171 @@
+"""
+Proactive token-bucket rate limiting for upstream APIs.
+
+Each upstream gets a named bucket (see LIMITS) that callers draw from before
+sending a request, so we pace ourselves under the quota instead of reacting to
+429s. Buckets are thread-safe and shared by every thread in the process. After
+a throttle the bucket honours the server's Retry-After and halves its rate,
+then recovers gradually with each success (additive increase, multiplicative
+decrease).
+"""
+import email.utils
+import os
+import threading
+import time
+
+# Requests (or tokens) per minute for each upstream. 0 disables the limit.
+LIMITS = {
+    'gnews': float(os.environ.get('RATE_LIMIT_GNEWS_RPM', '60')),
+    'gemini': float(os.environ.get('RATE_LIMIT_GEMINI_RPM', '1000')),
+    'gemini_tokens': float(os.environ.get('RATE_LIMIT_GEMINI_TPM', '1000000')),
+    'bedrock': float(os.environ.get('RATE_LIMIT_BEDROCK_RPM', '800')),
+}
+# Burst size of each bucket, in seconds' worth of its rate
+RATE_LIMIT_BURST_SECONDS = float(os.environ.get('RATE_LIMIT_BURST_SECONDS', '1'))
+# Never wait longer than this for a throttled upstream; fail the call instead
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get('RATE_LIMIT_MAX_WAIT_SECONDS', '30'))
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when honouring the limit would mean waiting longer than allowed.
+    """
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute / 60` tokens per second.
+    """
+
+    def __init__(self, name, rate_per_minute, burst_seconds=RATE_LIMIT_BURST_SECONDS):
+        self.name = name
+        self.base_rate = rate_per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = max(1.0, self.base_rate * burst_seconds)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited_seconds": 0.0, "throttles": 0}
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1, max_wait=RATE_LIMIT_MAX_WAIT_SECONDS):
+        """
+        Blocks until `tokens` are available and takes them. Requests larger than
+        the bucket are clamped to its capacity so they can still proceed.
+        Returns the number of seconds spent waiting.
+        """
+        tokens = min(float(tokens), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(0.0, self._blocked_until - now)
+                if wait == 0.0:
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        self.stats["acquired"] += 1
+                        self.stats["waited_seconds"] += waited
+                        return waited
+                    wait = (tokens - self._tokens) / self.rate
+            if waited + wait > max_wait:
+                raise RateLimitExceeded(f"{self.name}: would wait {waited + wait:.1f}s (limit {max_wait}s)")
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, retry_after=None):
+        """
+        Records a throttle from the upstream: pauses the bucket for `retry_after`
+        seconds (or one refill interval if the server did not say) and halves the
+        rate, down to a tenth of the configured rate.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            delay = retry_after if retry_after is not None else 1.0 / self.rate
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._tokens = 0.0
+            self.rate = max(self.base_rate * 0.1, self.rate * 0.5)
+            self.stats["throttles"] += 1
+
+    def on_success(self):
+        """
+        Recovers 5% of the configured rate after a successful call.
+        """
+        with self._lock:
+            if self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * 0.05)
+
+    def get_stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            stats = dict(self.stats)
+            stats["remaining"] = round(self._tokens, 2)
+            stats["capacity"] = round(self.capacity, 2)
+            stats["rate_per_minute"] = round(self.rate * 60, 2)
+        stats["waited_seconds"] = round(stats["waited_seconds"], 3)
+        return stats
+
+
+class _Unlimited:
+    """
+    Stand-in for a disabled limit; every call succeeds immediately.
+    """
+
+    def acquire(self, tokens=1, max_wait=None):
+        return 0.0
+
+    def penalize(self, retry_after=None):
+        pass
+
+    def on_success(self):
+        pass
+
+    def get_stats(self):
+        return None
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """
+    Returns the process-wide bucket for an upstream named in LIMITS.
+    """
+    with _buckets_lock:
+        if name not in _buckets:
+            rate = LIMITS.get(name, 0)
+            _buckets[name] = TokenBucket(name, rate) if rate > 0 else _Unlimited()
+        return _buckets[name]
+
+
+def get_limiter_stats():
+    """
+    Remaining budget and throttle counters for every bucket used so far.
+    """
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    return {name: bucket.get_stats() for name, bucket in buckets.items() if bucket.get_stats() is not None}
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header (delay in seconds or an HTTP date) into seconds.
+    Returns None when the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -0,0 +1,140 @@
+"""
+Cheap in-process relevance scoring, run before any paid inference.
+
+A broad GNews query ("natural disaster OR climate change") also returns
+policy, market and opinion pieces. Each of those would cost a Gemini summary
+and a Llama classification, but none describes an event anyone needs help
+with. RelevanceModel is a small linear model over word and two-word features
+that scores how likely an article is a report of an actual disaster.
+Articles scoring below the threshold are stored as skipped and never reach a
+model. The bias is neutral (an article with no known words scores 0.5), so a
+keyword list that misses some kind of disaster can't drop its reports: only
+policy, market and opinion words push a score below the threshold.
+
+The built-in weights are hand-tuned keyword log-odds. A model trained offline
+can replace them with a JSON file of the same shape:
+{"bias": 0.0, "title_weight": 1.5, "weights": {"earthquake": 2.5, "op ed": -2.0}}.
+"""
+import json
+import math
+import re
+import threading
+import unicodedata
+
+from common import metrics
+
+# Positive weights: words that show up in reports of a specific event
+EVENT_TERMS = {
+    'earthquake': 2.5, 'earthquakes': 2.0, 'quake': 2.5, 'tremor': 1.5, 'aftershock': 2.0, 'aftershocks': 2.0,
+    'magnitude': 1.5, 'tsunami': 2.5, 'flood': 2.0, 'floods': 2.0, 'flooding': 2.0, 'flash flood': 1.0,
+    'landslide': 2.5, 'landslides': 2.5, 'mudslide': 2.5, 'avalanche': 2.0, 'wildfire': 2.5, 'wildfires': 2.5,
+    'bushfire': 2.5, 'blaze': 1.5, 'fire': 1.2, 'fires': 1.2, 'hurricane': 2.0, 'typhoon': 2.5,
+    'cyclone': 2.5, 'tornado': 2.5, 'tornadoes': 2.5, 'storm': 1.2, 'storms': 1.0, 'rain': 1.0, 'rains': 1.2,
+    'rainfall': 1.0, 'downpour': 1.2, 'monsoon': 1.5, 'blizzard': 1.5, 'volcano': 2.0, 'eruption': 2.0,
+    'erupts': 2.0, 'drought': 1.2, 'heatwave': 1.5, 'heat wave': 1.5, 'famine': 1.5, 'outbreak': 1.5,
+    'cholera': 2.0, 'epidemic': 1.5, 'explosion': 1.5, 'evacuate': 1.5, 'evacuated': 1.8, 'evacuation': 1.5,
+    'evacuations': 1.5, 'evacuees': 1.8, 'killed': 1.5, 'dead': 1.2, 'death toll': 2.0, 'deaths': 1.0,
+    'injured': 1.2, 'missing': 0.8, 'displaced': 1.5, 'homeless': 1.0, 'trapped': 1.5, 'stranded': 1.2,
+    'rescue': 1.2, 'rescued': 1.5, 'rescuers': 1.5, 'victims': 1.2, 'survivors': 1.2, 'destroyed': 1.0,
+    'damage': 0.8, 'damaged': 0.8, 'collapsed': 1.2, 'emergency': 1.0, 'state of emergency': 1.5,
+    'relief': 0.8, 'shelter': 0.8, 'shelters': 0.8, 'power outage': 1.0, 'outages': 0.8, 'warning': 0.5,
+    'alert': 0.5, 'disaster': 0.7, 'hits': 0.6, 'struck': 0.8, 'strikes': 0.5, 'toll': 0.8,
+}
+
+# Negative weights: policy, markets, science and opinion coverage
+NON_EVENT_TERMS = {
+    'opinion': -2.0, 'op ed': -2.0, 'editorial': -2.0, 'column': -1.0, 'podcast': -2.0, 'interview': -1.0,
+    'review': -1.0, 'book': -1.2, 'film': -1.2, 'movie': -1.5, 'documentary': -1.2, 'how to': -1.0,
+    'tips': -1.0, 'policy': -1.2, 'policies': -1.2, 'summit': -1.5, 'cop28': -1.5, 'cop29': -1.5,
+    'cop30': -1.5, 'negotiations': -1.2, 'treaty': -1.2, 'pledge': -1.0, 'pledges': -1.0,
+    'emissions': -1.5, 'carbon': -1.2, 'net zero': -1.5, 'renewable': -1.2, 'renewables': -1.2,
+    'solar': -1.0, 'electric vehicles': -1.5, 'investors': -1.5, 'stocks': -1.5, 'shares': -1.0,
+    'market': -0.8, 'markets': -0.8, 'esg': -1.5, 'election': -1.2, 'campaign': -0.8, 'senate': -0.8,
+    'congress': -0.8, 'lawsuit': -1.0, 'court': -0.8, 'study': -1.0, 'research': -0.8,
+    'researchers': -0.8, 'scientists': -0.6, 'climate change': -0.5, 'global warming': -0.6,
+    'anniversary': -1.0, 'years ago': -1.0, 'preparedness': -0.6,
+}
+
+DEFAULT_BIAS = 0.0
+# Title features count this many times as much as description features
+DEFAULT_TITLE_WEIGHT = 1.5
+
+
+def features(text):
+    """
+    Distinct word and two-word features of normalized text.
+    """
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    tokens = re.sub(r"[^a-z0-9]+", ' ', text.replace("'", '')).split()
+    return set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+
+
+class RelevanceModel:
+    """
+    Logistic model: sigmoid(bias + sum of the weights of the features present,
+    with title features scaled by title_weight). Each feature counts once per
+    field, so long or repetitive text can't pile up a score.
+    """
+
+    def __init__(self, weights=None, bias=DEFAULT_BIAS, title_weight=DEFAULT_TITLE_WEIGHT):
+        self.weights = weights if weights is not None else {**EVENT_TERMS, **NON_EVENT_TERMS}
+        self.bias = bias
+        self.title_weight = title_weight
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['weights'], data.get('bias', DEFAULT_BIAS), data.get('title_weight', DEFAULT_TITLE_WEIGHT))
+
+    def _field_score(self, text):
+        weights = self.weights
+        return sum(weights.get(feature, 0.0) for feature in features(text))
+
+    def score(self, title, description):
+        """
+        Probability-like relevance in [0, 1].
+        """
+        logit = self.bias + self.title_weight * self._field_score(title) + self._field_score(description)
+        # Clamped so extreme inputs can't overflow exp()
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, logit))))
+
+    def score_many(self, articles):
+        """
+        Scores for a page of GNews articles, in order.
+        """
+        return [self.score(article.get('title'), article.get('description')) for article in articles]
+
+
+class RelevanceFilter:
+    """
+    Splits articles into relevant and skipped by model score, keeping counts
+    of how many were scored and skipped across warm invocations.
+    """
+
+    def __init__(self, model, threshold):
+        self.model = model
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.stats = {"scored": 0, "skipped": 0}
+
+    def split(self, articles):
+        """
+        Returns (relevant, skipped) lists of (article, score) pairs, each in input order.
+        """
+        relevant, skipped = [], []
+        for article, score in zip(articles, self.model.score_many(articles)):
+            (relevant if score >= self.threshold else skipped).append((article, score))
+        with self._lock:
+            self.stats["scored"] += len(articles)
+            self.stats["skipped"] += len(skipped)
+        metrics.count("relevance.scored", len(articles))
+        metrics.count("relevance.skipped", len(skipped))
+        return relevant, skipped
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["skip_rate"] = round(stats["skipped"] / stats["scored"], 3) if stats["scored"] else 0.0
+        stats["threshold"] = self.threshold
+        return stats
@@ -0,0 +1,58 @@
+"""
+Tests for common/clustering.py. Run from the repo root: python -m pytest common
+"""
+import json
+
+from common.cache import TieredCache
+from common.clustering import EventIndex
+
+QUAKE = "Magnitude 7.1 earthquake strikes central Nepal, buildings collapse in Kathmandu"
+QUAKE_AGAIN = "Magnitude 7.1 earthquake strikes central Nepal, buildings collapse in Kathmandu valley"
+FLOOD = "Flash floods sweep through Valencia after record rainfall, dozens missing"
+
+
+def test_new_events_are_indexed_only_on_commit():
+    index = EventIndex(TieredCache())
+    first = index.assign([("a", QUAKE), ("b", QUAKE_AGAIN)])
+    assert first[0]["new_event"] and first[1]["representative_url"] == "a"
+    assert "signature" in first[0] and "signature" not in first[1]
+
+    # The representative's row was never written: nothing was indexed
+    assert index.assign([("c", QUAKE_AGAIN)])[0]["representative_url"] == "c"
+
+    assert index.commit(first) == 1
+    later = index.assign([("d", QUAKE_AGAIN)])[0]
+    assert later["representative_url"] == "a" and not later["new_event"]
+
+
+def test_bucket_collisions_keep_every_event():
+    index = EventIndex(TieredCache())
+    quake = index.assign([("a", QUAKE)])
+    index.commit(quake)
+    key = index.band_keys(quake[0]["signature"])[0]
+
+    # Force a second event into one of the quake's buckets
+    flood = index.assign([("f", FLOOD)])
+    flood_keys = index.band_keys(flood[0]["signature"])
+    index.band_keys = lambda signature: [key] + flood_keys[1:] if signature == flood[0]["signature"] else flood_keys
+    index.commit(flood)
+
+    events = json.loads(index.cache.get_many([key])[key])
+    assert [event["url"] for event in events] == ["a", "f"]
+
+
+def test_reads_single_event_buckets():
+    index = EventIndex(TieredCache())
+    signature = index.hasher.signature(QUAKE)
+    index.cache.put_many({key: json.dumps({"event_id": "evt_old", "url": "old", "signature": signature})
+                          for key in index.band_keys(signature)})
+    assert index.assign([("b", QUAKE_AGAIN)])[0]["event_id"] == "evt_old"
+
+
+def test_articles_without_text_are_not_clustered():
+    index = EventIndex(TieredCache())
+    assignments = index.assign([("a", "\n"), ("b", ""), ("c", QUAKE), ("d", "!!! ...")])
+    assert assignments[0] is None and assignments[1] is None and assignments[3] is None
+    assert assignments[2]["new_event"]
+    assert index.commit(assignments) == 1
+    assert index.assign([("e", "")]) == [None]
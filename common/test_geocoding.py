@@ -0,0 +1,73 @@
+"""
+Tests for common/geocoding.py. Run from the repo root: python -m pytest common
+"""
+import pytest
+
+from common.geocoding import Gazetteer, Geocoder, is_ambiguous_alias
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer()
+
+
+def place_id(gazetteer, text):
+    place = gazetteer.resolve(text)
+    return place.place_id if place else None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Flooding near Houston, Texas", "city:US-TX-houston"),
+    ("Houston Texas", "city:US-TX-houston"),
+    ("Kathmandu, Nepal", "city:NP-kathmandu"),
+    ("Los Angeles", "city:US-CA-los-angeles"),
+    ("Rio de Janeiro", "city:BR-rio-de-janeiro"),
+    ("Texas", "admin1:US-TX"),
+    ("Spain", "country:ES"),
+    ("Atlantis", None),
+])
+def test_resolves_plain_names(gazetteer, text, expected):
+    assert place_id(gazetteer, text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Short all-caps aliases are not indexed, so "La" is not Los Angeles
+    ("La Palma, Spain", "country:ES"),
+    # The city is kept when the named region agrees with it
+    ("Tbilisi, Georgia", "city:GE-tbilisi"),
+    # Cities outside the named state or country lose to the region
+    ("Paris, Texas", "admin1:US-TX"),
+    ("Valencia, Venezuela", "country:VE"),
+    ("Paris, France", "city:FR-paris"),
+    ("Valencia, Spain", "city:ES-valencia"),
+    # Names followed by another capitalized word are a different place
+    ("Rio Grande valley", None),
+    ("Riverside Town", None),
+    ("Riverside, California", "city:US-CA-riverside"),
+    # "America" alone is not an alias of the United States
+    ("Central America", None),
+    ("South America", None),
+    ("United States of America", "country:US"),
+    # A city qualified by a region the gazetteer doesn't know is another place
+    ("Sydney, Nova Scotia", None),
+    ("Sydney, Australia", "city:AU-sydney"),
+    ("Houston, TX", "city:US-TX-houston"),
+])
+def test_context_and_whole_names(gazetteer, text, expected):
+    assert place_id(gazetteer, text) == expected
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("LA", True), ("UK", True), ("DRC", True), ("Rio", False), ("U.S.A.", False), ("USA", True),
+])
+def test_ambiguous_aliases(label, expected):
+    assert is_ambiguous_alias(label) == expected
+
+
+def test_geocoder_memoizes_in_process(gazetteer):
+    geocoder = Geocoder(gazetteer, max_entries=8)
+    for _ in range(2):
+        assert geocoder.geocode("Houston, Texas")["place_id"] == "city:US-TX-houston"
+        assert geocoder.geocode("Atlantis") is None
+    assert geocoder.geocode("") is None
+    assert geocoder.get_stats() == {"lookups": 4, "resolved": 2, "unresolved": 2, "cache_hits": 2}
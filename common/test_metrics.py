@@ -0,0 +1,28 @@
+"""
+Tests for common/metrics.py. Run from the repo root: python -m pytest common
+"""
+import json
+
+from common import metrics
+
+
+def test_emf_splits_metrics_across_directives(capsys, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_FORMAT", "emf")
+    for i in range(230):
+        metrics.count(f"counter.{i}", i)
+    metrics.record("gemini", 12.5)
+    metrics.flush("scraper")
+
+    line = json.loads(capsys.readouterr().out)
+    directives = line["_aws"]["CloudWatchMetrics"]
+    assert [len(directive["Metrics"]) for directive in directives] == [100, 100, 34]
+    names = [metric["Name"] for directive in directives for metric in directive["Metrics"]]
+    assert len(set(names)) == 234
+    assert all(name in line for name in names)
+    assert line["counter.229"] == 229
+
+
+def test_emf_without_metrics_has_no_directives(capsys, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_FORMAT", "emf")
+    metrics.flush("scraper")
+    assert json.loads(capsys.readouterr().out)["_aws"]["CloudWatchMetrics"] == []
@@ -0,0 +1,156 @@
+"""
+Tests for common/model_output.py. Run from the repo root: python -m pytest common
+"""
+import pytest
+
+from common.model_output import (
+    FALLBACK_SUPPORT_LEVEL,
+    ModelOutputError,
+    get_parse_stats,
+    iter_json_objects,
+    parse_analysis,
+    parse_classification,
+    parse_confidence,
+    parse_people_count,
+)
+
+VALID = ('{"location": "Nepal", "support_level": "High Support", "confidence": 0.8, '
+         '"priority_needs": ["rescue", "shelter"], "people_affected": 2000}')
+
+
+def test_plain_object():
+    result = parse_classification(VALID)
+    assert result == {
+        "location": "Nepal",
+        "support_level": "High Support",
+        "confidence": 0.8,
+        "priority_needs": ["rescue", "shelter"],
+        "people_affected": 2000,
+    }
+
+
+def test_fenced_and_wrapped_in_prose():
+    completion = f"Here is the analysis:\n```json\n{VALID}\n```\nLet me know if you need more."
+    assert parse_classification(completion)["support_level"] == "High Support"
+
+
+def test_braces_inside_strings_and_nested_arrays():
+    completion = ('{"location": "Camp {North}", "support_level": "moderate", "confidence": "70%", '
+                  '"priority_needs": [["water"], "food"], "people_affected": "hundreds"}')
+    assert list(iter_json_objects("x " + completion + " y")) == [completion]
+    result = parse_classification(completion)
+    assert result["location"] == "Camp {North}"
+    assert result["support_level"] == "Moderate Support"
+    assert result["confidence"] == 0.7
+    assert result["people_affected"] == 200
+
+
+def test_skips_invalid_candidates():
+    completion = '{"example": true} then the answer: ' + VALID
+    assert parse_classification(completion)["location"] == "Nepal"
+
+
+def test_trailing_commas_and_comments():
+    completion = ('{"location": "Chile", // the region\n "support_level": "Emergency/Critical Support", '
+                  '"confidence": 0.9, "priority_needs": ["rescue",], "people_affected": "1.2 million",}')
+    result = parse_classification(completion)
+    assert result["support_level"] == "Emergency/Critical Support"
+    assert result["priority_needs"] == ["rescue"]
+    assert result["people_affected"] == 1_200_000
+
+
+@pytest.mark.parametrize("completion", [
+    "",
+    "I'm sorry, I can't classify this article.",
+    VALID[:len(VALID) // 2],
+    '{"location": "Nepal", "support_level": "High Support", "confidence": 0.8',
+    '{"location": "Nepal"}',
+    '{"location": "Nepal", "support_level": 3, "confidence": 0.5, "people_affected": 1}',
+    '{"location": "Nepal", "support_level": "High", "confidence": "very", "people_affected": 1}',
+])
+def test_malformed_or_truncated_output_raises(completion):
+    failed_before = get_parse_stats()["failed"]
+    with pytest.raises(ModelOutputError):
+        parse_classification(completion)
+    assert get_parse_stats()["failed"] == failed_before + 1
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Unknown", FALLBACK_SUPPORT_LEVEL),
+    ("No support needed", FALLBACK_SUPPORT_LEVEL),
+    ("none", FALLBACK_SUPPORT_LEVEL),
+    ("not high", FALLBACK_SUPPORT_LEVEL),
+    ("CRITICAL", "Emergency/Critical Support"),
+    ("medium support", "Moderate Support"),
+    ("Low", "Minimal Support"),
+])
+def test_support_level_synonyms_and_negations(value, expected):
+    completion = f'{{"location": "Peru", "support_level": "{value}", "confidence": 0.4, "people_affected": 10}}'
+    assert parse_classification(completion)["support_level"] == expected
+
+
+@pytest.mark.parametrize("value", ["banana", "below average", "slowly improving", "Support", "???"])
+def test_unrecognized_support_levels_raise(value):
+    completion = f'{{"location": "Peru", "support_level": "{value}", "confidence": 0.4, "people_affected": 10}}'
+    with pytest.raises(ModelOutputError):
+        parse_classification(completion)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (2000, 2000),
+    ("2,000", 2000),
+    ("about 1.2 million", 1_200_000),
+    ("5k", 5000),
+    ("hundreds of thousands", 200_000),
+    ("dozens", 24),
+    (-40, 0),
+    (1e30, 0),
+    ("3 billion", 3_000_000_000),
+    ("9 billion", 0),
+    (float("inf"), 0),
+    (float("nan"), 0),
+    ("many", None),
+    (True, None),
+    ([5], None),
+])
+def test_people_count(value, expected):
+    assert parse_people_count(value) == expected
+
+
+def test_out_of_range_values_in_output():
+    completion = ('{"location": "Peru", "support_level": "High Support", "confidence": 150, '
+                  '"people_affected": 1e30}')
+    result = parse_classification(completion)
+    assert result["confidence"] == 1.0
+    assert result["people_affected"] == 0
+
+    # Python's json accepts these non-standard literals
+    completion = ('{"location": "Peru", "support_level": "High Support", "confidence": NaN, '
+                  '"people_affected": Infinity}')
+    result = parse_classification(completion)
+    assert result["confidence"] == 0.0
+    assert result["people_affected"] == 0
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.8, 0.8), ("0.8", 0.8), ("80%", 0.8), (80, 0.8), ("80", 0.8), (-1, 0.0), (250, 1.0),
+    ("1.5", 1.0), (1.5, 1.0), (85.5, 1.0), ("85.5%", 0.855), (1, 1.0), ("100", 1.0),
+])
+def test_confidence(value, expected):
+    assert parse_confidence(value) == pytest.approx(expected)
+
+
+def test_missing_people_and_location():
+    completion = '{"support_level": "Minimal Support", "confidence": 0.2, "people_affected": "unknown"}'
+    result = parse_classification(completion, fallback_location="Lima")
+    assert result["location"] == "Lima"
+    assert result["people_affected"] == 0
+    assert result["priority_needs"] == []
+
+
+def test_analysis_requires_summary():
+    with pytest.raises(ModelOutputError):
+        parse_analysis(VALID)
+    result = parse_analysis(VALID[:-1] + ', "summary": "  A quake hit Nepal.  "}', max_chars=10)
+    assert result["summary"] == "A quake hi"
+    assert result["support_level"] == "High Support"
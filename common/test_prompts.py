@@ -0,0 +1,18 @@
+"""
+Tests for common/prompts.py. Run from the repo root: python -m pytest common
+"""
+import pytest
+
+from common.prompts import build_analysis_prompt, summary_system_prompt
+
+
+@pytest.mark.parametrize("variant", ["full", "compact"])
+def test_analysis_prompt_asks_only_for_json(variant):
+    prompt = build_analysis_prompt("Quake hits Nepal", "A strong earthquake struck.", 300, variant)
+    assert prompt.system != summary_system_prompt(300, variant)
+    assert "Output ONLY the summary text" not in prompt.system
+    assert "only the summary text" not in prompt.system.lower()
+    assert "300 characters" in prompt.system
+    assert '{"summary": "<the summary>"' in prompt.system
+    assert "{max_chars}" not in prompt.system
+    assert prompt.user.endswith("A strong earthquake struck.")
@@ -0,0 +1,47 @@
+"""
+Tests for common/relevance.py. Run from the repo root: python -m pytest common
+"""
+import pytest
+
+from common.relevance import RelevanceFilter, RelevanceModel
+
+# The scraper's default RELEVANCE_THRESHOLD
+THRESHOLD = 0.3
+
+
+@pytest.fixture(scope="module")
+def model():
+    return RelevanceModel()
+
+
+@pytest.mark.parametrize("title", [
+    "Heavy monsoon rains lash Mumbai",
+    "Fire guts 200 homes in Dhaka slum",
+    "Cholera outbreak spreads in Sudan camps",
+    "Magnitude 6.8 earthquake strikes off Japan coast",
+])
+def test_event_reports_pass(model, title):
+    assert model.score(title, "") >= THRESHOLD
+
+
+def test_no_evidence_is_neutral(model):
+    assert model.score("Residents of Kharkiv count the cost", "") == pytest.approx(0.5)
+    assert model.score("", "") >= THRESHOLD
+
+
+@pytest.mark.parametrize("title, description", [
+    ("Opinion: what COP29 means for climate policy", "World leaders meet at the summit."),
+    ("Investors pile into renewable energy stocks", "Shares of solar makers rose."),
+    ("Climate change study links warming to crop yields", "Researchers published the study on Monday."),
+])
+def test_non_event_coverage_is_skipped(model, title, description):
+    assert model.score(title, description) < THRESHOLD
+
+
+def test_filter_splits_in_order(model):
+    articles = [{"title": "Cholera outbreak spreads in Sudan camps"},
+                {"title": "Opinion: the carbon market after the summit"},
+                {"title": "Heavy monsoon rains lash Mumbai"}]
+    relevant, skipped = RelevanceFilter(model, THRESHOLD).split(articles)
+    assert [article["title"][:7] for article, _ in relevant] == ["Cholera", "Heavy m"]
+    assert [article["title"][:7] for article, _ in skipped] == ["Opinion"]
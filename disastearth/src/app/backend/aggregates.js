@@ -0,0 +1,16 @@
+// Dashboard rollups served by getAggregates.js (see common/aggregates.py):
+// two DynamoDB items, however many articles are stored
+const AGGREGATES_URL = "https://051b7yn3oi.execute-api.us-east-1.amazonaws.com/prod/aggregates";
+
+let inFlight = null;
+
+// Components that mount together share one request
+export function fetchAggregates() {
+  if (!inFlight) {
+    inFlight = fetch(AGGREGATES_URL)
+      .then(res => res.json())
+      .then(data => (typeof data.body === "string" ? JSON.parse(data.body) : data))
+      .finally(() => { inFlight = null; });
+  }
+  return inFlight;
+}
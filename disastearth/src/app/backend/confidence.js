@@ -1,15 +1,11 @@
 "use client";
 import { useEffect } from "react";
+import { fetchAggregates } from "./aggregates";
 
 function Confidence({ onData }) {
   useEffect(() => {
-    fetch("https://051b7yn3oi.execute-api.us-east-1.amazonaws.com/prod/totals")
-      .then(res => res.json())
-      .then(data => {
-        const parsedData = Array.isArray(data)
-          ? data
-          : JSON.parse(data.body || "[]");
-
+    fetchAggregates()
+      .then(aggregates => {
         const supportMap = {
           "Unknown": 0,
           "Minimal Support": 1,
@@ -17,23 +13,14 @@ function Confidence({ onData }) {
           "High Support": 3,
         };
 
-        // Keep as objects
-        const cardData = parsedData.map(item => {
-          const supportValue = supportMap[item.support] ?? 0;
-          const confidence = parseFloat(item.confidence) || 0;
-          return { confidence, support: supportValue };
-        });
-
-        const totalWeightedConfidenceRaw = cardData.reduce(
-          (acc, item) => acc + (item.confidence * item.support), 0);
-
-        const averageConfidence = cardData.length > 0
-          ? totalWeightedConfidenceRaw / cardData.length
-          : 1000;
-
-
+        // Sum of confidence * support weight over every article, from the
+        // per-level counts and average confidences
+        const levels = aggregates.supportLevels || {};
+        const totalWeightedConfidenceRaw = Object.keys(levels).reduce(
+          (acc, level) => acc + (supportMap[level] ?? 0) * levels[level].averageConfidence * levels[level].count, 0);
 
-        // console.log("Confidence fetched:", averageConfidence, "→ clamped:", clampedValue);
+        const articles = Number(aggregates.articles) || 0;
+        const averageConfidence = articles > 0 ? totalWeightedConfidenceRaw / articles : 0;
 
         if (onData) onData(averageConfidence * 100);
       })
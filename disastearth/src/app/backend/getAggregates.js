@@ -0,0 +1,57 @@
+const AWS = require('aws-sdk');
+const dynamoDB = new AWS.DynamoDB.DocumentClient();
+
+// Rollups maintained by the Bedrock classifier (see common/aggregates.py)
+const AGGREGATES_TABLE = process.env.AGGREGATES_TABLE || 'NewsAggregates';
+
+exports.handler = async (event) => {
+    const params = {
+        RequestItems: {
+            [AGGREGATES_TABLE]: {
+                Keys: [{ aggregate_id: 'totals' }, { aggregate_id: 'needs' }]
+            }
+        }
+    };
+
+    try {
+        const data = await dynamoDB.batchGet(params).promise();  // Two items, whatever the table size
+        const items = data.Responses[AGGREGATES_TABLE] || [];
+        const totals = items.find(item => item.aggregate_id === 'totals') || {};
+        const needsItem = items.find(item => item.aggregate_id === 'needs') || {};
+
+        const articles = Number(totals.articles) || 0;
+        const supportLevels = {};
+        Object.keys(totals)
+            .filter(name => name.startsWith('count:'))
+            .forEach(name => {
+                const level = name.slice('count:'.length);
+                const count = Number(totals[name]) || 0;
+                const confidenceSum = Number(totals[`confidence_sum:${level}`]) || 0;
+                supportLevels[level] = { count, averageConfidence: count ? confidenceSum / count : 0 };
+            });
+
+        const needs = Object.keys(needsItem)
+            .filter(name => name.startsWith('need:') && Number(needsItem[name]) > 0)
+            .map(name => ({ need: name.slice('need:'.length), count: Number(needsItem[name]) }))
+            .sort((a, b) => b.count - a.count);
+
+        return {
+            statusCode: 200,
+            headers: {
+                "Access-Control-Allow-Origin": "*" // Allow React frontend to fetch
+            },
+            body: JSON.stringify({
+                articles,
+                peopleAffected: Number(totals.people_affected) || 0,
+                averageConfidence: articles ? (Number(totals.confidence_sum) || 0) / articles : 0,
+                supportLevels,
+                needs
+            })
+        };
+    } catch (err) {
+        return {
+            statusCode: 500,
+            body: JSON.stringify({ error: err.message })
+        };
+    }
+};
@@ -1,9 +1,15 @@
 const AWS = require('aws-sdk');
 const dynamoDB = new AWS.DynamoDB.DocumentClient();
 
+// What the news list shows; shared with common/item_format.py (LIST_PROJECTION)
+const LIST_ATTRIBUTES = require('../../../../common/data/list_attributes.json');
+
 exports.handler = async (event) => {
+    // Only what the news list shows; the compressed source text (body_z) stays behind
     const params = {
-        TableName: 'NewsTable'
+        TableName: 'NewsTable',
+        ProjectionExpression: LIST_ATTRIBUTES.map(name => (name === 'url' ? '#u' : name)).join(', '),
+        ExpressionAttributeNames: { '#u': 'url' }  // url is a reserved word
     };
 
     try {
@@ -1,21 +1,16 @@
 // NewsList.jsx
 "use client";
 import { useEffect } from "react";
+import { fetchAggregates } from "./aggregates";
 
 function NeedsList({ onData }) {
   useEffect(() => {
-    fetch("https://051b7yn3oi.execute-api.us-east-1.amazonaws.com/prod/confidence")
-      .then(res => res.json())
-      .then(data => {
-        const parsedData = Array.isArray(data) ? data : JSON.parse(data.body || "[]");
-
-        const filteredData = parsedData.filter(item => Number(item.confidence) !== 0);
-
-        const cardData = filteredData.map(item => ({
-          location: item.location || "No Title",
-          support: item.support || "",
-          confidence: item.confidence || 0,
-          prio: item.prio || "No needs"
+    fetchAggregates()
+      .then(aggregates => {
+        // One { need, count } card per need, most frequent first (getAggregates.js sorts them)
+        const cardData = (aggregates.needs || []).map(item => ({
+          need: item.need.charAt(0).toUpperCase() + item.need.slice(1),
+          count: item.count,
         }));
 
         if (onData) onData(cardData);
@@ -1,16 +1,12 @@
 // NewsList.jsx
 "use client";
 import { useEffect } from "react";
+import { fetchAggregates } from "./aggregates";
 
 function TotalsList({ onData }) {
   useEffect(() => {
-    fetch("https://051b7yn3oi.execute-api.us-east-1.amazonaws.com/prod/totals")
-      .then(res => res.json())
-      .then(data => {
-        const parsedData = Array.isArray(data)
-          ? data
-          : JSON.parse(data.body || "[]");
-
+    fetchAggregates()
+      .then(aggregates => {
         const formatNumber = (num) => {
             if (num >= 1_000_000_000) return (num / 1_000_000_000).toFixed(1).replace(/\.0$/, "") + "B";
             if (num >= 1_000_000) return (num / 1_000_000).toFixed(1).replace(/\.0$/, "") + "M";
@@ -18,19 +14,9 @@ function TotalsList({ onData }) {
             return num.toString();
           };
 
-        // Transform API data
-        const cardData = parsedData.map(item => {
-          return {
-            people: Number(item.people) || 0,
-          };
-        });
-
-        const totalPeople = cardData.reduce(
-          (acc, item) => acc + item.people,
-          0
-        );
-
-        const totalItems = cardData.length;
+        // Classified articles and people affected, precomputed by the classifier
+        const totalItems = Number(aggregates.articles) || 0;
+        const totalPeople = Number(aggregates.peopleAffected) || 0;
 
         // Build metrics array
         const metrics = [
@@ -30,11 +30,21 @@ const NeedsPages = ({ cardData = [], height = 400, width = 400 }) => {
     </div>
   );
 
+  // Render a need from the aggregates with the number of events needing it
+  const renderNeedCard = (need, count) => (
+    <div className="bg-black rounded-xl p-4 mb-3 shadow-lg w-full">
+      <h2 className="text-md font-extrabold mb-2"> {need}</h2>
+      <p className="text-white font-bold text-sm">{count || 0} {count === 1 ? "event" : "events"}</p>
+    </div>
+  );
+
   const renderAllCards = (ref) => (
     <div ref={ref} className="flex flex-col">
       {cardData.map((data, index) => (
         <React.Fragment key={index}>
-          {renderCard(data.location, data.support, data.confidence, data.prio)}
+          {data.need !== undefined
+            ? renderNeedCard(data.need, data.count)
+            : renderCard(data.location, data.support, data.confidence, data.prio)}
         </React.Fragment>
       ))}
     </div>
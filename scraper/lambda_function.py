@@ -1,16 +1,28 @@
 import os
-import requests
+import hashlib
 import json
 import random
+import re
 import time
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from datetime import timezone # Added for non-deprecated UTC time
-
-# Import boto3 for AWS services
-import boto3
-# Initialize AWS DynamoDB (Boto3 will pick up credentials from the Lambda environment)
-dynamodb = boto3.resource('dynamodb')
-client = boto3.client('dynamodb') # Client is used for the batch_get_item call
+from decimal import Decimal
+
+from common import aggregates, aws, http_client, item_format, metrics
+from common.http_client import safe_api_request
+from common.batch_writer import BatchItemWriter
+from common.cache import DynamoCacheTier, FileCacheTier, TieredCache
+from common.classification import CLASSIFIER_VERSION, analysis_inputs_hash, classification_attributes
+from common.clustering import EventIndex
+from common.dedupe import BloomFilter, canonicalize_url
+from common.geocoding import build_geocoder
+from common.inference import get_backend
+from common import news_index
+from common.news_index import published_day
+from common.rate_limiter import get_limiter_stats
+from common.relevance import RelevanceFilter, RelevanceModel
 
 # --- CONFIGURATION (Must be set as Lambda Environment Variables) ---
 
@@ -19,164 +31,336 @@ GNEWS_API_KEY = os.environ.get('GNEWS_API_KEY', 'YOUR_GNEWS_API_KEY')
 # DynamoDB Table Name 
 DYNAMO_TABLE_NAME = os.environ.get('DYNAMO_TABLE_NAME', 'NewsTable')
 
-# Your Gemini API Key
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '') 
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+# Model backend used for summaries: gemini, bedrock or local (offline heuristics).
+# The Gemini key and model are read by common.inference (GEMINI_API_KEY, GEMINI_MODEL).
+SUMMARY_BACKEND = os.environ.get('SUMMARY_BACKEND', 'gemini')
+
+GNEWS_URL = os.environ.get('GNEWS_URL', "https://gnews.io/api/v4/search")
+# Fan-out mode: pages fetched per topic, and max GNews requests in flight at once
+FANOUT_PAGES = int(os.environ.get('FANOUT_PAGES', '2'))
+FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', '4'))
+
+# Max number of Gemini summary requests in flight at once
+SUMMARY_MAX_WORKERS = int(os.environ.get('SUMMARY_MAX_WORKERS', '5'))
+# Articles packed into one Gemini request (1 disables batching). The effective
+# size is capped so batch size * max_chars stays within the output budget.
+SUMMARY_BATCH_SIZE = int(os.environ.get('SUMMARY_BATCH_SIZE', '10'))
+SUMMARY_BATCH_MAX_OUTPUT_CHARS = int(os.environ.get('SUMMARY_BATCH_MAX_OUTPUT_CHARS', '6000'))
+
+# Summary cache: in-memory LRU size, plus an optional persistent tier with a TTL.
+# SUMMARY_CACHE_TABLE (partition key 'cache_key', TTL on 'expires_at') takes
+# precedence over SUMMARY_CACHE_FILE, which is meant for local runs.
+SUMMARY_CACHE_SIZE = int(os.environ.get('SUMMARY_CACHE_SIZE', '1024'))
+SUMMARY_CACHE_TABLE = os.environ.get('SUMMARY_CACHE_TABLE', '')
+SUMMARY_CACHE_FILE = os.environ.get('SUMMARY_CACHE_FILE', '')
+SUMMARY_CACHE_TTL_SECONDS = int(os.environ.get('SUMMARY_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+# Near-duplicate clustering: articles about the same event share an event_id and
+# only the first one is summarized and classified. The LSH buckets live in memory
+# and optionally in EVENT_INDEX_TABLE (partition key 'cache_key', TTL on
+# 'expires_at') or EVENT_INDEX_FILE; an event stops matching once they expire.
+EVENT_CLUSTERING_ENABLED = os.environ.get('EVENT_CLUSTERING_ENABLED', 'true').lower() == 'true'
+EVENT_SIMILARITY_THRESHOLD = float(os.environ.get('EVENT_SIMILARITY_THRESHOLD', '0.5'))
+EVENT_INDEX_SIZE = int(os.environ.get('EVENT_INDEX_SIZE', '20000'))
+EVENT_INDEX_TABLE = os.environ.get('EVENT_INDEX_TABLE', '')
+EVENT_INDEX_FILE = os.environ.get('EVENT_INDEX_FILE', '')
+EVENT_INDEX_TTL_SECONDS = int(os.environ.get('EVENT_INDEX_TTL_SECONDS', str(3 * 24 * 3600)))
+
+# Relevance pre-filter: new articles scoring below RELEVANCE_THRESHOLD (0-1) are
+# stored with skipped_reason='low_relevance' and never summarized or classified.
+# RELEVANCE_MODEL_FILE replaces the built-in keyword weights (see common/relevance.py).
+RELEVANCE_FILTER_ENABLED = os.environ.get('RELEVANCE_FILTER_ENABLED', 'true').lower() == 'true'
+RELEVANCE_THRESHOLD = float(os.environ.get('RELEVANCE_THRESHOLD', '0.3'))
+RELEVANCE_MODEL_FILE = os.environ.get('RELEVANCE_MODEL_FILE', '')
+# Re-score mode reads skipped rows from the sparse skipped_reason-index, this
+# many pages of RESCORE_PAGE_SIZE rows per invocation
+RESCORE_PAGE_SIZE = int(os.environ.get('RESCORE_PAGE_SIZE', '100'))
+RESCORE_MAX_PAGES = int(os.environ.get('RESCORE_MAX_PAGES', '10'))
+
+# Fused mode: each event's first article gets its summary and disaster
+# classification from one SUMMARY_BACKEND call and is stored complete, so the
+# stream classifier skips it. Geocoding (GEOCODING_ENABLED, GAZETTEER_FILE,
+# GEOCODE_CACHE_SIZE) and the rollups in AGGREGATES_TABLE then happen here too;
+# without AGGREGATES_TABLE, fused rows are counted in no rollup at all. A failed
+# fused call costs a summary call here plus a classifier call later
+# (counted as fused.fallbacks).
+FUSED_MODE = os.environ.get('FUSED_MODE', 'false').lower() == 'true'
+AGGREGATES_TABLE = os.environ.get('AGGREGATES_TABLE', '')
+
+# Store items in the compact format (compressed source text, epoch inserted_at;
+# see common/item_format.py). Readers decode both formats.
+COMPACT_ITEMS = os.environ.get('COMPACT_ITEMS', 'true').lower() == 'true'
+
+# Dedupe: retries for UnprocessedKeys in batch_get_item, and the in-memory
+# Bloom filter of URLs known to be stored (URL_BLOOM_CAPACITY=0 disables it)
+DEDUPE_MAX_RETRIES = int(os.environ.get('DEDUPE_MAX_RETRIES', '5'))
+URL_BLOOM_CAPACITY = int(os.environ.get('URL_BLOOM_CAPACITY', '10000'))
+URL_BLOOM_ERROR_RATE = float(os.environ.get('URL_BLOOM_ERROR_RATE', '0.001'))
+
+def build_summary_cache():
+    """
+    Creates the summary cache from the SUMMARY_CACHE_* environment variables.
+    """
+    persistent = None
+    if SUMMARY_CACHE_TABLE:
+        persistent = DynamoCacheTier(aws.table(SUMMARY_CACHE_TABLE), SUMMARY_CACHE_TTL_SECONDS)
+    elif SUMMARY_CACHE_FILE:
+        persistent = FileCacheTier(SUMMARY_CACHE_FILE, SUMMARY_CACHE_TTL_SECONDS)
+    return TieredCache(max_entries=SUMMARY_CACHE_SIZE, persistent=persistent)
 
-# --- CORE API FUNCTIONS ---
 
-def safe_api_request(url, headers, params, max_retries=3):
+def build_event_index():
     """
-    Handles API requests with basic retries for transient errors (5xx) 
-    and checks for client errors (4xx).
+    Creates the event clustering index from the EVENT_* environment variables.
     """
-    for attempt in range(max_retries):
-        try:
-            # Determine if it's a POST (for Gemini) or GET (for GNews)
-            if headers.get('Content-Type') == 'application/json':
-                response = requests.post(url, headers=headers, data=params, timeout=15)
-            else:
-                response = requests.get(url, headers=headers, params=params, timeout=15)
-                
-            response.raise_for_status() # Raise exception for 4XX or 5XX status codes
-            return response
-        except requests.exceptions.HTTPError as e:
-            print(f"❌ HTTP Error (Attempt {attempt + 1}): {e}")
-            
-            # Print raw error content for debugging
-            print(f"Raw Error Content: {response.text}")
-
-            if response.status_code == 429:
-                # Use exponential backoff for rate limiting
-                delay = 2 ** attempt + random.uniform(0, 1)
-                print(f"⚠️ Rate limit hit. Waiting {delay:.2f} seconds.")
-                if attempt < max_retries - 1:
-                    time.sleep(delay)
-                    continue
-            
-            # For 400/403/other persistent errors, re-raise immediately
-            raise
-        except requests.exceptions.RequestException as e:
-            # Connection errors, timeouts, etc.
-            print(f"❌ Request Error (Attempt {attempt + 1}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt + random.uniform(0, 1))
-                continue
-            raise
-    
-    raise Exception(f"Failed to complete request after {max_retries} attempts.")
+    if not EVENT_CLUSTERING_ENABLED:
+        return None
+    persistent = None
+    if EVENT_INDEX_TABLE:
+        persistent = DynamoCacheTier(aws.table(EVENT_INDEX_TABLE), EVENT_INDEX_TTL_SECONDS)
+    elif EVENT_INDEX_FILE:
+        persistent = FileCacheTier(EVENT_INDEX_FILE, EVENT_INDEX_TTL_SECONDS)
+    return EventIndex(TieredCache(max_entries=EVENT_INDEX_SIZE, persistent=persistent),
+                      threshold=EVENT_SIMILARITY_THRESHOLD)
+
+
+def build_relevance_filter():
+    """
+    Creates the relevance pre-filter from the RELEVANCE_* environment variables.
+    """
+    if not RELEVANCE_FILTER_ENABLED:
+        return None
+    model = RelevanceModel.from_file(RELEVANCE_MODEL_FILE) if RELEVANCE_MODEL_FILE else RelevanceModel()
+    return RelevanceFilter(model, RELEVANCE_THRESHOLD)
 
 
+# Module level so the in-memory tiers survive warm invocations
+summary_cache = build_summary_cache()
+event_index = build_event_index()
+relevance_filter = build_relevance_filter()
+geocoder = build_geocoder() if FUSED_MODE else None
+aggregates_table = aws.table(AGGREGATES_TABLE) if FUSED_MODE and AGGREGATES_TABLE else None
+if FUSED_MODE and aggregates_table is None:
+    print("⚠️ FUSED_MODE is on but AGGREGATES_TABLE is not set: the classifier skips fused rows, "
+          "so they will be missing from the dashboard rollups.")
+
+# Canonical URLs known to exist in DynamoDB, kept across warm invocations
+seen_urls = BloomFilter(URL_BLOOM_CAPACITY, URL_BLOOM_ERROR_RATE) if URL_BLOOM_CAPACITY > 0 else None
+
+# --- CORE API FUNCTIONS ---
+
+@metrics.timed("summary")
 def get_ai_summary(article_title, article_description, max_chars=500):
     """
-    Uses the Gemini API to generate a concise summary of the article content, 
-    strictly limited to the specified character count.
+    Uses the SUMMARY_BACKEND model (Gemini by default) to generate a concise
+    summary of the article content, strictly limited to the specified character count.
     """
-    print(f"   -> Generating AI summary (Max {max_chars} chars)...")
+    metrics.log(f"   -> Generating AI summary (Max {max_chars} chars)...")
 
-    full_text = f"Title: {article_title}\n\nDescription: {article_description}"
-    
-    # System Instruction: Enforce the character limit and persona
-    system_prompt = (
-        """
-        ********************************************************************************
-        *                                                                              *
-        *                        PROFESSIONAL NEWS SUMMARIZER PROMPT                  *
-        *                                                                              *
-        * You are being assigned the task of acting as an expert, professional-level   *
-        * news summarizer. Your role is to read and understand the provided text with  *
-        * utmost care, extract the most essential information, and produce a summary  *
-        * that captures all critical details, while maintaining strict conciseness.    *
-        *                                                                              *
-        * REQUIREMENTS AND GUIDELINES:                                                *
-        *                                                                              *
-        * 1. OBJECTIVE AND NEUTRAL:                                                    *
-        *    - Your summary must be completely factual, objective, and neutral in tone.*
-        *    - Avoid any opinions, personal commentary, or interpretations.           *
-        *    - Do not embellish, speculate, or infer beyond what is present in the text.*
-        *                                                                              *
-        * 2. CONCISENESS:                                                              *
-        *    - The summary MUST be strictly limited to {max_chars} characters,         *
-        *      including spaces, punctuation, and special characters.                  *
-        *    - Do not exceed this limit under any circumstances.                       *
-        *    - Focus on brevity without sacrificing clarity or essential information.  *
-        *                                                                              *
-        * 3. COMPLETENESS:                                                             *
-        *    - Include all key facts, figures, dates, locations, names, events, and    *
-        *      outcomes that are present in the original text.                         *
-        *    - Ensure that the summary can stand alone and be fully understood without *
-        *      reference to the original text.                                         *
-        *                                                                              *
-        * 4. STRUCTURE AND STYLE:                                                      *
-        *    - Write in clear, professional, and polished language.                    *
-        *    - Prefer active voice where appropriate, but clarity takes precedence.    *
-        *    - Avoid repetition, filler words, or unnecessary modifiers.               *
-        *    - Maintain logical flow: lead with the most important facts first.        *
-        *                                                                              *
-        * 5. FORMATTING:                                                               *
-        *    - Do NOT include a title, headline, greeting, salutation, or any preamble.*
-        *    - Provide only the summary text.                                          *
-        *    - Avoid line breaks unless absolutely necessary for clarity.              *
-        *                                                                              *
-        * 6. OUTPUT RESTRICTIONS:                                                      *
-        *    - The output should be exactly one concise paragraph.                     *
-        *    - Do not add lists, bullet points, or any non-standard formatting.        *
-        *    - Do not include explanations, notes, or any meta text.                   *
-        *                                                                              *
-        * 7. ATTENTION TO DETAIL:                                                      *
-        *    - Carefully read the entire input text before summarizing.                *
-        *    - Ensure all numbers, dates, names, and other critical details are correct.*
-        *    - Double-check the character count to strictly adhere to {max_chars}.     *
-        *                                                                              *
-        * 8. SUMMARY EXAMPLES (FOR GUIDANCE ONLY):                                     *
-        *    - If the text reports an event, summarize the who, what, when, where,     *
-        *      why, and how in as few words as possible.                                *
-        *    - Do not omit essential facts in the pursuit of brevity.                  *
-        *                                                                              *
-        * FINAL INSTRUCTIONS:                                                          *
-        *    - Read the provided text carefully.                                       
-        *    - Extract all key information without adding anything new.                 
-        *    - Compose a concise, fully self-contained summary.                         
-        *    - Ensure it does not exceed {max_chars} characters.                        
-        *    - Output ONLY the summary text.                                           
-        *                                                                              *
-        ********************************************************************************
-        """
-    )
-    
-    user_query = f"Please provide the summary for the following article text:\n\n{full_text}"
+    try:
+        return get_backend(SUMMARY_BACKEND).summarize(article_title, article_description, max_chars)
+    except Exception as e:
+        return f"[Error: Failed to summarize article. {e}]"
 
-    # Payload for POST request
-    payload = json.dumps({
-        "contents": [{ "parts": [{ "text": user_query }] }],
-        "systemInstruction": { "parts": [{ "text": system_prompt }] },
-    })
-    
-    api_url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
+def summary_cache_key(article_title, article_description, max_chars=500):
+    """
+    Content-addressed cache key for a summary. Title and description are
+    normalized (Unicode form, case, punctuation, whitespace) so the same wire
+    story syndicated under different URLs maps to the same key.
+    """
+    def normalize(text):
+        text = unicodedata.normalize('NFKC', text or '').lower()
+        text = re.sub(r'[^\w\s]', ' ', text)
+        return ' '.join(text.split())
+
+    content = f"{normalize(article_title)}\x1f{normalize(article_description)}\x1f{max_chars}"
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def is_failed_summary(summary):
+    """
+    True for the placeholder text get_ai_summary returns when Gemini fails.
+    """
+    return not summary or summary.startswith('[Error:') or summary == 'AI summary failed.'
+
+
+@metrics.timed("summary_batch")
+def get_ai_summaries_batch(articles, max_chars=500):
+    """
+    Uses a single model request to summarize several articles at once.
+    Returns a dict of article URL -> summary containing only the articles that
+    came back usable, so callers can fall back to get_ai_summary for the rest.
+    """
+    metrics.log(f"   -> Generating AI summaries for {len(articles)} articles in one request (Max {max_chars} chars each)...")
 
     try:
-        response = safe_api_request(
-            api_url, 
-            {'Content-Type': 'application/json'}, 
-            payload, 
-            max_retries=3 
-        )
-        
-        result = response.json()
-        generated_text = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', 'AI summary failed.')
-        
-        # Final safety check truncation
-        final_summary = generated_text[:max_chars]
-        
-        return final_summary
+        return get_backend(SUMMARY_BACKEND).summarize_batch(articles, max_chars)
+    except Exception as e:
+        print(f"⚠️ Batch summary failed, falling back to per-article requests: {e}")
+        return {}
+
 
+def iter_summaries(articles, max_workers=SUMMARY_MAX_WORKERS, batch_size=SUMMARY_BATCH_SIZE, max_chars=500):
+    """
+    Generates AI summaries for a list of GNews articles concurrently.
+    Yields the summaries in the same order as the input articles, each as soon
+    as it and every summary before it is ready, so callers can persist early
+    results while later ones are still in flight. A failure on one article
+    only affects that article's summary.
+
+    Articles whose title+description is already in summary_cache are not sent
+    to Gemini; successful new summaries are added to the cache.
+
+    With batching enabled, articles are sent in groups of `batch_size` (capped by
+    SUMMARY_BATCH_MAX_OUTPUT_CHARS // max_chars), and any article missing from a
+    batch response is summarized on its own, as a separate task on the pool.
+    """
+    if not articles:
+        return
+
+    cache_keys = [
+        summary_cache_key(article.get('title', ''), article.get('description', 'No source description.'), max_chars)
+        for article in articles
+    ]
+    cached = summary_cache.get_many(cache_keys)
+    pending = [article for article, key in zip(articles, cache_keys) if key not in cached]
+    if cached:
+        print(f"   -> Reusing {len(articles) - len(pending)} cached summaries.")
+
+    def summarize(article):
+        try:
+            description = article.get('description', 'No source description.')
+            return get_ai_summary(article.get('title', ''), description, max_chars=max_chars)
+        except Exception as e:
+            return f"[Error: Failed to summarize article. {e}]"
+
+    def summarize_chunk(chunk):
+        batch_summaries = get_ai_summaries_batch(chunk, max_chars=max_chars)
+        # Articles the batch didn't cover go back to the pool, so a failed batch
+        # fans out instead of running its articles one after another here
+        return [batch_summaries.get(article['url']) or executor.submit(summarize, article) for article in chunk]
+
+    batch_size = max(1, min(batch_size, SUMMARY_BATCH_MAX_OUTPUT_CHARS // max_chars))
+    if batch_size == 1 or len(pending) <= 1:
+        tasks, work = pending, summarize
+    else:
+        tasks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        work = summarize_chunk
+
+    new_entries = {}
+    # Sized by articles, not tasks, so fallbacks from a failed batch run in parallel
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending) or 1)))
+    try:
+        # executor.map yields results in input order, regardless of completion order
+        results = executor.map(work, tasks)
+        if work is summarize_chunk:
+            results = (summary for chunk in results for summary in chunk)
+        fresh = iter(results)
+        for key in cache_keys:
+            if key in cached:
+                yield cached[key]
+                continue
+            summary = next(fresh)
+            if isinstance(summary, Future):
+                summary = summary.result()
+            if not is_failed_summary(summary):
+                new_entries[key] = summary
+            yield summary
+    finally:
+        executor.shutdown(wait=True)
+        summary_cache.put_many(new_entries)
+
+
+@metrics.timed("analysis")
+def get_ai_analysis(article_title, article_description, max_chars=500):
+    """
+    Summary and disaster classification of one article from a single
+    SUMMARY_BACKEND call (FUSED_MODE). If that fails, falls back to
+    get_ai_summary and returns only {'summary': ...}, leaving the
+    classification to the stream classifier as usual.
+    """
+    metrics.log(f"   -> Generating AI summary and classification (Max {max_chars} chars)...")
+
+    try:
+        return get_backend(SUMMARY_BACKEND).summarize_and_classify(article_title, article_description, max_chars)
     except Exception as e:
-        return f"[Error: Failed to summarize article. {e}]"
+        print(f"⚠️ Fused analysis failed, falling back to a summary only: {e}")
+    # The stream classifier makes a second model call for this article later
+    metrics.count("fused.fallbacks")
+    return {'summary': get_ai_summary(article_title, article_description, max_chars=max_chars)}
+
+
+def iter_analyses(articles, max_workers=SUMMARY_MAX_WORKERS, max_chars=500):
+    """
+    FUSED_MODE counterpart of iter_summaries: yields get_ai_analysis results
+    in input order, each as soon as it and every result before it is ready.
+    Results share summary_cache under their own keys (including
+    CLASSIFIER_VERSION); only complete analyses are cached.
+    """
+    if not articles:
+        return
+
+    cache_keys = [
+        f"analysis:{CLASSIFIER_VERSION}:"
+        + summary_cache_key(article.get('title', ''), article.get('description', 'No source description.'), max_chars)
+        for article in articles
+    ]
+    cached = summary_cache.get_many(cache_keys)
+    pending = [article for article, key in zip(articles, cache_keys) if key not in cached]
+    if cached:
+        print(f"   -> Reusing {len(articles) - len(pending)} cached analyses.")
+
+    def analyze(article):
+        try:
+            description = article.get('description', 'No source description.')
+            return get_ai_analysis(article.get('title', ''), description, max_chars=max_chars)
+        except Exception as e:
+            return {'summary': f"[Error: Failed to summarize article. {e}]"}
+
+    new_entries = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending) or 1)))
+    try:
+        fresh = executor.map(analyze, pending)
+        for key in cache_keys:
+            if key in cached:
+                yield json.loads(cached[key])
+                continue
+            analysis = next(fresh)
+            if analysis.get('support_level') and not is_failed_summary(analysis['summary']):
+                new_entries[key] = json.dumps(analysis)
+            yield analysis
+    finally:
+        executor.shutdown(wait=True)
+        summary_cache.put_many(new_entries)
+
+
+def fused_classification(title, summary, analysis):
+    """
+    Classification attributes for a fused analysis, stamped with the
+    classifier version and the input hash classify_record computes for the
+    stored row (title plus summary), so the stream classifier skips it.
+    Empty when the analysis has no classification.
+    """
+    if not analysis.get('support_level'):
+        return {}
+    attributes = classification_attributes(analysis, 'Unknown', geocoder)
+    attributes['classifier_version'] = CLASSIFIER_VERSION
+    attributes['classifier_input_hash'] = analysis_inputs_hash(title or '', summary)
+    return attributes
 
+
+@metrics.timed("dedupe_check")
 def batch_check_existing(article_urls, table_name):
     """
-    Return a set of article URLs that already exist in DynamoDB.
+    Return the subset of `article_urls` that already exist in DynamoDB.
     This assumes 'url' is the table's Partition Key.
+
+    Each URL is checked both as given and in canonical form (new items are
+    stored under the canonical URL). URLs in the `seen_urls` Bloom filter are
+    treated as existing without a read. Lookups are chunked to the 100-key
+    BatchGetItem limit and UnprocessedKeys are retried with jittered backoff.
+    If DynamoDB still cannot answer, the error is raised rather than reporting
+    everything as new, which would re-summarize and re-write stored articles.
     
     FIX: Uses ExpressionAttributeNames because 'url' is a DynamoDB reserved word 
     when used in a ProjectionExpression.
@@ -184,131 +368,467 @@ def batch_check_existing(article_urls, table_name):
     if not article_urls:
         return set()
 
-    # DynamoDB client expects key structure for BatchGetItem
-    keys = [{'url': {'S': url}} for url in article_urls]
     existing_urls = set()
+    lookup = {}  # URL form to look up -> original URLs it stands for
+    for url in article_urls:
+        canonical = canonicalize_url(url)
+        if seen_urls is not None and seen_urls.might_contain(canonical):
+            existing_urls.add(url)
+            continue
+        for form in {url, canonical}:
+            lookup.setdefault(form, set()).add(url)
+
+    keys = list(lookup)
+    for i in range(0, len(keys), 100):
+        # DynamoDB client expects key structure for BatchGetItem
+        request = {
+            table_name: {
+                'Keys': [{'url': {'S': key}} for key in keys[i:i + 100]],
+                # FIX: Use ExpressionAttributeNames and ExpressionAttributeNames 
+                # to project the 'url' attribute without using the reserved keyword directly.
+                'ProjectionExpression': '#u',
+                'ExpressionAttributeNames': {'#u': 'url'}
+            }
+        }
+
+        for attempt in range(DEDUPE_MAX_RETRIES + 1):
+            response = aws.client('dynamodb').batch_get_item(RequestItems=request)
+
+            for item in response.get('Responses', {}).get(table_name, []):
+                # The item key will still be 'url' when reading the result
+                found = item['url']['S']
+                existing_urls.update(lookup.get(found, ()))
+                if seen_urls is not None:
+                    seen_urls.add(canonicalize_url(found))
+
+            request = response.get('UnprocessedKeys')
+            if not request:
+                break
+
+            if attempt < DEDUPE_MAX_RETRIES:
+                delay = min(5.0, 0.05 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f"⚠️ {len(request[table_name]['Keys'])} unprocessed keys. Retrying in {delay:.2f} seconds.")
+                time.sleep(delay)
+        else:
+            raise Exception(f"DynamoDB left keys unprocessed after {DEDUPE_MAX_RETRIES} retries.")
+
+    return existing_urls
+
+
+def fetch_gnews_page(topic, page):
+    """
+    Fetches one page of GNews search results for a topic.
+    """
+    params = {
+        "q": topic, 
+        "lang": "en", 
+        "country": "world", 
+        "max": 10,  # Max articles per page (GNews free tier max is 10)
+        "token": GNEWS_API_KEY,
+        "page": page  # Pagination parameter
+    }
+    response = safe_api_request(GNEWS_URL, {}, params, limiter='gnews')
+    return response.json().get('articles', [])
+
+
+def fetch_topics(topics, pages, max_workers=FETCH_MAX_WORKERS):
+    """
+    Fetches pages 1..`pages` of every topic concurrently and merges the results,
+    dropping articles whose canonical URL was already returned for an earlier
+    topic or page. A failed page is logged and contributes no articles.
+    """
+    jobs = [(topic, page) for topic in topics for page in range(1, pages + 1)]
+
+    def fetch(job):
+        topic, page = job
+        try:
+            articles = fetch_gnews_page(topic, page)
+            metrics.log(f"  -> '{topic}' page {page}: {len(articles)} articles")
+            return articles
+        except Exception as e:
+            print(f"❌ Error fetching '{topic}' page {page}: {e}")
+            return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        results = list(executor.map(fetch, jobs))
+
+    merged = []
+    merged_urls = set()
+    for articles in results:
+        for article in articles:
+            canonical = canonicalize_url(article.get('url'))
+            if not canonical or canonical in merged_urls:
+                continue
+            merged_urls.add(canonical)
+            merged.append(article)
+    return merged
 
+
+def assign_events(articles):
+    """
+    Event assignment (see common/clustering.py) for each article, or None
+    for every article when clustering is disabled or fails.
+    """
+    if event_index is None or not articles:
+        return [None] * len(articles)
     try:
-        response = client.batch_get_item(
-            RequestItems={
-                table_name: {
-                    'Keys': keys,
-                    # FIX: Use ExpressionAttributeNames and ExpressionAttributeNames 
-                    # to project the 'url' attribute without using the reserved keyword directly.
-                    'ProjectionExpression': '#u',
-                    'ExpressionAttributeNames': {'#u': 'url'} 
-                }
-            }
-        )
+        return event_index.assign([
+            (canonicalize_url(article['url']), f"{article.get('title') or ''}\n{article.get('description') or ''}")
+            for article in articles
+        ])
+    except Exception as e:
+        print(f"⚠️ Event clustering failed, treating every article as its own event: {e}")
+        return [None] * len(articles)
 
-        for item in response.get('Responses', {}).get(table_name, []):
-            # The item key will still be 'url' when reading the result
-            existing_urls.add(item['url']['S'])
 
-        unprocessed = response.get('UnprocessedKeys', {})
-        if unprocessed:
-            print(f"⚠️ Unprocessed keys found: {unprocessed}")
+def commit_events(assignments):
+    """
+    Adds the events created in this batch to the LSH index. Runs after their
+    representative rows are written, so later articles never point at a
+    missing row.
+    """
+    if event_index is None:
+        return
+    try:
+        event_index.commit(assignments)
+    except Exception as e:
+        print(f"⚠️ Could not save new events to the clustering index: {e}")
+
 
-        return existing_urls
+def count_event_articles(representative_url, count):
+    """
+    Adds `count` to event_articles on an event's representative row, if it still exists.
+    """
+    try:
+        aws.table(DYNAMO_TABLE_NAME).update_item(
+            Key={'url': representative_url},
+            UpdateExpression='ADD event_articles :n',
+            ConditionExpression='attribute_exists(#u)',
+            ExpressionAttributeNames={'#u': 'url'},
+            ExpressionAttributeValues={':n': count},
+        )
     except Exception as e:
-        print(f"❌ DynamoDB Batch check error: {e}")
-        return set()
+        print(f"⚠️ Could not update article count for event of {representative_url}: {e}")
+
+
+def build_article_item(article, summary, relevance_score=None):
+    """
+    The NewsTable item for a GNews article. 'url' (canonical) is the Partition Key.
+    With COMPACT_ITEMS the bulky text is compressed (see common/item_format.py).
+    """
+    description = article.get('description', 'No source description.')
+    item = {
+        'url': canonicalize_url(article['url']),
+        'title': article.get('title'),
+        'summary': summary,
+        'source_description': description, # <-- ADDED: Original short description
+        'raw_content_snippet': article.get('content', 'No content snippet available.'), # <-- ADDED: Raw content field (often a longer snippet)
+        'source': article.get('source', {}).get('name'),
+        'published_at': article.get('publishedAt'),
+        # Partition key of the time index (see common/news_index.py)
+        'published_day': published_day(article.get('publishedAt')),
+        'inserted_at': datetime.now(timezone.utc).isoformat()
+    }
+    if relevance_score is not None:
+        item['relevance_score'] = Decimal(str(round(relevance_score, 3)))
+    # Index key attributes must be absent rather than null
+    for key_attribute in ('published_at', 'published_day'):
+        if not item[key_attribute]:
+            del item[key_attribute]
+    return item_format.encode_item(item) if COMPACT_ITEMS else item
+
+
+def store_new_articles(articles, label):
+    """
+    Drops articles already in DynamoDB and scores the rest for relevance.
+    Low-relevance articles are stored as skipped; relevant ones are clustered
+    into events, and one article per event is summarized (and, in FUSED_MODE,
+    classified in the same call). `label` identifies the batch in log lines.
+    Returns (relevant articles saved, low-relevance articles saved).
+    """
+    # --- DUPLICATE CHECK ---
+    article_urls = [article["url"] for article in articles]
+    existing_urls = batch_check_existing(article_urls, DYNAMO_TABLE_NAME)
+    print(f"{label}: Found {len(existing_urls)} existing articles (out of {len(articles)} total).")
+
+    # Skip stored articles, and repeats of the same canonical URL in this batch
+    new_articles = []
+    batch_urls = set()
+    for article in articles:
+        canonical = canonicalize_url(article['url'])
+        if article['url'] in existing_urls or canonical in batch_urls:
+            continue
+        batch_urls.add(canonical)
+        new_articles.append(article)
+    return store_articles(new_articles, label)
+
+
+def store_articles(new_articles, label):
+    """
+    Scores articles not yet stored (or being stored again) for relevance,
+    clusters them and writes their rows; see store_new_articles. Returns
+    (relevant articles saved, low-relevance articles saved).
+    """
+    for i, article in enumerate(new_articles):
+        metrics.log(f"  -> Processing Article {i+1} on {label}: {article.get('title', 'N/A')}")
+
+    # --- RELEVANCE PRE-FILTER ---
+    # Policy, market and opinion pieces are stored without a summary or
+    # classification, so they aren't fetched and scored again
+    relevance_scores = {}
+    skipped = []
+    if relevance_filter is not None and new_articles:
+        relevant, skipped = relevance_filter.split(new_articles)
+        new_articles = [article for article, _ in relevant]
+        relevance_scores = {canonicalize_url(article['url']): score for article, score in relevant + skipped}
+        if skipped:
+            print(f"🎯 {label}: skipping {len(skipped)} of {len(relevant) + len(skipped)} articles "
+                  f"below relevance {RELEVANCE_THRESHOLD}.")
+
+    # --- EVENT CLUSTERING ---
+    # Only the first article of each event is summarized (and later classified);
+    # the others are stored as duplicates of it
+    assignments = assign_events(new_articles)
+    representatives = []
+    members = []
+    event_sizes = {}
+    for article, event in zip(new_articles, assignments):
+        if event is None or event['representative_url'] == canonicalize_url(article['url']):
+            representatives.append((article, event))
+        else:
+            members.append((article, event))
+        if event is not None:
+            event_sizes[event['event_id']] = event_sizes.get(event['event_id'], 0) + 1
+    if members:
+        print(f"🧬 {label}: {len(members)} of {len(new_articles)} articles joined an existing event; "
+              f"summarizing {len(representatives)}.")
+
+    # --- SUMMARIZATION AND STORAGE ---
+    # Summaries run in parallel; each finished item is buffered and written
+    # in BatchWriteItem groups of 25 while later summaries are still running.
+    # NOTE: This requires the Lambda execution role to have DynamoDB permissions
+    saved_urls = []
+    skipped_urls = []
+    representative_summaries = {}
+    classified = []
+    with BatchItemWriter(aws.resource('dynamodb'), DYNAMO_TABLE_NAME) as writer:
+        for article, score in skipped:
+            item = build_article_item(article, article.get('description') or article.get('title'), score)
+            item['skipped_reason'] = 'low_relevance'
+
+            writer.put(item)
+            skipped_urls.append(item['url'])
+            metrics.log(f"  ⏭️ Queued low-relevance article ({score:.2f}) for DynamoDB: {article['title']}")
+
+        rep_articles = [article for article, _ in representatives]
+        if FUSED_MODE:
+            results = iter_analyses(rep_articles)
+        else:
+            results = ({'summary': summary} for summary in iter_summaries(rep_articles))
+        for (article, event), result in zip(representatives, results):
+            summary = result['summary']
+            item = build_article_item(article, summary, relevance_scores.get(canonicalize_url(article['url'])))
+            if event is not None:
+                item['event_id'] = event['event_id']
+                item['event_articles'] = event_sizes[event['event_id']]
+            representative_summaries[item['url']] = summary
+            attributes = fused_classification(article.get('title'), summary, result)
+            if attributes:
+                item.update(attributes)
+            if attributes and aggregates_table is not None:
+                # Written on its own to get the replaced row back, so the
+                # rollups move from its old classification instead of adding twice
+                with metrics.timer("dynamodb.put_item"):
+                    response = aws.table(DYNAMO_TABLE_NAME).put_item(Item=item, ReturnValues='ALL_OLD')
+                classified.append((response.get('Attributes') or {}, attributes))
+            else:
+                writer.put(item)
+            saved_urls.append(item['url'])
+            metrics.log(f"  ✅ Queued new article for DynamoDB: {article['title']}")
+
+        for article, event in members:
+            summary = representative_summaries.get(event['representative_url'])
+            if is_failed_summary(summary):
+                summary = article.get('description') or article.get('title')
+            item = build_article_item(article, summary, relevance_scores.get(canonicalize_url(article['url'])))
+            item['event_id'] = event['event_id']
+            item['duplicate_of'] = event['representative_url']
+
+            writer.put(item)
+            saved_urls.append(item['url'])
+            metrics.log(f"  ✅ Queued duplicate of {event['event_id']} for DynamoDB: {article['title']}")
+
+    # Every representative row is stored now, so its event can attract later articles
+    commit_events([event for _, event in representatives])
+
+    # Rollups for rows classified here; the stream classifier won't count them
+    if aggregates_table is not None:
+        for old_row, attributes in classified:
+            try:
+                with metrics.timer("dynamodb.aggregates"):
+                    aggregates.apply_classification(aggregates_table, old_row, attributes)
+            except Exception as e:
+                print(f"⚠️ Could not update aggregates: {e}")
+
+    # Events first seen in an earlier run count their new articles on the representative row
+    for representative_url, event_id in {
+        event['representative_url']: event['event_id'] for _, event in members if not event['new_event']
+    }.items():
+        count_event_articles(representative_url, event_sizes[event_id])
+
+    # The writer has flushed every item once the block exits
+    for article_url in saved_urls + skipped_urls:
+        if seen_urls is not None:
+            seen_urls.add(article_url)
+    if saved_urls or skipped_urls:
+        print(f"💾 DynamoDB writes on {label}: {json.dumps(writer.get_stats())}")
+    return len(saved_urls), len(skipped_urls)
+
+
+def skipped_article(item):
+    """
+    A stored low-relevance row as a GNews-style article dict.
+    """
+    article = {
+        'url': item['url'],
+        'title': item.get('title'),
+        'description': item.get('source_description'),
+        'content': item.get('raw_content_snippet'),
+        'publishedAt': item.get('published_at'),
+        'source': {'name': item.get('source')},
+    }
+    return {key: value for key, value in article.items() if value is not None}
+
+
+def rescore_skipped_articles(cursor=None, max_pages=RESCORE_MAX_PAGES):
+    """
+    Scores stored low-relevance rows again with the current relevance model,
+    reading up to `max_pages` pages of the sparse skipped_reason index from
+    `cursor`. Rows that now pass go through store_articles like new
+    articles: they are summarized (and in FUSED_MODE classified) and
+    rewritten without skipped_reason, which also drops them from the index.
+    Returns (rows checked, rows recovered, cursor to continue from or None).
+    """
+    table = aws.table(DYNAMO_TABLE_NAME)
+    checked = recovered = 0
+    for page in range(1, max_pages + 1):
+        result = news_index.skipped(table, limit=RESCORE_PAGE_SIZE, cursor=cursor)
+        cursor = result.cursor
+        articles = [skipped_article(item) for item in result.items]
+        checked += len(articles)
+        if relevance_filter is not None:
+            scores = relevance_filter.model.score_many(articles)
+            articles = [article for article, score in zip(articles, scores) if score >= RELEVANCE_THRESHOLD]
+        if articles:
+            print(f"♻️ Re-scored page {page}: {len(articles)} skipped articles are now relevant.")
+            recovered += store_articles(articles, f"Re-scored page {page}")[0]
+        if cursor is None:
+            break
+    return checked, recovered, cursor
+
+
+def log_invocation_stats(saved_count, skipped_count=0):
+    """
+    Per-invocation summary lines, plus the stage timings from common.metrics.
+    `saved_count` counts relevant articles only; `skipped_count` the
+    low-relevance rows stored alongside them.
+    """
+    print(f"🌐 HTTP latency per host: {json.dumps(http_client.get_latency_stats())}")
+    print(f"🗃️ Summary cache: {json.dumps(summary_cache.get_stats())}")
+    print(f"🚦 Rate limits: {json.dumps(get_limiter_stats())}")
+    if relevance_filter is not None:
+        print(f"🎯 Relevance filter: {json.dumps(relevance_filter.get_stats())}")
+    if geocoder is not None:
+        print(f"🌍 Geocoding: {json.dumps(geocoder.get_stats())}")
+    metrics.count("articles_saved", saved_count)
+    metrics.count("articles_skipped", skipped_count)
+    metrics.flush("scraper")
 
 
 def lambda_handler(event, context):
     """
     AWS Lambda handler function. Fetches news and stores unique articles in DynamoDB.
     Now includes logic to paginate if initial results are duplicates.
+
+    Fan-out mode: pass `topics` (a list, or a comma-separated string) and
+    optionally `pages` to fetch pages 1..`pages` of every topic concurrently,
+    merge and dedupe them, and store all new articles in one pass.
+
+    Re-score mode: pass `rescore_skipped: true` to re-score the rows stored
+    as low relevance (after the relevance model changes) instead of fetching
+    news; see rescore_skipped_articles. The response carries a `cursor`
+    while rows remain; pass it back as `rescore_cursor` to continue.
+
+    `count` is the number of relevant articles stored; low-relevance rows
+    are reported separately as `skipped`.
     """
-    topic = event.get('topic', "natural disaster OR climate change")
-    
-    # NOTE: This line requires the Lambda execution role to have DynamoDB permissions
-    news_table = dynamodb.Table(DYNAMO_TABLE_NAME)
+    if event.get('rescore_skipped'):
+        checked, recovered, cursor = rescore_skipped_articles(event.get('rescore_cursor'))
+        print(f"♻️ Re-scored {checked} low-relevance articles; recovered {recovered}.")
+        log_invocation_stats(recovered)
+        return {"status": "success", "rescored": checked, "count": recovered, "cursor": cursor}
 
-    GNEWS_URL = "https://gnews.io/api/v4/search"
+    topic = event.get('topic', "natural disaster OR climate change")
+    topics = event.get('topics')
+    if isinstance(topics, str):
+        topics = topics.split(',')
+    if topics:
+        topics = list(dict.fromkeys(t.strip() for t in topics if t.strip()))
     
     # Constants for pagination control
     page = 1
     MAX_PAGES = 5
     TOTAL_SAVED_COUNT = 0
+    TOTAL_SKIPPED_COUNT = 0
     
     if GNEWS_API_KEY == 'YOUR_GNEWS_API_KEY':
         print("❌ ERROR: GNEWS_API_KEY is not configured.")
         return {"status": "error", "message": "GNews API Key is missing."}
 
+    if topics:
+        pages = int(event.get('pages', FANOUT_PAGES))
+        print(f"🔍 Starting fan-out news search for {len(topics)} topics, {pages} pages each.")
+        articles = fetch_topics(topics, pages)
+        print(f"Fetched {len(articles)} unique articles across all topics.")
+        try:
+            if articles:
+                TOTAL_SAVED_COUNT, TOTAL_SKIPPED_COUNT = store_new_articles(articles, "fan-out batch")
+        except Exception as e:
+            print(f"❌ Error while storing fan-out articles: {e}")
+        log_invocation_stats(TOTAL_SAVED_COUNT, TOTAL_SKIPPED_COUNT)
+        return {"status": "success", "count": TOTAL_SAVED_COUNT, "skipped": TOTAL_SKIPPED_COUNT, "topics": topics, "pages_checked": pages, "articles_fetched": len(articles)}
+
     print(f"🔍 Starting news search for '{topic}'. Max pages to check: {MAX_PAGES}")
 
     while page <= MAX_PAGES:
         print(f"\n--- Checking Page {page}/{MAX_PAGES} ---")
 
-        params = {
-            "q": topic, 
-            "lang": "en", 
-            "country": "world", 
-            "max": 10,  # Max articles per page (GNews free tier max is 10)
-            "token": GNEWS_API_KEY,
-            "page": page  # Pagination parameter
-        }
-
         try:
-            response = safe_api_request(GNEWS_URL, {}, params)
-            data = response.json()
-            articles = data.get('articles', [])
+            articles = fetch_gnews_page(topic, page)
             
             if not articles:
                 print(f"⚠️ No articles returned from GNews on page {page}. Ending search.")
                 break # Break if GNews returns no articles (reached the end)
 
-            # --- DUPLICATE CHECK ---
-            article_urls = [article["url"] for article in articles]
-            existing_urls = batch_check_existing(article_urls, DYNAMO_TABLE_NAME)
-            print(f"Page {page}: Found {len(existing_urls)} existing articles (out of {len(articles)} total).")
-
-            saved_count_on_page = 0
-            
-            for i, article in enumerate(articles):
-                article_url = article['url']
-
-                if article_url in existing_urls:
-                    continue
-
-                print(f"  -> Processing Article {i+1} on Page {page}: {article.get('title', 'N/A')}")
-                
-                # Use the description field to generate the AI summary
-                description = article.get('description', 'No source description.')
-                summary = get_ai_summary(article.get('title', ''), description)
-                
-                # Prepare item for DynamoDB. 'url' is the Partition Key.
-                item = {
-                    'url': article_url, 
-                    'title': article.get('title'),
-                    'summary': summary,
-                    'source_description': description, # <-- ADDED: Original short description
-                    'raw_content_snippet': article.get('content', 'No content snippet available.'), # <-- ADDED: Raw content field (often a longer snippet)
-                    'source': article.get('source', {}).get('name'),
-                    'published_at': article.get('publishedAt'),
-                    'inserted_at': datetime.now(timezone.utc).isoformat()
-                }
-
-                # Save to DynamoDB
-                news_table.put_item(Item=item)
-                saved_count_on_page += 1
-                TOTAL_SAVED_COUNT += 1
-                print(f"  ✅ Saved new article to DynamoDB: {article['title']}")
+            saved_count_on_page, skipped_count_on_page = store_new_articles(articles, f"Page {page}")
+            TOTAL_SAVED_COUNT += saved_count_on_page
+            TOTAL_SKIPPED_COUNT += skipped_count_on_page
             
             # --- PAGINATION LOGIC CHECK ---
+            # Only relevant articles count: a page of low-relevance pieces moves on too
             if saved_count_on_page > 0:
                 print(f"✅ Found {saved_count_on_page} new articles on page {page}. Stopping pagination to avoid excessive calls.")
                 break # Found new data, successfully executed the purpose, so stop here.
             else:
-                print(f"🛑 Page {page} yielded only duplicates. Moving to next page.")
+                print(f"🛑 Page {page} yielded only duplicates or low-relevance articles. Moving to next page.")
                 page += 1
                 
         except Exception as e:
             print(f"❌ Error during search on page {page}: {e}")
             break # Stop searching on error
         
-    return {"status": "success", "count": TOTAL_SAVED_COUNT, "topic": topic, "pages_checked": page}
+    log_invocation_stats(TOTAL_SAVED_COUNT, TOTAL_SKIPPED_COUNT)
+    return {"status": "success", "count": TOTAL_SAVED_COUNT, "skipped": TOTAL_SKIPPED_COUNT, "topic": topic, "pages_checked": page}
 
 
 # --- MAIN EXECUTION (for local testing without full AWS setup) ---